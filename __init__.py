@@ -1,19 +1,25 @@
-from .nodes.in_node import NODE_CLASS_MAPPINGS as INDIAN_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as INDIAN_NODE_DISPLAY_NAME_MAPPINGS
-from .nodes.id_node import NODE_CLASS_MAPPINGS as INDONESIAN_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as INDONESIAN_NODE_DISPLAY_NAME_MAPPINGS
-from .nodes.jp_node import NODE_CLASS_MAPPINGS as JAPANESE_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as JAPANESE_NODE_DISPLAY_NAME_MAPPINGS
-from .nodes.cn_node import NODE_CLASS_MAPPINGS as CHINESE_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as CHINESE_NODE_DISPLAY_NAME_MAPPINGS
+from .nodes.regions import NODE_CLASS_MAPPINGS as REGION_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as REGION_NODE_DISPLAY_NAME_MAPPINGS
 from .nodes.ollama_prompter import NODE_CLASS_MAPPINGS as OLLAMA_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as OLLAMA_NODE_DISPLAY_NAME_MAPPINGS
+from .nodes.dedup import NODE_CLASS_MAPPINGS as DEDUP_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as DEDUP_NODE_DISPLAY_NAME_MAPPINGS
+from .nodes.conditioning_cache import NODE_CLASS_MAPPINGS as CONDITIONING_NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as CONDITIONING_NODE_DISPLAY_NAME_MAPPINGS
 
 NODE_CLASS_MAPPINGS = {}
 NODE_DISPLAY_NAME_MAPPINGS = {}
 
-NODE_CLASS_MAPPINGS.update(INDIAN_NODE_CLASS_MAPPINGS)
-NODE_DISPLAY_NAME_MAPPINGS.update(INDIAN_NODE_DISPLAY_NAME_MAPPINGS)
-NODE_CLASS_MAPPINGS.update(INDONESIAN_NODE_CLASS_MAPPINGS)
-NODE_DISPLAY_NAME_MAPPINGS.update(INDONESIAN_NODE_DISPLAY_NAME_MAPPINGS)
+# One outfit node pair per region directory under data/ (see nodes/regions.py)
+NODE_CLASS_MAPPINGS.update(REGION_NODE_CLASS_MAPPINGS)
+NODE_DISPLAY_NAME_MAPPINGS.update(REGION_NODE_DISPLAY_NAME_MAPPINGS)
 NODE_CLASS_MAPPINGS.update(OLLAMA_NODE_CLASS_MAPPINGS)
 NODE_DISPLAY_NAME_MAPPINGS.update(OLLAMA_NODE_DISPLAY_NAME_MAPPINGS)
-NODE_CLASS_MAPPINGS.update(JAPANESE_NODE_CLASS_MAPPINGS)
-NODE_DISPLAY_NAME_MAPPINGS.update(JAPANESE_NODE_DISPLAY_NAME_MAPPINGS)
-NODE_CLASS_MAPPINGS.update(CHINESE_NODE_CLASS_MAPPINGS)
-NODE_DISPLAY_NAME_MAPPINGS.update(CHINESE_NODE_DISPLAY_NAME_MAPPINGS)
\ No newline at end of file
+NODE_CLASS_MAPPINGS.update(DEDUP_NODE_CLASS_MAPPINGS)
+NODE_DISPLAY_NAME_MAPPINGS.update(DEDUP_NODE_DISPLAY_NAME_MAPPINGS)
+NODE_CLASS_MAPPINGS.update(CONDITIONING_NODE_CLASS_MAPPINGS)
+NODE_DISPLAY_NAME_MAPPINGS.update(CONDITIONING_NODE_DISPLAY_NAME_MAPPINGS)
+
+# GET /outfits/metrics (timings are recorded when COMFYUI_OUTFITS_METRICS is set)
+from .nodes.instrumentation import register_routes
+register_routes()
+
+# GET /outfits/options: paginated search over the dropdown catalogs (see nodes/catalog_index.py)
+from .nodes.catalog_index import register_routes as register_catalog_routes
+register_catalog_routes()
@@ -0,0 +1,67 @@
+# engines.py
+# Batch engine throughput check: times the "python" and "numpy" engines of
+# the batch node on the shipped regions whose catalogs carry "excludes" tags
+# (the per-row narrowing the numpy engine must keep vectorized) and fails
+# when numpy is less than --min-speedup times faster.
+#
+#   python -m benchmarks.engines --min-speedup 10
+import sys
+import time
+
+from nodes.ethnic_outfit_common import EthnicOutfitBatchGenerator, compile_region
+from nodes.generate import default_inputs
+from nodes.regions import region_codes
+
+MIN_SPEEDUP = 10.0
+BATCH = 20000
+
+
+def excludes_regions():
+    # Shipped regions with "excludes" tags
+    return [region for region in region_codes() if compile_region(region).exclusions()]
+
+
+def items_per_second(node, engine, batch, runs):
+    # Best of runs, after one small warm-up batch (compiled tables and plans cached)
+    inputs = dict(default_inputs(), seed=1)
+    node.generate_batch(batch_size=100, engine=engine, **inputs)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        node.generate_batch(batch_size=batch, engine=engine, **inputs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return batch / best
+
+
+def measure(regions=None, batch=BATCH, runs=3):
+    """{region: {"python": items/s, "numpy": items/s, "speedup": numpy / python}}."""
+    results = {}
+    for region in regions or excludes_regions():
+        node = EthnicOutfitBatchGenerator(region)
+        python = items_per_second(node, "python", batch, runs)
+        numpy = items_per_second(node, "numpy", batch, runs)
+        results[region] = {"python": python, "numpy": numpy, "speedup": numpy / python}
+    return results
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.engines", description="Fail when the numpy batch engine is not --min-speedup times faster than the python one.")
+    parser.add_argument("--min-speedup", type=float, default=MIN_SPEEDUP, help="Required numpy / python throughput ratio (default: %(default)s)")
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failures = []
+    for region, result in measure(batch=args.batch, runs=args.runs).items():
+        print(f"{region}: python {result['python'] / 1000:.1f}k/s, numpy {result['numpy'] / 1000:.1f}k/s, x{result['speedup']:.1f}")
+        if result["speedup"] < args.min_speedup:
+            failures.append(f"{region}: numpy is x{result['speedup']:.1f} the python engine, expected x{args.min_speedup:g}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+# import_budget.py
+# Import-time budget check: loads the package the way ComfyUI does (from its
+# __init__.py, under an arbitrary module name) in fresh interpreters and
+# fails when registration is too slow, pulls in heavy optional modules, or
+# reads more than the country metadata from the catalog.
+#
+#   python -m benchmarks.import_budget --budget 0.05
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+BUDGET = 0.05
+# Loaded by ComfyUI (or Python itself) long before custom nodes, so not charged to us
+PRELOADED = ["json", "logging", "hashlib", "random", "re", "threading"]
+# Must only be imported once a node actually needs them
+DEFERRED = ["requests", "urllib3", "sqlite3", "numpy", "concurrent.futures", "aiohttp"]
+
+CHILD = r"""
+import importlib.util, json, os, sys, time
+root, preloaded = sys.argv[1], json.loads(sys.argv[2])
+for name in preloaded:
+    __import__(name)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("comfyui_outfits", os.path.join(root, "__init__.py"), submodule_search_locations=[root])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+seconds = time.perf_counter() - start
+catalog = sys.modules["comfyui_outfits.nodes.ethnic_outfit_common"].CATALOG
+print(json.dumps({
+    "seconds": seconds,
+    "modules": sorted(sys.modules),
+    "catalog_files": catalog.stats()["files"],
+    "nodes": len(module.NODE_CLASS_MAPPINGS),
+}))
+"""
+
+
+def measure_once(root=ROOT):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, root, json.dumps(PRELOADED)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=5, root=ROOT):
+    """Best-of-runs import time plus what the import loaded; the first run only warms the bytecode cache."""
+    measure_once(root)
+    results = [measure_once(root) for _ in range(runs)]
+    best = min(results, key=lambda r: r["seconds"])
+    return {
+        "seconds": best["seconds"],
+        "median": sorted(r["seconds"] for r in results)[len(results) // 2],
+        "deferred_loaded": [m for m in DEFERRED if m in best["modules"]],
+        "catalog_files": best["catalog_files"],
+        "nodes": best["nodes"],
+    }
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_budget", description="Fail when importing the node package exceeds its time budget or loads deferred modules.")
+    parser.add_argument("--budget", type=float, default=BUDGET, help="Seconds allowed for the best run (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(f"import: {result['seconds'] * 1000:.1f} ms best, {result['median'] * 1000:.1f} ms median, "
+          f"{result['nodes']} nodes, {result['catalog_files']} catalog file(s) read")
+    failures = []
+    if result["seconds"] > args.budget:
+        failures.append(f"import took {result['seconds'] * 1000:.1f} ms, budget is {args.budget * 1000:.0f} ms")
+    if result["deferred_loaded"]:
+        failures.append(f"imported at registration: {', '.join(result['deferred_loaded'])}")
+    if result["catalog_files"] > 1:
+        failures.append(f"read {result['catalog_files']} catalog files at registration (expected only country_codes.json)")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
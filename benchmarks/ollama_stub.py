@@ -0,0 +1,109 @@
+# ollama_stub.py
+# Minimal local stand-in for the Ollama REST API (/api/tags and /api/generate,
+# plain or NDJSON streaming) with injectable latency, for benchmarking the
+# prompter without a GPU or a real model.
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL = {"name": "stub:latest", "digest": "stub"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        self._send_json({"models": [MODEL]})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures > 0
+            server.failures -= fail
+        try:
+            time.sleep(server.latency)
+            if fail:
+                self.send_error(500, "stub failure")
+                return
+            self._generate(request)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _generate(self, request):
+        words = f"A detailed portrait of {request.get('prompt', '')[:200]}.".split(" ")
+        if not request.get("stream"):
+            self._send_json({"response": " ".join(words), "done": True})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.token_latency)
+            line = json.dumps({"response": word + " ", "done": False}).encode("utf-8") + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        line = json.dumps({"response": "", "done": True}).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(line), line))
+
+
+class OllamaStub:
+    """
+    Threaded stub server on 127.0.0.1. latency is slept before every
+    /api/generate response, token_latency between streamed chunks; the next
+    `failures` generate requests are answered with HTTP 500.
+    server.max_in_flight is the most generate requests served at once.
+    """
+
+    def __init__(self, latency=0.0, token_latency=0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.token_latency = token_latency
+        self.server.requests = 0
+        self.server.failures = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/generate"
+        self._thread = None
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="ollama-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,289 @@
+# run.py
+# Benchmarks for the hot paths: outfit generation, INPUT_TYPES, node
+# instantiation, input validation, catalog search, near-duplicate filtering,
+# cached text conditioning, the numpy batch engine's speedup, Ollama round
+# trips (against a local stub with injected latency) and the offline prompt
+# expander. Each scale re-runs the catalog benchmarks on a synthetic catalog
+# whose lists are padded to that many entries (0 = the shipped data/).
+#
+#   python -m benchmarks.run --out baseline.json
+#   python -m benchmarks.run --compare baseline.json
+import asyncio
+import atexit
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = tempfile.mkdtemp(prefix="outfits-bench-")
+atexit.register(shutil.rmtree, BENCH_DIR, True)
+# Keep the response cache benchmark away from the user's cache
+os.environ.setdefault("COMFYUI_OUTFITS_CACHE_DIR", os.path.join(BENCH_DIR, "cache"))
+
+from nodes import ethnic_outfit_common as common  # noqa: E402
+from nodes.conditioning_cache import CachedEncoder, ConditioningStore, HashingTextEncoder  # noqa: E402
+from nodes.dedup import NearDuplicateFilter  # noqa: E402
+from nodes.generate import default_inputs  # noqa: E402
+from . import engines, import_budget, synthetic_catalog  # noqa: E402
+from .ollama_stub import OllamaStub, MODEL  # noqa: E402
+
+SCALES = [0, 1000, 100000]
+DEDUP_ROWS = 1000
+CONDITIONING_ROWS = 50
+ROUND_TIME = 0.05
+
+
+def region_nodes():
+    # (name, class) of every outfit node, in registration order
+    from nodes.regions import NODE_CLASS_MAPPINGS
+    return list(NODE_CLASS_MAPPINGS.items())
+
+
+def measure(fn, repeat=5, round_time=ROUND_TIME):
+    """
+    timeit-style timing: the loop count is doubled until one round takes
+    round_time, then repeat rounds are timed. Returns per-call seconds.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= round_time or loops >= 1 << 20:
+            break
+        loops *= 2
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - start) / loops)
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "loops": loops,
+        "rounds": repeat,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    # The nodes log every call with print(); keep that out of the timings' terminal output
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def reset_catalog(data_dir=None):
+    if data_dir is not None:
+        common.CATALOG.data_dir = data_dir
+    common.CATALOG.clear()
+    common._compiled_regions.clear()
+
+
+def fixed_inputs(node_class):
+    # Every slot pinned to its first real option, so no draws happen
+    inputs = default_inputs()
+    for slot, table in common.compile_region(node_class.region_code).slots.items():
+        inputs[slot] = table[0] if table else "disabled"
+    inputs.update({"gender": "female", "age": "adult"})
+    return inputs
+
+
+def catalog_benchmarks(args):
+    results = {}
+    nodes = [(name, cls) for name, cls in region_nodes() if not getattr(cls, "OUTPUT_IS_LIST", None)]
+    for name, cls in region_nodes():
+        reset_catalog()
+        results[f"input_types/cold/{name}"] = measure(lambda: (reset_catalog(), cls.INPUT_TYPES()), args.repeat)
+        results[f"input_types/warm/{name}"] = measure(cls.INPUT_TYPES, args.repeat)
+    for name, cls in nodes:
+        results[f"instantiate/cold/{name}"] = measure(lambda: (reset_catalog(), cls()), args.repeat)
+        results[f"instantiate/warm/{name}"] = measure(cls, args.repeat)
+    for name, cls in nodes:
+        node = cls()
+        random_inputs = dict(default_inputs(), seed=1234)
+        pinned = dict(fixed_inputs(cls), seed=1234)
+        results[f"generate/random/{cls.region_code}"] = measure(lambda: node.generate_description(**random_inputs), args.repeat)
+        results[f"generate/fixed/{cls.region_code}"] = measure(lambda: node.generate_description(**pinned), args.repeat)
+        chosen = {slot: pinned[slot] for slot in ("hair_style", "pose", "leg_clothing", "footwear")}
+        results[f"validate/{cls.region_code}"] = measure(lambda: cls.VALIDATE_INPUTS(**chosen), args.repeat)
+        poses = common.compile_region(cls.region_code).index("pose")
+        results[f"search/pose/{cls.region_code}"] = measure(lambda: (poses.search("sitting"), poses.search("stnding")), args.repeat)
+        descriptions = [d for _, _, d in node.iter_generate(DEDUP_ROWS, **random_inputs)]
+        results[f"dedup/{DEDUP_ROWS}/{cls.region_code}"] = measure(lambda: list(NearDuplicateFilter(0.8, capacity=DEDUP_ROWS).filter(descriptions)), args.repeat)
+        # Conditioning of a new description in fragments mode (stand-in encoder)
+        encoder = CachedEncoder(HashingTextEncoder(), ConditioningStore(disk_bytes=0))
+        for description in descriptions[:CONDITIONING_ROWS]:
+            encoder.encode(description, "fragments")
+        calls = encoder.clip.calls
+        fresh = descriptions[CONDITIONING_ROWS]
+        results[f"conditioning/fragments/{cls.region_code}"] = measure(lambda: encoder.encode(fresh, "fragments"), args.repeat)
+        results[f"conditioning/encoder_calls/{cls.region_code}"] = {"count": calls, "prompts": CONDITIONING_ROWS}
+    return results
+
+
+def ollama_benchmarks(args):
+    from nodes.ollama_prompter import OllamaPrompter
+    from nodes.response_cache import RESPONSES
+    results = {}
+    prompter = OllamaPrompter()
+    with OllamaStub(latency=args.latency, token_latency=args.token_latency) as stub:
+        inputs = {
+            "keywords": "a woman in a red saree at dusk",
+            "model_name": MODEL["name"],
+            "prompt_style": "SDXL",
+            "photographer": "random", "camera": "random", "film": "random", "movement": "random",
+            "art_style": "random", "lighting": "random", "shot_type": "random", "photography_type": "random",
+            "override_instructions": "", "custom_instructions": "", "seed": 42,
+            "ollama_url": stub.url,
+        }
+        with quiet():
+            results["input_types/OllamaPrompter"] = measure(OllamaPrompter.INPUT_TYPES, args.repeat)
+            results["ollama/generate_prompt/plain"] = measure(lambda: prompter.generate_prompt(**inputs, use_cache=False), args.repeat)
+            results["ollama/generate_prompt/stream"] = measure(lambda: prompter.generate_prompt(**inputs, use_cache=False, stream=True), args.repeat)
+
+            async def identical(n=4):
+                # n identical requests in flight share one upstream call
+                return await asyncio.gather(*(prompter.generate_prompt_async(**inputs, use_cache=False) for _ in range(n)))
+            results["ollama/generate_prompt_async/4_identical"] = measure(lambda: asyncio.run(identical()), args.repeat)
+            RESPONSES.clear()
+            prompter.generate_prompt(**inputs, use_cache=True)
+            results["ollama/generate_prompt/cached"] = measure(lambda: prompter.generate_prompt(**inputs, use_cache=True), args.repeat)
+            # What the node returns while the circuit breaker keeps Ollama out of the loop
+            offline = prompter.offline_expansion(**{name: inputs[name] for name in ("keywords", "prompt_style", "photographer", "camera", "film", "movement", "art_style", "lighting", "shot_type", "photography_type", "seed")})
+            results["ollama/offline_prompt"] = measure(offline, args.repeat)
+        results["ollama/stub_requests"] = {"count": stub.requests}
+    return results
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    shipped = common.CATALOG.data_dir
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "catalog_pack": os.path.exists(os.path.join(shipped, "catalog.pack")),
+            "scales": args.scales,
+            "ollama_latency": args.latency,
+        },
+        "results": {},
+    }
+    imported = import_budget.measure(args.repeat)
+    report["results"]["import/package"] = {"median": imported["median"], "min": imported["seconds"], "rounds": args.repeat}
+    for region, result in engines.measure(runs=args.repeat).items():
+        report["results"][f"batch/speedup/{region}"] = {"numpy_over_python": round(result["speedup"], 1)}
+    for scale in args.scales:
+        if scale:
+            data_dir = os.path.join(BENCH_DIR, f"data-{scale}")
+            synthetic_catalog.build(data_dir, scale, shipped)
+        else:
+            data_dir = shipped
+        reset_catalog(data_dir)
+        print(f"benchmarks: catalog scale {scale or 'shipped'} ({data_dir})", file=sys.stderr)
+        for name, result in catalog_benchmarks(args).items():
+            report["results"][f"{name}@{scale}"] = result
+    reset_catalog(shipped)
+    if args.latency >= 0:
+        print(f"benchmarks: ollama stub, {args.latency * 1000:.0f} ms latency", file=sys.stderr)
+        report["results"].update(ollama_benchmarks(args))
+    if args.only:
+        report["results"] = {k: v for k, v in report["results"].items() if fnmatch.fnmatch(k, args.only)}
+    return report
+
+
+def format_time(seconds):
+    for unit, factor in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.3g} {unit}"
+    return f"{seconds * 1e9:.3g} ns"
+
+
+def print_report(report, baseline=None, tolerance=0.25):
+    # Returns the names that are slower than the baseline by more than tolerance
+    regressions = []
+    previous = (baseline or {}).get("results", {})
+    for name, result in report["results"].items():
+        if "median" not in result:
+            print(f"{name:<55} {result}")
+            continue
+        line = f"{name:<55} {format_time(result['median']):>10}"
+        old = previous.get(name)
+        if old and "median" in old:
+            ratio = result["median"] / old["median"]
+            line += f"  x{ratio:.2f}"
+            if ratio > 1 + tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    # Growth with catalog size: per-call time at each scale relative to the shipped catalog
+    base = {k[:-2]: v for k, v in report["results"].items() if k.endswith("@0")}
+    for scale in report["meta"]["scales"]:
+        if not scale:
+            continue
+        growth = []
+        for name, result in base.items():
+            scaled = report["results"].get(f"{name}@{scale}")
+            if scaled and result.get("median"):
+                growth.append((scaled["median"] / result["median"], name))
+        if growth:
+            ratio, name = max(growth)
+            print(f"largest growth at scale {scale}: {name} x{ratio:.1f}")
+    return regressions
+
+
+def parse_scales(text):
+    return [int(s) for s in text.split(",") if s.strip()]
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Benchmark generation, INPUT_TYPES, node instantiation and Ollama round trips.")
+    parser.add_argument("--scales", type=parse_scales, default=SCALES, help="Comma-separated catalog list sizes; 0 is the shipped catalog (default: 0,1000,100000)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the stub Ollama waits before answering; negative skips the Ollama benchmarks")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="Keep only results whose name matches this glob, e.g. 'generate/*'")
+    parser.add_argument("--out", help="Write the results as JSON (a baseline for --compare)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a result counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = print_report(report, baseline, args.tolerance)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# synthetic_catalog.py
+# Builds a copy of data/ in which every JSON list is scaled up to a target
+# length, so the benchmarks can show how the hot paths grow with catalog size.
+#
+#   python -m benchmarks.synthetic_catalog --size 100000 --out /tmp/outfits-100k
+import json
+import os
+import shutil
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data"))
+
+
+def _variant(entry, k):
+    # k-th synthetic copy of a list entry; names stay unique so dedup does not shrink the tables
+    if isinstance(entry, str):
+        return f"{entry} #{k}"
+    if isinstance(entry, dict) and isinstance(entry.get("name"), str):
+        return dict(entry, name=f"{entry['name']} #{k}")
+    return entry
+
+
+def scale_list(entries, size):
+    """Returns entries followed by numbered variants of them, size items in total."""
+    if not entries or len(entries) >= size:
+        return entries
+    scaled = list(entries)
+    k = 1
+    while len(scaled) < size:
+        for entry in entries:
+            if len(scaled) >= size:
+                break
+            scaled.append(_variant(entry, k))
+        k += 1
+    return scaled
+
+
+def build(out, size, data_dir=DATA_DIR):
+    """Writes the scaled catalog to out (replacing it) and returns the number of lists scaled."""
+    if os.path.exists(out):
+        shutil.rmtree(out)
+    scaled = 0
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        target = os.path.join(out, os.path.relpath(root, data_dir))
+        os.makedirs(target, exist_ok=True)
+        for fname in sorted(files):
+            if not fname.endswith(".json"):
+                continue
+            with open(os.path.join(root, fname), "r", encoding="utf-8") as f:
+                value = json.load(f)
+            if isinstance(value, list):
+                value = scale_list(value, size)
+                scaled += 1
+            with open(os.path.join(target, fname), "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+    return scaled
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic_catalog", description="Scale every JSON list in data/ up to --size entries.")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args(argv)
+    scaled = build(args.out, args.size, args.data_dir)
+    print(f"synthetic_catalog: scaled {scaled} lists to {args.size} entries in {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
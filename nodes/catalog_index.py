@@ -0,0 +1,174 @@
+# catalog_index.py
+# Lookup and typeahead search over the dropdown catalogs (the outfit slots of
+# every region and the data/styles lists of the Ollama prompter).
+#
+# A CatalogIndex answers "is this a catalog value" with one dict lookup (for
+# packed catalogs, a lookup of the interned string id, so nothing is decoded),
+# which the nodes' VALIDATE_INPUTS use instead of ComfyUI's scan of the combo
+# list. Search is built on first use: prefix matches come from a bisect over
+# the sorted, case-folded names, substrings from the intersection of trigram
+# posting lists, and near misses (typos) from trigram overlap.
+#
+# GET /outfits/options?catalog=<region>/<slot>|styles/<file>&q=&offset=&limit=
+# pages through the matches, so a frontend does not need the whole list. With
+# COMFYUI_OUTFITS_MAX_OPTIONS=N the combos in /object_info carry only the first
+# N entries of each catalog; any other value is still accepted on validation.
+import bisect
+import os
+import re
+from array import array
+from .catalog_pack import StringView
+
+MAX_OPTIONS = int(os.environ.get("COMFYUI_OUTFITS_MAX_OPTIONS", "0") or 0)  # 0 = no cap
+PAGE_SIZE = 50
+MAX_PAGE = 1000
+FUZZY = 0.5  # share of the query's trigrams a near miss must contain
+_NAME = re.compile(r"^\w[\w.-]*$")
+
+
+def fold(text):
+    return " ".join(text.casefold().split())
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class CatalogIndex:
+    """Membership, prefix, substring and fuzzy search over a sequence of entry names."""
+
+    def __init__(self, names):
+        self.names = names
+        self._positions = None
+        self._keys = None
+        self._options = {}
+        self._last = (None, None)  # (query, ranked positions) for paging through one query
+
+    def __len__(self):
+        return len(self.names)
+
+    def position(self, name):
+        """First position of name in the catalog, or None."""
+        positions = self._positions
+        if positions is None:
+            positions = self._positions = {}
+            ids = self.names.ids if isinstance(self.names, StringView) else self.names
+            for p, key in enumerate(ids):
+                positions.setdefault(key, p)
+        if isinstance(self.names, StringView):
+            name = self.names.pack.string_id(name) if isinstance(name, str) else None
+        return positions.get(name)
+
+    def __contains__(self, name):
+        return self.position(name) is not None
+
+    def options(self, specials=()):
+        """Combo values for INPUT_TYPES: specials, then the entries (the first MAX_OPTIONS when capped)."""
+        options = self._options.get(specials)
+        if options is None:
+            names = self.names[:MAX_OPTIONS] if MAX_OPTIONS else self.names
+            options = self._options[specials] = list(specials) + list(names)
+        return options
+
+    def _build(self):
+        keys = [fold(name) for name in self.names]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        grams = {}
+        for p, key in enumerate(keys):
+            for gram in trigrams(key):
+                grams.setdefault(gram, []).append(p)
+        self._sorted = [keys[p] for p in order]
+        self._order = order
+        self._grams = {gram: array("I", positions) for gram, positions in grams.items()}
+        self._keys = keys
+
+    def matches(self, query):
+        """Positions matching query, best first: exact, prefix (alphabetical), substring, then near misses."""
+        if self._keys is None:
+            self._build()
+        q = fold(query)
+        if not q:
+            return range(len(self.names))
+        if self._last[0] == q:
+            return self._last[1]
+        lo = bisect.bisect_left(self._sorted, q)
+        hi = bisect.bisect_left(self._sorted, q + "\U0010ffff", lo)
+        ranked = self._order[lo:hi]
+        seen = set(ranked)
+        keys = self._keys
+        grams = trigrams(q)
+        if not grams:
+            # One or two characters: too short for the trigram lists, scan once
+            ranked += [p for p, key in enumerate(keys) if p not in seen and q in key]
+        else:
+            postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            ranked += sorted(p for p in candidates if p not in seen and q in keys[p])
+            seen.update(ranked)
+            hits = {}
+            for posting in postings:
+                for p in posting:
+                    hits[p] = hits.get(p, 0) + 1
+            need = max(1, int(FUZZY * len(grams) + 0.5))
+            near = [(-n, p) for p, n in hits.items() if n >= need and p not in seen]
+            ranked += [p for _, p in sorted(near)]
+        self._last = (q, ranked)
+        return ranked
+
+    def search(self, query="", offset=0, limit=PAGE_SIZE):
+        """(total matches, names of matches offset .. offset + limit - 1)."""
+        ranked = self.matches(query)
+        return len(ranked), [self.names[p] for p in ranked[offset:offset + limit]]
+
+
+def find_index(name):
+    """CatalogIndex for "<region>/<slot>" or "<directory>/<file name without .json>"."""
+    from .ethnic_outfit_common import SLOT_SOURCES, catalog_index, compile_region
+    from .regions import NON_REGION_DIRS
+    directory, _, key = name.partition("/")
+    if not _NAME.match(directory) or not _NAME.match(key):
+        raise KeyError(f"Invalid catalog name '{name}'")
+    if key in SLOT_SOURCES and directory not in NON_REGION_DIRS:
+        return compile_region(directory).index(key)
+    return catalog_index(directory, key + ".json")
+
+
+def options_page(catalog, query="", offset=0, limit=PAGE_SIZE):
+    """Body of a GET /outfits/options answer; raises KeyError for a bad name, OSError for a missing catalog."""
+    offset = max(0, offset)
+    limit = min(MAX_PAGE, max(1, limit))
+    total, items = find_index(catalog).search(query, offset, limit)
+    return {"catalog": catalog, "query": query, "total": total, "offset": offset, "items": items}
+
+
+def register_routes():
+    """Adds GET /outfits/options to ComfyUI's server; returns False outside ComfyUI."""
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return False
+    instance = getattr(PromptServer, "instance", None)
+    if instance is None:
+        return False
+
+    @instance.routes.get("/outfits/options")
+    async def outfits_options(request):
+        import asyncio
+        params = request.query
+        try:
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", PAGE_SIZE))
+        except ValueError:
+            return web.json_response({"error": "offset and limit must be integers"}, status=400)
+        # The first search of a catalog builds its index; keep that off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, options_page, params.get("catalog", ""), params.get("q", ""), offset, limit)
+        except KeyError as e:
+            return web.json_response({"error": e.args[0]}, status=400)
+        except OSError:
+            return web.json_response({"error": f"No catalog '{params.get('catalog', '')}'"}, status=404)
+        return web.json_response(result)
+
+    return True
@@ -0,0 +1,352 @@
+# catalog_pack.py
+# Compact binary form of the data/ catalogs, memory-mapped and decoded lazily.
+#
+# Build it after editing data files (stale entries fall back to the JSON files,
+# and entries whose JSON file was deleted are not served):
+#   python -m nodes.catalog_pack
+#
+# Layout (little-endian):
+#   header   magic "OFPK", version, string count, file count, section offsets
+#   strings  every distinct string once, UTF-8, sorted (so ids can be found by bisection)
+#   sindex   (count + 1) u32 offsets into the string bytes
+#   values   tagged nodes: 's' sid | 'j' sid of a JSON scalar | 'l' n, n x u32 node offset
+#            | 'd' n, n x (u32 key sid, u32 node offset)
+#   files    per source file: path sid, size, mtime_ns, root node offset
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping, Sequence
+
+MAGIC = b"OFPK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQQ")
+NODE = struct.Struct("<cI")
+U32 = struct.Struct("<I")
+PAIR = struct.Struct("<II")
+FILE_ENTRY = struct.Struct("<IQQI")
+EXCLUDED_NAMES = ("random", "disabled")
+
+DATA_DIR = os.environ.get(
+    "COMFYUI_OUTFITS_DATA_DIR",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data")),
+)
+PACK_PATH = os.path.join(DATA_DIR, "catalog.pack")
+
+
+class CatalogPack:
+    """Read-only view of a pack file. Only the small file table is decoded up front."""
+
+    def __init__(self, path=PACK_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_strings, n_files, self._blob, self._sindex, self._values, files = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} catalog pack")
+        self.files = {}
+        for i in range(n_files):
+            sid, size, mtime_ns, node = FILE_ENTRY.unpack_from(self._mm, files + i * FILE_ENTRY.size)
+            self.files[self.string(sid)] = (mtime_ns, size, node)
+
+    def string(self, sid):
+        start, end = struct.unpack_from("<II", self._mm, self._sindex + sid * 4)
+        return str(self._mm[self._blob + start:self._blob + end], "utf-8")
+
+    def string_id(self, text):
+        # Strings are stored sorted by their UTF-8 bytes, so this is a binary search
+        target = text.encode("utf-8")
+        lo, hi = 0, self.n_strings
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = struct.unpack_from("<II", self._mm, self._sindex + mid * 4)
+            if self._mm[self._blob + start:self._blob + end] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_strings and self.string(lo) == text:
+            return lo
+        return None
+
+    def node(self, offset):
+        # (tag, payload) of the node at offset (relative to the values section)
+        return NODE.unpack_from(self._mm, self._values + offset)
+
+    def value(self, offset):
+        tag, payload = self.node(offset)
+        if tag == b"s":
+            return self.string(payload)
+        if tag == b"l":
+            return PackedList(self, offset, payload)
+        if tag == b"d":
+            return PackedDict(self, offset, payload)
+        return json.loads(self.string(payload))
+
+    def child(self, offset, i):
+        return U32.unpack_from(self._mm, self._values + offset + NODE.size + i * U32.size)[0]
+
+    def item(self, offset, i):
+        return PAIR.unpack_from(self._mm, self._values + offset + NODE.size + i * PAIR.size)
+
+    def entry(self, relpath):
+        # (mtime_ns, size, root offset) recorded for data/<relpath>, or None
+        return self.files.get(relpath)
+
+    def close(self):
+        # Values decoded from the pack (PackedList, PackedDict, StringView) are unusable afterwards
+        self._mm.close()
+
+
+class PackedList(Sequence):
+    """List node; elements are decoded on access."""
+
+    __slots__ = ("pack", "offset", "n")
+
+    def __init__(self, pack, offset, n):
+        self.pack = pack
+        self.offset = offset
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("PackedList index out of range")
+        return self.pack.value(self.pack.child(self.offset, i))
+
+    def _iter_names(self, part=None):
+        # (name string id, {key sid: value offset} or None) per entry that has a usable name,
+        # filtered like the JSON path: plain strings, or dict entries (of the given part)
+        pack = self.pack
+        name_sid = pack.string_id("name")
+        part_key = pack.string_id("part")
+        part_sid = pack.string_id(part) if part is not None else None
+        excluded = {pack.string_id(n) for n in EXCLUDED_NAMES}
+        if part is not None and part_sid is None:
+            return
+        for i in range(self.n):
+            offset = pack.child(self.offset, i)
+            tag, payload = pack.node(offset)
+            if tag == b"s" and part is None:
+                sid, fields = payload, None
+            elif tag == b"d":
+                fields = dict(pack.item(offset, k) for k in range(payload))
+                if part is not None and (part_key not in fields or pack.node(fields[part_key]) != (b"s", part_sid)):
+                    continue
+                if name_sid not in fields:
+                    continue
+                name_tag, sid = pack.node(fields[name_sid])
+                if name_tag != b"s":
+                    continue
+            else:
+                continue
+            if sid not in excluded:
+                yield sid, fields
+
+    def name_ids(self, part=None):
+        """
+        String ids of the entry names, without decoding them: plain strings, or
+        the "name" of dict entries (only those whose "part" matches, if given).
+        "random" and "disabled" are skipped like in the JSON path.
+        """
+        return array("I", (sid for sid, _ in self._iter_names(part)))
+
+    def tags(self, part=None, keys=()):
+        # Position (among name_ids(part)) -> {key: value} for entries carrying any of keys; only those values are decoded
+        key_sids = {self.pack.string_id(k): k for k in keys}
+        key_sids.pop(None, None)
+        found = {}
+        if not key_sids:
+            return found
+        for position, (_, fields) in enumerate(self._iter_names(part)):
+            if fields:
+                hit = {key_sids[k]: self.pack.value(v) for k, v in fields.items() if k in key_sids}
+                if hit:
+                    found[position] = hit
+        return found
+
+
+class PackedDict(Mapping):
+    """Dict node; the key index is built on first access, values are decoded on access."""
+
+    __slots__ = ("pack", "offset", "n", "_index")
+
+    def __init__(self, pack, offset, n):
+        self.pack = pack
+        self.offset = offset
+        self.n = n
+        self._index = None
+
+    def _keys(self):
+        if self._index is None:
+            self._index = {self.pack.string(k): v for k, v in (self.pack.item(self.offset, i) for i in range(self.n))}
+        return self._index
+
+    def __getitem__(self, key):
+        return self.pack.value(self._keys()[key])
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return self.n
+
+
+class StringView(Sequence):
+    """Immutable sequence of pack strings held as 4-byte ids; decoded when drawn."""
+
+    __slots__ = ("pack", "ids")
+
+    def __init__(self, pack, ids):
+        self.pack = pack
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.pack.string(sid) for sid in self.ids[i]]
+        return self.pack.string(self.ids[i])
+
+    def merged(self, other):
+        # Order-preserving union by string id (strings are interned, so equal text means equal id)
+        ids = array("I", dict.fromkeys(list(self.ids) + list(other.ids)))
+        return StringView(self.pack, ids)
+
+
+class PackBuilder:
+    def __init__(self):
+        self.strings = {}
+        self.values = bytearray()
+
+    def intern(self, text):
+        return self.strings.setdefault(text, len(self.strings))
+
+    def encode(self, value):
+        # Returns the node offset; string ids are provisional until finish() sorts them
+        offset = len(self.values)
+        if isinstance(value, str):
+            self.values += NODE.pack(b"s", self.intern(value))
+        elif isinstance(value, list):
+            self.values += NODE.pack(b"l", len(value))
+            slots = len(self.values)
+            self.values += bytes(U32.size * len(value))
+            for i, item in enumerate(value):
+                U32.pack_into(self.values, slots + i * U32.size, self.encode(item))
+        elif isinstance(value, dict):
+            self.values += NODE.pack(b"d", len(value))
+            slots = len(self.values)
+            self.values += bytes(PAIR.size * len(value))
+            for i, (key, item) in enumerate(value.items()):
+                PAIR.pack_into(self.values, slots + i * PAIR.size, self.intern(key), self.encode(item))
+        else:
+            self.values += NODE.pack(b"j", self.intern(json.dumps(value)))
+        return offset
+
+
+def _remap(values, old_to_new, offset=0):
+    # Rewrites provisional string ids in place after the string table was sorted
+    tag, payload = NODE.unpack_from(values, offset)
+    if tag in (b"s", b"j"):
+        NODE.pack_into(values, offset, tag, old_to_new[payload])
+    elif tag == b"l":
+        for i in range(payload):
+            _remap(values, old_to_new, U32.unpack_from(values, offset + NODE.size + i * U32.size)[0])
+    elif tag == b"d":
+        for i in range(payload):
+            pos = offset + NODE.size + i * PAIR.size
+            key, child = PAIR.unpack_from(values, pos)
+            PAIR.pack_into(values, pos, old_to_new[key], child)
+            _remap(values, old_to_new, child)
+
+
+def iter_sources(data_dir=DATA_DIR):
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for fname in sorted(files):
+            if fname.endswith(".json"):
+                path = os.path.join(root, fname)
+                yield os.path.relpath(path, data_dir).replace(os.sep, "/"), path
+
+
+def build(data_dir=DATA_DIR, out=None):
+    """Compiles data/**/*.json into one pack file; returns (path, file count, string count)."""
+    out = out or os.path.join(data_dir, "catalog.pack")
+    builder = PackBuilder()
+    files = []
+    for relpath, path in iter_sources(data_dir):
+        st = os.stat(path)
+        with open(path, "r", encoding="utf-8") as f:
+            node = builder.encode(json.load(f))
+        files.append((builder.intern(relpath), st.st_size, st.st_mtime_ns, node))
+    ordered = sorted(builder.strings, key=lambda s: s.encode("utf-8"))
+    new_id = {text: i for i, text in enumerate(ordered)}
+    old_to_new = [0] * len(ordered)
+    for text, old in builder.strings.items():
+        old_to_new[old] = new_id[text]
+    for _, _, _, node in files:
+        _remap(builder.values, old_to_new, node)
+    blob = bytearray()
+    sindex = array("I", [0])
+    for text in ordered:
+        blob += text.encode("utf-8")
+        sindex.append(len(blob))
+    blob_off = HEADER.size
+    sindex_off = blob_off + len(blob)
+    values_off = sindex_off + len(sindex) * 4
+    files_off = values_off + len(builder.values)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(ordered), len(files), blob_off, sindex_off, values_off, files_off)
+    tmp = out + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(blob)
+        f.write(sindex.tobytes())
+        f.write(builder.values)
+        for sid, size, mtime_ns, node in files:
+            f.write(FILE_ENTRY.pack(old_to_new[sid], size, mtime_ns, node))
+    os.replace(tmp, out)
+    return out, len(files), len(ordered)
+
+
+def stale_files(pack, data_dir=DATA_DIR):
+    # Source files whose current size/mtime no longer match the pack (or are missing from it),
+    # then files in the pack whose source was deleted
+    stale = []
+    sources = set()
+    for relpath, path in iter_sources(data_dir):
+        sources.add(relpath)
+        st = os.stat(path)
+        entry = pack.entry(relpath)
+        if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+            stale.append(relpath)
+    stale.extend(sorted(relpath for relpath in pack.files if relpath not in sources))
+    return stale
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m nodes.catalog_pack", description="Compile data/**/*.json into a memory-mapped catalog pack.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", help="Pack path (default: <data-dir>/catalog.pack)")
+    parser.add_argument("--check", action="store_true", help="Only report files that changed since the pack was built")
+    args = parser.parse_args(argv)
+    if args.check:
+        pack = CatalogPack(args.out or os.path.join(args.data_dir, "catalog.pack"))
+        stale = stale_files(pack, args.data_dir)
+        for relpath in stale:
+            print(f"stale: {relpath}")
+        return 1 if stale else 0
+    out, n_files, n_strings = build(args.data_dir, args.out)
+    print(f"catalog_pack: wrote {out} ({n_files} files, {n_strings} strings, {os.path.getsize(out)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,474 @@
+# conditioning_cache.py
+# Reuses text-encoder output for outfit descriptions. Descriptions are built
+# from a finite catalog vocabulary, so whole prompts and their comma-separated
+# fragments ("dressed in kurta with salwar", "earrings: jhumka") recur all the
+# time in high-volume workflows.
+#
+# ConditioningStore is an in-memory LRU bounded by tensor bytes; entries it
+# evicts are spilled to SQLite (as safetensors, with their own LRU byte budget)
+# and promoted back on the next hit. Spilled entries are never unpickled, so a
+# tampered cache file can at worst fail to load. Keys are a hash of the
+# encoder's identity (model class, where its weights came from, the names,
+# dtypes and shapes of its parameters, and applied patches such as LoRAs) and
+# the text, so a different CLIP never sees another one's conditioning. No
+# weight is read: an encoder whose loader recorded no path is identified per
+# loaded object, and its entries only serve the running process.
+#
+# The "Outfit Conditioning (Cached)" node encodes in two modes:
+#   full       the whole prompt, exactly like CLIPTextEncode; exact repeats
+#              are served from the store
+#   fragments  the comma-separated fragments packed, in order, into as few
+#              pieces as keep every piece within one 77-token chunk; each
+#              piece is encoded (and cached) on its own and the results are
+#              concatenated along the token axis, as joining the pieces with
+#              BREAK would. A prompt that fits one chunk is one piece, so the
+#              output equals "full"; longer ones reuse every cached piece
+# HashingTextEncoder stands in for a CLIP on CPU (NumPy only) for benchmarks
+# and trying the node without a model.
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from .ethnic_outfit_common import CATEGORY
+from .instrumentation import METRICS
+from .response_cache import CACHE_DIR, EVICT_TO
+
+MEMORY_BYTES = int(os.environ.get("COMFYUI_OUTFITS_COND_MEMORY_BYTES", 256 * 1024 * 1024))
+DISK_BYTES = int(os.environ.get("COMFYUI_OUTFITS_COND_DISK_BYTES", 1024 * 1024 * 1024))  # 0 = no spill
+MODES = ["full", "fragments"]
+
+
+def fragments(text):
+    return [part.strip() for part in text.split(",") if part.strip()]
+
+
+def _nbytes(value):
+    # Tensor / array bytes in a conditioning structure
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "element_size"):
+        return value.element_size() * value.nelement()
+    return 0
+
+
+def _concat(parts):
+    # Along the token axis (dim 1), torch or NumPy
+    if type(parts[0]).__module__.startswith("torch"):
+        import torch
+        return torch.cat(parts, dim=1)
+    import numpy as np
+    return np.concatenate(parts, axis=1)
+
+
+def copy_conditioning(conditioning):
+    # New outer lists and option dicts around the shared tensors, so callers may edit the options
+    return [[cond, dict(options)] for cond, options in conditioning]
+
+
+def concat_conditioning(parts):
+    """ConditioningConcat over a list of conditionings: the first one's entries and options, tokens of the rest appended."""
+    first = parts[0]
+    tail = [part[0][0] for part in parts[1:]]
+    if not tail:
+        return copy_conditioning(first)
+    return [[_concat([cond] + tail), dict(options)] for cond, options in first]
+
+
+SOURCE_ATTRIBUTES = ("model_path", "ckpt_path", "path", "filename")
+_identities = weakref.WeakKeyDictionary()  # encoder model -> (parameter layout hash, identity)
+
+
+def parameter_layout(model):
+    """Hash of a model's parameter names, dtypes and shapes; reads no weight data."""
+    digest = hashlib.blake2b(digest_size=32)
+    for name, tensor in model.state_dict().items():
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def model_source(clip):
+    # Path of the encoder's weights when its loader recorded one, else None
+    for owner in (clip, getattr(clip, "patcher", None), getattr(clip, "cond_stage_model", None)):
+        for name in SOURCE_ATTRIBUTES:
+            value = getattr(owner, name, None)
+            if isinstance(value, str) and value:
+                return value
+    return None
+
+
+def encoder_key(clip):
+    """Hash identifying a text encoder and the patches applied to it; stable across restarts when its path is known."""
+    key = getattr(clip, "cache_key", None)
+    if key:
+        return key
+    patcher = getattr(clip, "patcher", None)
+    model = getattr(clip, "cond_stage_model", clip)
+    parts = [type(model).__name__, str(getattr(clip, "layer_idx", None)), str(getattr(patcher, "patches_uuid", ""))]
+    try:
+        # Once per loaded encoder; clones with other patches (LoRAs) share the encoder and its entry
+        known = _identities.get(model)
+    except TypeError:
+        known = None
+    if known is None:
+        try:
+            layout = parameter_layout(model)
+        except Exception:
+            layout = ""
+        # A fresh token per loaded object, so a model loaded later at the same address is never confused with it
+        known = (layout, f"process:{os.getpid()}:{uuid.uuid4().hex}")
+        try:
+            _identities[model] = known
+        except TypeError:
+            pass
+    layout, identity = known
+    parts += [model_source(clip) or identity, layout]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _chunk_count(tokens):
+    # Chunks in clip.tokenize() output: a list of chunks, or one list per encoder in ComfyUI (SDXL has "g" and "l")
+    if isinstance(tokens, dict):
+        return max((len(chunks) for chunks in tokens.values()), default=0)
+    return len(tokens)
+
+
+def _is_tensor(value):
+    return hasattr(value, "shape") and hasattr(value, "dtype")
+
+
+def to_safetensors(conditioning):
+    """
+    (safetensors bytes, JSON layout) of a conditioning. Tensors go into the
+    safetensors file; the layout records the other option values. Raises
+    ValueError for options that are neither tensors nor JSON values.
+    """
+    tensors = {}
+    layout = []
+    for i, (cond, options) in enumerate(conditioning):
+        tensors[f"{i}"] = cond
+        names = []
+        values = {}
+        for name, value in options.items():
+            if _is_tensor(value):
+                tensors[f"{i}.{name}"] = value
+                names.append(name)
+            else:
+                values[name] = value
+        layout.append({"tensors": names, "options": values})
+    try:
+        layout = json.dumps(layout)
+    except TypeError as e:
+        raise ValueError(f"Conditioning options are not serializable: {e}") from None
+    if type(conditioning[0][0]).__module__.startswith("torch"):
+        from safetensors.torch import save
+        # Own contiguous CPU copies: safetensors refuses views sharing storage
+        tensors = {name: t.detach().to("cpu").contiguous().clone() for name, t in tensors.items()}
+        return save(tensors, metadata={"format": "pt"}), layout
+    import numpy as np
+    from safetensors.numpy import save
+    return save({name: np.ascontiguousarray(t) for name, t in tensors.items()}, metadata={"format": "np"}), layout
+
+
+def from_safetensors(blob, layout):
+    """Conditioning from to_safetensors() output."""
+    # The format is in the file header: 8-byte little-endian length, then JSON
+    header = json.loads(blob[8:8 + int.from_bytes(blob[:8], "little")])
+    if header.get("__metadata__", {}).get("format") == "pt":
+        from safetensors.torch import load
+    else:
+        from safetensors.numpy import load
+    tensors = load(blob)
+    conditioning = []
+    for i, entry in enumerate(json.loads(layout)):
+        options = dict(entry["options"])
+        for name in entry["tensors"]:
+            options[name] = tensors[f"{i}.{name}"]
+        conditioning.append([tensors[f"{i}"], options])
+    return conditioning
+
+
+def encode_text(clip, text):
+    # What CLIPTextEncode does, on ComfyUI versions with and without scheduled encoding
+    tokens = clip.tokenize(text)
+    if hasattr(clip, "encode_from_tokens_scheduled"):
+        return clip.encode_from_tokens_scheduled(tokens)
+    cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+    return [[cond, {"pooled_output": pooled}]]
+
+
+class ConditioningStore:
+    """
+    Memory LRU of conditionings bounded by tensor bytes, spilling evicted
+    entries to SQLite. Disk hits move the entry back into memory. The spilled
+    bytes are kept as a running total, and once the disk budget is exceeded
+    eviction drops the least recently used rows down to EVICT_TO of it.
+    """
+
+    def __init__(self, path=None, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "conditioning.sqlite3")
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> (conditioning, bytes)
+        self._used = 0
+        self._disk_used = 0  # spilled bytes in the database
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+    def _db(self):
+        # Opened (and sqlite3 imported) on the first spill or memory miss
+        if self._conn is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Earlier versions pickled entries; drop them rather than ever unpickling
+            conn.execute("DROP TABLE IF EXISTS conditioning")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conditioning_tensors ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, layout TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS conditioning_tensors_last_used ON conditioning_tensors (last_used)")
+            self._disk_used = conn.execute("SELECT COALESCE(SUM(size), 0) FROM conditioning_tensors").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            value = self._load(key) if self.disk_bytes else None
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key, conditioning):
+        with self._lock:
+            if key in self._memory:
+                self._used -= self._memory.pop(key)[1]
+            self._remember(key, conditioning)
+
+    def _remember(self, key, conditioning):
+        size = _nbytes(conditioning)
+        self._memory[key] = (conditioning, size)
+        self._used += size
+        while self._used > self.memory_bytes and len(self._memory) > 1:
+            old_key, (old, old_size) = self._memory.popitem(last=False)
+            self._used -= old_size
+            if self.disk_bytes:
+                self._spill(old_key, old)
+
+    def _load(self, key):
+        import sqlite3
+        try:
+            db = self._db()
+            row = db.execute("SELECT value, layout FROM conditioning_tensors WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE conditioning_tensors SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"ConditioningCache: Spill read failed: {e}")
+            return None
+        try:
+            return from_safetensors(row[0], row[1])
+        except Exception as e:
+            # Corrupt or foreign data (safetensors raises its own SafetensorError) is a miss
+            print(f"ConditioningCache: Spill read failed: {e}")
+            return None
+
+    def _spill(self, key, conditioning):
+        import sqlite3
+        try:
+            blob, layout = to_safetensors(conditioning)
+            db = self._db()
+            old = db.execute("SELECT size FROM conditioning_tensors WHERE key = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO conditioning_tensors (key, value, layout, size, last_used) "
+                       "VALUES (?, ?, ?, ?, ?)", (key, blob, layout, len(blob), time.time()))
+            self.spilled += 1
+            self._disk_used += len(blob) - (old[0] if old else 0)
+            if self._disk_used > self.disk_bytes:
+                self._evict(db)
+        except (sqlite3.Error, ImportError, ValueError) as e:
+            print(f"ConditioningCache: Spill write failed: {e}")
+
+    def _evict(self, db):
+        # Recounted here, as another process may share the file
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM conditioning_tensors").fetchone()[0]
+        self._disk_used = total
+        if total <= self.disk_bytes:
+            return
+        target = int(self.disk_bytes * EVICT_TO)
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM conditioning_tensors ORDER BY last_used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        db.executemany("DELETE FROM conditioning_tensors WHERE key = ?", doomed)
+        self._disk_used = total
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._memory),
+            "memory_bytes": self._used,
+            "spilled": self.spilled,
+            "disk_bytes": self._disk_used,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._used = 0
+            if os.path.exists(self.path):
+                self._db().execute("DELETE FROM conditioning_tensors")
+                self._disk_used = 0
+
+
+CONDITIONING = ConditioningStore()
+METRICS.gauge("conditioning_cache", CONDITIONING.stats)
+
+
+class CachedEncoder:
+    """Encodes prompts with one CLIP through a ConditioningStore."""
+
+    def __init__(self, clip, store=CONDITIONING):
+        self.clip = clip
+        self.store = store
+        self.prefix = encoder_key(clip)
+
+    def key(self, text):
+        # Whole prompts and fragments share one key space: both are plain encodes of their text
+        return hashlib.sha256(f"{self.prefix}\n{text}".encode("utf-8")).hexdigest()
+
+    def _cached(self, text, kind):
+        key = self.key(text)
+        conditioning = self.store.get(key)
+        if conditioning is None:
+            METRICS.count("conditioning.encoded")
+            with METRICS.timed("conditioning.encode", kind=kind):
+                conditioning = encode_text(self.clip, text)
+            self.store.put(key, conditioning)
+        return conditioning
+
+    def pieces(self, text):
+        """
+        The fragments of text packed greedily, in order, into pieces that each
+        tokenize to one chunk (a longer fragment stays a piece of its own);
+        [text] when the whole prompt fits one chunk.
+        """
+        if _chunk_count(self.clip.tokenize(text)) <= 1:
+            return [text]
+        pieces = []
+        current = None
+        for part in fragments(text):
+            joined = part if current is None else f"{current}, {part}"
+            if current is not None and _chunk_count(self.clip.tokenize(joined)) > 1:
+                pieces.append(current)
+                joined = part
+            current = joined
+        if current is not None:
+            pieces.append(current)
+        return pieces
+
+    def encode(self, text, mode="full"):
+        pieces = self.pieces(text) if mode == "fragments" else [text]
+        if len(pieces) == 1:
+            return copy_conditioning(self._cached(pieces[0], "full"))
+        return concat_conditioning([self._cached(piece, "fragment") for piece in pieces])
+
+
+class HashingTextEncoder:
+    """
+    CPU stand-in for a ComfyUI CLIP: every word maps to a fixed pseudo-random
+    vector, so equal text gives equal output. Provides tokenize() and
+    encode_from_tokens() like comfy.sd.CLIP, padded to 77-token chunks.
+    """
+
+    def __init__(self, dim=768, chunk=77, seed=0):
+        self.dim = dim
+        self.chunk = chunk
+        self.seed = seed
+        self.cache_key = f"hashing-text-encoder:{dim}:{chunk}:{seed}"
+        self.calls = 0
+
+    def tokenize(self, text):
+        words = text.lower().replace(",", " , ").split()
+        size = self.chunk - 2  # start and end tokens
+        return [words[i:i + size] for i in range(0, max(len(words), 1), size)] or [[]]
+
+    def _vector(self, token, position):
+        import numpy as np
+        digest = hashlib.blake2b(f"{self.seed}:{position}:{token}".encode("utf-8"), digest_size=8).digest()
+        return np.random.default_rng(int.from_bytes(digest, "little")).standard_normal(self.dim, dtype=np.float32)
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        import numpy as np
+        self.calls += 1
+        chunks = []
+        for words in tokens:
+            rows = ["<start>"] + words + ["<end>"] * (self.chunk - 1 - len(words))
+            chunks.append(np.stack([self._vector(word, i) for i, word in enumerate(rows)]))
+        cond = np.concatenate(chunks)[None]
+        if not return_pooled:
+            return cond
+        return cond, cond[:, len(tokens[0]) + 1].copy()
+
+
+class OutfitConditioningCache:
+    """
+    CLIPTextEncode with a cache for outfit descriptions; see the module notes
+    for the "full" and "fragments" modes.
+    """
+
+    RETURN_TYPES = ("CONDITIONING",)
+    FUNCTION = "encode"
+    CATEGORY = CATEGORY
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "clip": ("CLIP",),
+                "text": ("STRING", {"forceInput": True}),
+                "mode": (MODES, {"default": "full"}),
+            }
+        }
+
+    def encode(self, clip, text, mode="full"):
+        if clip is None:
+            raise RuntimeError("ERROR: clip input is invalid: None\n\nIf the clip is from a checkpoint loader node your checkpoint does not contain a valid clip or text encoder model.")
+        return (CachedEncoder(clip).encode(text, mode),)
+
+
+NODE_CLASS_MAPPINGS = {
+    "OutfitConditioningCache": OutfitConditioningCache,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "OutfitConditioningCache": "🧠 Outfit Conditioning (Cached)",
+}
@@ -0,0 +1,275 @@
+# dedup.py
+# Near-duplicate filtering for generated prompts: MinHash signatures over
+# word shingles, banded into an LSH index, so each new prompt is compared
+# only against the few earlier ones that share a band. CPU only, no network.
+#
+# Memory is fixed up front: signatures live in a ring buffer of `capacity`
+# slots (older prompts age out, so a million-row run checks each prompt
+# against a sliding window of the most recent ones). Every band is a flat
+# array of buckets holding the newest prompt that landed there, and a second
+# array chains each prompt to the previous one in the same bucket, so a
+# bucket lists all its prompts, newest first. Prompts are referred to by
+# their sequence number (slot = number % capacity), so a chain ends where it
+# reaches a prompt that has aged out. Bucket collisions only cost a wasted
+# comparison, since candidates are confirmed by signature similarity. A
+# bucket is walked for at most MAX_CANDIDATES prompts: only the most recent
+# ones are compared when very many similar prompts share a band.
+import re
+import zlib
+from array import array
+from .ethnic_outfit_common import CATEGORY
+from .instrumentation import METRICS
+from .substreams import MASK64, splitmix64
+
+NUM_PERM = 64
+SHINGLE = 3  # words per shingle
+CAPACITY = 100000
+CHUNK = 256  # prompts signed per NumPy call in filter()
+MAX_CANDIDATES = 64  # prompts compared per band and bucket, newest first
+_WORDS = re.compile(r"\w+")
+
+
+_word_hashes = {}
+
+
+def _word_hash(word):
+    h = zlib.crc32(word.encode("utf-8"))
+    if len(_word_hashes) < 1 << 16:
+        _word_hashes[word] = h
+    return h
+
+
+def shingle_hashes(text, k=SHINGLE):
+    """32-bit hashes of the lower-cased word k-grams of text (one gram for shorter texts)."""
+    get = _word_hashes.get
+    hashes = [get(w) or _word_hash(w) for w in _WORDS.findall(text.lower())]
+    if not hashes:
+        return []
+    k = min(k, len(hashes))
+    grams = hashes[:len(hashes) - k + 1]
+    for j in range(1, k):
+        grams = [((g * 0x01000193) ^ h) & 0xffffffff for g, h in zip(grams, hashes[j:])]
+    return list(set(grams))
+
+
+def choose_bands(threshold, num_perm):
+    """(bands, rows) with bands * rows == num_perm whose LSH threshold (1/b)^(1/r) is closest below threshold."""
+    best = (1, num_perm)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """Multiply-shift hash family: h_i(x) = ((a_i * x + b_i) mod 2^64) >> 32 over 32-bit shingle hashes."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        state = seed
+        self.a = []
+        self.b = []
+        for _ in range(num_perm):
+            state = splitmix64(state)
+            self.a.append(state | 1)
+            state = splitmix64(state)
+            self.b.append(state)
+        self.num_perm = num_perm
+        self._np = None
+
+    def numpy(self):
+        if self._np is None:
+            try:
+                import numpy as np
+                self._np = (np, np.array(self.a, dtype=np.uint64), np.array(self.b, dtype=np.uint64))
+            except ImportError:
+                self._np = False
+        return self._np
+
+    def signature(self, hashes):
+        return self.signatures([hashes])[0]
+
+    def signatures(self, hash_lists):
+        # All signatures in one NumPy pass when it is installed (same uint64 wrap-around, so
+        # identical values), else pure Python
+        empty = [0xffffffff] * self.num_perm
+        numpy = self.numpy()
+        if not numpy:
+            return [[min(((a * x + b) & MASK64) >> 32 for x in hashes) for a, b in zip(self.a, self.b)] if hashes else empty
+                    for hashes in hash_lists]
+        np, a, b = numpy
+        filled = [hashes for hashes in hash_lists if hashes]
+        if not filled:
+            return [empty for _ in hash_lists]
+        # Pad every row to the same length with its own first hash, which leaves its minimum unchanged
+        width = max(len(hashes) for hashes in filled)
+        x = np.array([hashes + [hashes[0]] * (width - len(hashes)) for hashes in filled], dtype=np.uint64)
+        rows = iter(((x[:, :, None] * a + b) >> np.uint64(32)).min(axis=1).tolist())
+        return [next(rows) if hashes else empty for hashes in hash_lists]
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate filter. check(text) returns True for a prompt to
+    keep (and indexes it) or False when an indexed prompt's estimated Jaccard
+    similarity reaches threshold.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=NUM_PERM, shingle=SHINGLE, capacity=CAPACITY, seed=1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.shingle = shingle
+        self.capacity = max(1, capacity)
+        self.hasher = MinHasher(num_perm, seed)
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self.table_size = 1 << max(4, (2 * self.capacity - 1).bit_length())
+        # Sequence number of the newest prompt per bucket, and of the previous one in its bucket per slot
+        self.buckets = [array("q", [-1]) * self.table_size for _ in range(self.bands)]
+        self.chains = [array("q", [-1]) * self.capacity for _ in range(self.bands)]
+        self.signatures = array("I", [0]) * (self.capacity * num_perm)
+        self.next_slot = 0
+        self.seen = 0
+        self.rejected = 0
+
+    def _bucket(self, band, signature):
+        start = band * self.rows
+        return hash((band, *signature[start:start + self.rows])) % self.table_size
+
+    def similarity(self, signature, slot):
+        stored = self.signatures[slot * self.num_perm:(slot + 1) * self.num_perm]
+        return sum(1 for x, y in zip(signature, stored) if x == y) / self.num_perm
+
+    def check(self, text):
+        return self.check_signature(self.hasher.signature(shingle_hashes(text, self.shingle)))
+
+    def check_signature(self, signature):
+        self.seen += 1
+        oldest = self.next_slot - self.capacity  # sequence numbers below this have aged out
+        buckets = [self._bucket(band, signature) for band in range(self.bands)]
+        tried = set()
+        for band, bucket in enumerate(buckets):
+            chain = self.chains[band]
+            number = self.buckets[band][bucket]
+            for _ in range(MAX_CANDIDATES):
+                if number < 0 or number < oldest:
+                    break
+                slot = number % self.capacity
+                if number not in tried:
+                    tried.add(number)
+                    if self.similarity(signature, slot) >= self.threshold:
+                        self.rejected += 1
+                        METRICS.count("dedup.rejected")
+                        return False
+                number = chain[slot]
+        number = self.next_slot
+        slot = number % self.capacity
+        self.signatures[slot * self.num_perm:(slot + 1) * self.num_perm] = array("I", signature)
+        for band, bucket in enumerate(buckets):
+            self.chains[band][slot] = self.buckets[band][bucket]
+            self.buckets[band][bucket] = number
+        self.next_slot += 1
+        METRICS.count("dedup.kept")
+        return True
+
+    def filter(self, items, key=None):
+        """Yields the items whose text (key(item), or the item itself) is not a near duplicate."""
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= CHUNK:
+                yield from self._filter_chunk(chunk, key)
+                chunk = []
+        if chunk:
+            yield from self._filter_chunk(chunk, key)
+
+    def _filter_chunk(self, chunk, key):
+        texts = [key(item) for item in chunk] if key is not None else chunk
+        signatures = self.hasher.signatures([shingle_hashes(text, self.shingle) for text in texts])
+        for item, signature in zip(chunk, signatures):
+            if self.check_signature(signature):
+                yield item
+
+    def stats(self):
+        return {
+            "seen": self.seen,
+            "rejected": self.rejected,
+            "rejection_rate": self.rejected / self.seen if self.seen else 0.0,
+            "indexed": min(self.next_slot, self.capacity),
+            "capacity": self.capacity,
+            "bands": self.bands,
+            "rows": self.rows,
+        }
+
+    def report(self):
+        s = self.stats()
+        return f"dedup: rejected {s['rejected']} of {s['seen']} prompts ({s['rejection_rate']:.1%}) at threshold {self.threshold}"
+
+
+class PromptDeduplicator:
+    """
+    Drops near-duplicate prompts from a list (e.g. an outfit batch node or the
+    Ollama batch prompter). With scope "session" the index is kept between
+    executions, so repeats of earlier runs are dropped too.
+    """
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, False)
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("prompts", "report")
+    FUNCTION = "deduplicate"
+    CATEGORY = CATEGORY
+
+    def __init__(self):
+        self.index = None
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "prompts": ("STRING", {"forceInput": True}),
+                "threshold": ("FLOAT", {"default": 0.8, "min": 0.05, "max": 1.0, "step": 0.05}),
+                "scope": (["batch", "session"], {"default": "batch"}),
+            },
+            "optional": {
+                "window": ("INT", {"default": CAPACITY, "min": 1, "max": 10000000}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, scope="batch", **kwargs):
+        # A session index changes with every run
+        scope = scope[0] if isinstance(scope, list) else scope
+        return float("nan") if scope == "session" else ""
+
+    def deduplicate(self, prompts, threshold, scope, window=None):
+        # INPUT_IS_LIST: widgets arrive as one-element lists
+        threshold, scope = threshold[0], scope[0]
+        window = window[0] if window else CAPACITY
+        index = self.index
+        if scope != "session" or index is None or index.threshold != threshold or index.capacity != window:
+            if scope == "session":
+                index = self.index = NearDuplicateFilter(threshold, capacity=window)
+            else:
+                index = NearDuplicateFilter(threshold, capacity=min(window, max(1, len(prompts))))
+        before = index.rejected, index.seen
+        kept = list(index.filter(prompts))
+        report = f"dedup: rejected {index.rejected - before[0]} of {index.seen - before[1]} prompts"
+        if index.seen != before[1]:
+            report += f" ({(index.rejected - before[0]) / (index.seen - before[1]):.1%})"
+        if scope == "session":
+            report += f"; session: {index.stats()['rejection_rate']:.1%} of {index.seen}"
+        print(f"PromptDeduplicator: {report}")
+        return (kept, report)
+
+
+NODE_CLASS_MAPPINGS = {
+    "PromptDeduplicator": PromptDeduplicator,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "PromptDeduplicator": "🧹 Prompt Deduplicator",
+}
@@ -0,0 +1,228 @@
+# enumeration.py
+# Enumeration mode: walks the Cartesian product of the enumerated slots'
+# candidate tables instead of drawing them independently, so every
+# combination appears at most once.
+#
+# Position p of the walk maps to a product index (mixed radix, the last
+# enumerated slot varying fastest, like itertools.product) through the order:
+#   product     index = p
+#   shuffled    index = a keyed Feistel permutation of p (cycle-walked into
+#               range), so any prefix is a uniform sample without repeats
+#   stratified  index = (offset + p * stride) mod N with a golden-ratio stride
+#               coprime to N: every slot's values recur evenly along the walk
+# Each position is computed on its own, so memory stays O(1), the product is
+# never materialised and shards can start anywhere. Item p uses seed + p, and
+# random slots that are not enumerated are drawn from the substreams of that
+# seed (see substreams), as in the batch engines. Combinations ruled out by "excludes" tags are
+# skipped, so a walk of count positions may yield fewer items. In product order
+# a ruled-out combination rules out the whole block of indices sharing its
+# digits up to the conflicting slot, so the walk jumps straight to the next
+# allowed index (next_allowed). The other orders scatter positions over the
+# product and test them one by one: a walk is slower by the inverse of the
+# fraction of allowed combinations.
+import hashlib
+import random
+from math import gcd
+from .ethnic_outfit_common import ORDERS, compile_region
+from .substreams import GOLDEN, MASK64, SeedStream, mix64
+
+FEISTEL_ROUNDS = 4
+
+
+class FeistelPermutation:
+    """Keyed bijection of range(n), evaluated per index in O(1) memory."""
+
+    def __init__(self, n, key):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [mix64((key + r * GOLDEN) & MASK64) for r in range(FEISTEL_ROUNDS)]
+
+    def _round(self, k, value):
+        if self.half <= 64:
+            return mix64(value ^ k) & self.mask
+        digest = hashlib.blake2b(value.to_bytes((self.half + 7) // 8, "little"), digest_size=(self.half + 7) // 8,
+                                 key=k.to_bytes(8, "little")).digest()
+        return int.from_bytes(digest, "little") & self.mask
+
+    def _encrypt(self, x):
+        left, right = x >> self.half, x & self.mask
+        for k in self.keys:
+            left, right = right, left ^ self._round(k, right)
+        return (left << self.half) | right
+
+    def __call__(self, i):
+        # Cycle walking: the domain is under 4n, so this takes a few rounds on average
+        x = self._encrypt(i)
+        while x >= self.n:
+            x = self._encrypt(x)
+        return x
+
+
+def golden_stride(n):
+    # Step near n / phi that is coprime to n, so the walk visits every index once
+    if n <= 2:
+        return 1
+    stride = max(1, n * 6180339887498949 // 10 ** 16)
+    while gcd(stride, n) != 1:
+        stride += 1
+    return stride
+
+
+class CombinationSpace:
+    """
+    The product of the enumerated slots' SlotTables for one request. fixed and
+    the remaining random slots come from the generator's slot_plan.
+    """
+
+    def __init__(self, generator, kwargs, slots=None):
+        self.compiled = compile_region(generator.region_code)
+        self.fixed, random_slots = generator.slot_plan(kwargs, self.compiled)
+        selected = [s.strip() for s in slots.split(",")] if isinstance(slots, str) else slots
+        selected = [s for s in selected or () if s]
+        unknown = [s for s in selected if s not in self.compiled.slots]
+        if unknown:
+            raise ValueError(f"Unknown slots to enumerate: {', '.join(unknown)}")
+        # By default every random slot is enumerated; slots fixed by the inputs stay fixed
+        self.axes = [(slot, table) for slot, table in random_slots if not selected or slot in selected]
+        self.rest = [(slot, table) for slot, table in random_slots if selected and slot not in selected]
+        self.size = 1
+        for _, table in self.axes:
+            self.size *= len(table)
+
+    def order(self, name, seed):
+        # position -> product index
+        if name == "product":
+            return lambda p: p
+        if name == "shuffled":
+            return FeistelPermutation(self.size, seed & MASK64)
+        if name == "stratified":
+            stride = golden_stride(self.size)
+            offset = mix64(seed & MASK64) % self.size
+            return lambda p: (offset + p * stride) % self.size
+        raise ValueError(f"Unknown enumeration order '{name}'; expected one of {', '.join(ORDERS[1:])}")
+
+    def digits(self, index):
+        """(slot, table, candidate index) per enumerated slot for product index (0 <= index < size)."""
+        digits = []
+        for slot, table in reversed(self.axes):
+            index, k = divmod(index, len(table))
+            digits.append((slot, table, k))
+        return digits
+
+    def combination(self, index):
+        return {slot: table.names[k] for slot, table, k in self.digits(index)}
+
+    def allowed(self, digits):
+        # False when two enumerated values exclude each other (fixed values already narrowed the tables)
+        exclusions = self.compiled.exclusions()
+        if not exclusions:
+            return True
+        positions = {slot: table.position(k) for slot, table, k in digits}
+        for slot, table, k in digits:
+            if _excluded(exclusions, slot, table.names[k], positions):
+                return False
+        return True
+
+    def next_allowed(self, index):
+        """Smallest product index >= index whose combination is allowed; size when there is none."""
+        exclusions = self.compiled.exclusions()
+        if not exclusions or index >= self.size:
+            return min(index, self.size)
+        sizes = [len(table) for _, table in self.axes]
+        digits = []
+        for size in reversed(sizes):
+            index, k = divmod(index, size)
+            digits.append(k)
+        digits.reverse()  # most significant first, like self.axes
+        chosen = {}  # slot -> catalog position, for the axes before j
+        j = 0
+        while j < len(digits):
+            slot, table = self.axes[j]
+            k = digits[j]
+            # Exclusions are stored in both directions, so checking against the earlier axes is enough
+            while k < sizes[j] and _excluded(exclusions, slot, table.names[k], chosen):
+                k += 1
+            if k == sizes[j]:
+                # No value of this axis goes with the earlier ones: carry into the previous axis
+                if j == 0:
+                    return self.size
+                j -= 1
+                del chosen[self.axes[j][0]]
+                digits[j] += 1
+                digits[j + 1:] = [0] * (len(digits) - j - 1)
+                continue
+            if k != digits[j]:
+                digits[j] = k
+                digits[j + 1:] = [0] * (len(digits) - j - 1)
+            chosen[slot] = table.position(k)
+            j += 1
+        index = 0
+        for size, k in zip(sizes, digits):
+            index = index * size + k
+        return index
+
+
+def _excluded(exclusions, slot, name, positions):
+    # True when slot's value name excludes one of the other slots' catalog positions
+    for other, excluded in exclusions.get((slot, name), {}).items():
+        if positions.get(other, -1) in excluded:
+            return True
+    return False
+
+
+def iter_enumerate(generator, count, start=0, order="product", slots=None, fill=False, **kwargs):
+    """
+    Yields (seed + p, values, description) for walk positions p in
+    start .. start + count - 1 (stopping at the end of the product). With
+    fill, the walk goes on past excluded combinations until count items
+    have been yielded.
+    """
+    seed = kwargs.get("seed", 0)
+    if seed is None:
+        seed = random.getrandbits(64)
+    space = CombinationSpace(generator, kwargs, slots)
+    index_of = space.order(order, seed)
+    options = generator.description_options(kwargs, space.compiled)
+    exclusions = space.compiled.exclusions()
+    build = generator.build_description
+    stop = min(start + count, space.size)
+    product = order == "product"
+    p = start
+    while p < stop:
+        if exclusions and product:
+            allowed = space.next_allowed(p)
+            if fill:
+                stop = min(stop + allowed - p, space.size)
+            p = allowed
+            if p >= stop:
+                break
+        digits = space.digits(index_of(p))
+        p += 1
+        if exclusions and not product and not space.allowed(digits):
+            if fill and stop < space.size:
+                stop += 1
+            continue
+        values = dict(space.fixed)
+        for slot, table, k in digits:
+            values[slot] = table.names[k]
+        item_seed = (seed + p - 1) & MASK64
+        if space.rest:
+            stream = SeedStream(item_seed)
+            if exclusions:
+                generator.draw_excluding(stream, values, space.rest, space.compiled, options["gender"], options["age"])
+            else:
+                for slot, table in space.rest:
+                    values[slot] = table.value(stream.uniform(slot))
+        yield item_seed, values, build(values, **options)
+
+
+def generate_batch(generator, batch_size, start=0, order="product", slots=None, **kwargs):
+    """batch_size descriptions (fewer only at the end of the walk) and their item seeds, from position start."""
+    descriptions = []
+    seeds = []
+    for item_seed, _, description in iter_enumerate(generator, batch_size, start, order, slots, fill=True, **kwargs):
+        descriptions.append(description)
+        seeds.append(item_seed)
+    return descriptions, seeds
@@ -1,55 +1,566 @@
+import hashlib
 import random
 import json
 import os
-import re
+import threading
+import time
+from collections.abc import Mapping
+from .catalog_index import CatalogIndex
+from .catalog_pack import CatalogPack, PackedList, StringView
+from .instrumentation import METRICS
+from .sampling import TAG_KEYS, build_table, normalize_tags, subset
+from .substreams import MASK64, UNIT, SeedStream, slot_key, splitmix64, uniform
+from .templates import REGION_FILE, TARGETS_DIR, build_template, merge_specs, target_names
 
 CATEGORY = "🌀WizDroid/PromptGen"
 
+DATA_DIR = os.environ.get(
+    "COMFYUI_OUTFITS_DATA_DIR",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data")),
+)
+# Seconds between checks that a compiled region's catalog files are unchanged (0 = every call)
+CATALOG_CHECK_INTERVAL = float(os.environ.get("COMFYUI_OUTFITS_CATALOG_CHECK_INTERVAL", 1.0))
+
+
+class CatalogStore:
+    """
+    Process-wide cache of the JSON catalogs under data/.
+    Each file is parsed once and re-read only when its mtime or size changes,
+    so INPUT_TYPES, node instantiation and generation share the same objects.
+    Cached values are shared between callers and must not be mutated.
+
+    When data/catalog.pack (see catalog_pack) is present, files whose size and
+    mtime still match the pack are served from it as lazily decoded, memory-
+    mapped PackedList / PackedDict values; edited files fall back to JSON.
+    The pack only stands in for files that exist: a deleted JSON file is gone
+    even while a stale pack still holds it.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._files = {}  # path -> (mtime_ns, size, parsed value, True if decoded from the pack)
+        self._dirs = {}   # dir path -> (mtime_ns, sorted json file names)
+        self._subdirs = None  # (stamp, sorted sub-directory names of data/)
+        self._pack = None
+        self._pack_stamp = None
+        self.generation = 0  # bumped when a replaced pack is closed (see pack())
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, *parts):
+        return os.path.join(self.data_dir, *parts)
+
+    def pack(self):
+        # The catalog pack, reopened when the pack file is rebuilt; None if absent or unreadable.
+        # A replaced pack is closed once the values decoded from it are dropped from the cache;
+        # generation tells holders of such values (compiled regions) to reload.
+        path = self.path("catalog.pack")
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp != self._pack_stamp:
+            old = self._pack
+            self._pack = None
+            if stamp is not None:
+                try:
+                    self._pack = CatalogPack(path)
+                except (OSError, ValueError) as e:
+                    print(f"Outfits: Ignoring catalog pack {path}: {e}")
+            self._pack_stamp = stamp
+            if old is not None:
+                self._files = {p: entry for p, entry in self._files.items() if not entry[3]}
+                self.generation += 1
+                old.close()
+        return self._pack
+
+    def load(self, *parts):
+        # Raises OSError / ValueError like open() + json.load() would
+        path = self.path(*parts)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._files.get(path)
+        if cached is not None and cached[:2] == stamp:
+            self.hits += 1
+            return cached[2]
+        with self._lock:
+            pack = self.pack()
+            packed = pack.entry("/".join(parts)) if pack is not None else None
+            if packed is not None and packed[:2] == stamp:
+                with METRICS.timed("catalog.load", file="/".join(parts), source="pack"):
+                    value = pack.value(packed[2])
+            else:
+                with METRICS.timed("catalog.load", file="/".join(parts), source="json"):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        value = json.load(f)
+                METRICS.count("catalog.bytes_read", stamp[1])
+            self._files[path] = (stamp[0], stamp[1], value, packed is not None and packed[:2] == stamp)
+            self.misses += 1
+        return value
+
+    def version(self, *parts):
+        # (mtime_ns, size) of a file as last loaded, or None if it was never loaded
+        cached = self._files.get(self.path(*parts))
+        return cached[:2] if cached is not None else None
+
+    def load_default(self, *parts, default=None):
+        try:
+            return self.load(*parts)
+        except Exception:
+            return default
+
+    def list_json(self, *parts):
+        path = self.path(*parts)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._dirs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        names = tuple(sorted(f for f in os.listdir(path) if f.endswith('.json')))
+        self._dirs[path] = (mtime, names)
+        return names
+
+    def list_dirs(self):
+        # Directories directly under data/
+        try:
+            mtime = os.stat(self.data_dir).st_mtime_ns
+        except FileNotFoundError:
+            return ()
+        if self._subdirs is not None and self._subdirs[0] == mtime:
+            return self._subdirs[1]
+        names = tuple(sorted(entry.name for entry in os.scandir(self.data_dir) if entry.is_dir()))
+        self._subdirs = (mtime, names)
+        return names
+
+    def load_region(self, region_code):
+        # Returns a fresh dict (key -> parsed file) so callers may add keys safely
+        with self._lock:
+            self.pack()  # picks up a rebuilt pack (and closes the old one)
+        return {fname[:-len('.json')]: self.load(region_code, fname) for fname in self.list_json(region_code)}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "files": len(self._files),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._dirs.clear()
+            self._subdirs = None
+            self.hits = 0
+            self.misses = 0
+
+
+CATALOG = CatalogStore()
+METRICS.gauge("catalog", CATALOG.stats)
+
+
+def catalog_stats():
+    return CATALOG.stats()
+
+
+def get_country_info(region_code, default=None):
+    if default is None:
+        default = {"name": region_code.upper(), "flag": ""}
+    codes = CATALOG.load_default('common', 'country_codes.json', default={})
+    return codes.get(region_code, default) if isinstance(codes, Mapping) else default
+
+
+# Sampling slots in draw order: slot -> (source, key)
+# source is the region directory, "styles", "jewelry" (key is the part) or "poses"
+# (region poses merged with data/styles/poses.json).
+# "excludes" tags narrow the slots drawn after the entry, so garments that rule out
+# others (a qipao leaves no room for a skirt) are drawn first: torso before legs.
+SLOT_SOURCES = {
+    "head_gear": ("region", "head_gear"),
+    "chest_clothing": ("region", "chest_clothing"),
+    "torso_clothing": ("region", "torso_clothing"),
+    "leg_clothing": ("region", "leg_clothing"),
+    "arm_clothing": ("region", "arm_clothing"),
+    "jewelry_head": ("jewelry", "head"),
+    "jewelry_wrist": ("jewelry", "wrist"),
+    "jewelry_hand": ("jewelry", "hand"),
+    "jewelry_ankle": ("jewelry", "ankle"),
+    "jewelry_waist": ("jewelry", "waist"),
+    "jewelry_ears": ("jewelry", "ears"),
+    "jewelry_nose": ("jewelry", "nose"),
+    "footwear": ("region", "footwear"),
+    "fabric_colors": ("region", "fabric_colors"),
+    "hair_style": ("styles", "hair_styles"),
+    "pose": ("poses", None),
+    "fabric_materials": ("region", "fabric_materials"),
+    "fabric_designs": ("region", "fabric_designs"),
+}
+
+
+CACHE_MODES = ["always reroll", "deterministic"]
+
+# Sampling engines for batch/bulk generation: per-item substreams, or vector_engine (NumPy) on whole batches
+ENGINES = ["python", "numpy"]
+
+# Batch/bulk item order: independent draws, or a walk over the slot combinations (see enumeration)
+ORDERS = ["random", "product", "shuffled", "stratified"]
+
+
+def _entry_names(entries, part=None):
+    # Plain string entries, or the "name" of dict entries (only those of the given jewelry part)
+    if isinstance(entries, PackedList):
+        return StringView(entries.pack, entries.name_ids(part))
+    if not isinstance(entries, list):
+        return ()
+    if part is not None:
+        entries = [e for e in entries if isinstance(e, dict) and e.get("part") == part]
+    names = (e.get("name") if isinstance(e, dict) else e for e in entries)
+    return tuple(n for n in names if isinstance(n, str) and n not in ("random", "disabled"))
+
+
+def _entry_tags(entries, part=None):
+    # Position (in _entry_names order) -> normalized sampling tags, for the entries that carry any
+    if isinstance(entries, PackedList):
+        raw = entries.tags(part, TAG_KEYS)
+    elif isinstance(entries, list):
+        if part is not None:
+            entries = [e for e in entries if isinstance(e, dict) and e.get("part") == part]
+        raw = {}
+        position = 0
+        for e in entries:
+            name = e.get("name") if isinstance(e, dict) else e
+            if not isinstance(name, str) or name in ("random", "disabled"):
+                continue
+            if isinstance(e, dict):
+                found = {key: e[key] for key in TAG_KEYS if key in e}
+                if found:
+                    raw[position] = found
+            position += 1
+    else:
+        return {}
+    return {position: normalize_tags(found) for position, found in raw.items()}
+
+
+def _merge_unique(first, first_tags, second, second_tags):
+    # Order-preserving union; packed views dedupe by interned string id without decoding.
+    # A name keeps the tags of its first tagged occurrence.
+    if isinstance(first, StringView) and isinstance(second, StringView) and first.pack is second.pack:
+        merged = first.merged(second)
+        keys = list(first.ids) + list(second.ids)
+    else:
+        keys = list(first) + list(second)
+        merged = tuple(dict.fromkeys(keys))
+    if not first_tags and not second_tags:
+        return merged, {}
+    index = {}
+    for key in keys:
+        index.setdefault(key, len(index))
+    tags = {}
+    for offset, entries in ((0, first_tags), (len(first), second_tags)):
+        for position, found in entries.items():
+            tags.setdefault(index[keys[offset + position]], found)
+    return merged, tags
+
+
+def _for_region(names, tags, region_code):
+    # Drops entries whose "region" tag does not list region_code
+    kept = [p for p in range(len(names)) if region_code in tags.get(p, {}).get("region", (region_code,))]
+    if len(kept) == len(names):
+        return names, tags
+    new_position = {p: i for i, p in enumerate(kept)}
+    return subset(names, kept), {new_position[p]: found for p, found in tags.items() if p in new_position}
+
+
+def _build_exclusions(slots, tags):
+    # {(slot, name): {other slot: frozenset(positions)}} from the "excludes" tags, in both directions
+    if not any("excludes" in found for slot_tags in tags.values() for found in slot_tags.values()):
+        return {}
+    where = {}
+    for slot, names in slots.items():
+        for position, name in enumerate(names):
+            where.setdefault(name, []).append((slot, position))
+    pairs = {}
+    for slot, slot_tags in tags.items():
+        for position, found in slot_tags.items():
+            name = slots[slot][position]
+            for other_name in found.get("excludes", ()):
+                for other_slot, other_position in where.get(other_name, ()):
+                    if other_slot == slot:
+                        continue
+                    pairs.setdefault((slot, name), {}).setdefault(other_slot, set()).add(other_position)
+                    pairs.setdefault((other_slot, other_name), {}).setdefault(slot, set()).add(position)
+    return {key: {other: frozenset(positions) for other, positions in hit.items()} for key, hit in pairs.items()}
+
+
+class CompiledRegion:
+    """
+    Immutable sampling tables for one region: every slot maps to a sequence of
+    entry names (a tuple, or a lazily decoded StringView when the catalog comes
+    from the pack), so a generation call only has to draw indices. Entries
+    with sampling tags (see sampling.py) get per-constraint SlotTables, built
+    on first use, and description templates (see templates.py) are compiled
+    per target and mode the same way. Each slot's CatalogIndex (dropdown
+    values, validation and search) is also built on first use.
+    """
+
+    __slots__ = ("region_code", "slots", "tags", "templates", "keys", "sources", "version", "_tables", "_exclusions", "_templates", "_indexes", "_plans")
+
+    def __init__(self, region_code, slots, tags, templates, keys, sources, version):
+        self.region_code = region_code
+        self.slots = slots
+        self.tags = tags
+        self.templates = templates
+        self.keys = keys
+        self.sources = sources
+        self.version = version
+        self._tables = {}
+        self._exclusions = None
+        self._templates = {}
+        self._indexes = {}
+        self._plans = {}
+
+    def options(self, slot, add_disabled=True):
+        # Dropdown values for INPUT_TYPES (cached; capped by COMFYUI_OUTFITS_MAX_OPTIONS)
+        return self.index(slot).options(("random", "disabled") if add_disabled else ("random",))
+
+    def index(self, slot):
+        index = self._indexes.get(slot)
+        if index is None:
+            index = self._indexes[slot] = CatalogIndex(self.slots[slot])
+        return index
+
+    def is_current(self, keys, sources):
+        # Parsed files are replaced (never mutated) by the catalog cache, so identity means unchanged
+        return keys == self.keys and all(a is b for a, b in zip(sources, self.sources))
+
+    def table(self, slot, gender=None, age=None, excluded=frozenset()):
+        """SlotTable for one constraint combination (cached); None when no entry qualifies."""
+        if not self.tags[slot]:
+            gender = age = None  # nothing to filter on, share one table
+        key = (slot, gender, age, excluded)
+        table = self._tables.get(key)
+        if table is None and key not in self._tables:
+            table = self._tables[key] = build_table(self.slots[slot], self.tags[slot], gender, age, excluded)
+        return table
+
+    def draw_plan(self, fixed, random_slots, gender="unisex", age="random"):
+        """DrawPlan of a slot_plan split (cached; the split follows from the fixed values, gender and age)."""
+        key = (tuple(fixed.items()), gender, age)
+        plan = self._plans.get(key)
+        if plan is None:
+            if len(self._plans) >= MAX_DRAW_PLANS:
+                self._plans.clear()
+            plan = self._plans[key] = DrawPlan(self, fixed, random_slots, gender, age)
+        return plan
+
+    def template(self, target="default", detailed=True):
+        """Compiled DescriptionTemplate for a target model; unknown targets use "default"."""
+        key = (target, detailed)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = build_template(self.templates, target, detailed)
+        return template
+
+    def exclusions(self):
+        if self._exclusions is None:
+            self._exclusions = _build_exclusions(self.slots, self.tags)
+        return self._exclusions
+
+    def excluded_by(self, values):
+        # {slot: frozenset(positions)} ruled out by the "excludes" tags of the given slot values
+        exclusions = self.exclusions()
+        excluded = {}
+        if exclusions:
+            for slot, value in values.items():
+                for other, positions in exclusions.get((slot, value), {}).items():
+                    excluded[other] = excluded.get(other, frozenset()) | positions
+        return excluded
+
+
+MAX_DRAW_PLANS = 256  # cached DrawPlans per compiled region
+
+_compiled_regions = {}  # region code -> (monotonic time of the last freshness check, CATALOG.generation, CompiledRegion)
+
+
+def compile_region(region_code):
+    # Reuses the compiled tables as long as the catalog cache hands back the same parsed files.
+    # Checking that stats every catalog file, so it runs at most once per CATALOG_CHECK_INTERVAL
+    # and a generation call in between is only index draws.
+    cached = _compiled_regions.get(region_code)
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < CATALOG_CHECK_INTERVAL and cached[1] == CATALOG.generation:
+        return cached[2]
+    data = CATALOG.load_region(region_code)
+    styles = {key: CATALOG.load_default('styles', key + '.json') for key in ("hair_styles", "poses")}
+    targets = load_targets()
+    keys = tuple(data) + tuple(targets)
+    sources = tuple(data.values()) + tuple(styles.values()) + tuple(targets.values())
+    compiled = cached[2] if cached is not None else None
+    if compiled is None or not compiled.is_current(keys, sources):
+        with METRICS.timed("outfit.compile", region=region_code):
+            compiled = _compile_tables(region_code, data, styles, targets, keys, sources)
+    _compiled_regions[region_code] = (now, CATALOG.generation, compiled)
+    return compiled
+
+
+_file_indexes = {}
+
+
+def catalog_index(*parts):
+    """CatalogIndex over the entry names of a catalog file (the keys of a dict file), rebuilt when it changes."""
+    value = CATALOG.load(*parts)
+    cached = _file_indexes.get(parts)
+    if cached is not None and cached[0] is value:
+        return cached[1]
+    index = CatalogIndex(tuple(value) if isinstance(value, Mapping) else _entry_names(value))
+    _file_indexes[parts] = (value, index)
+    return index
+
+
+def load_targets():
+    # Shared description templates: target name -> {"detailed": ..., "simple": ...}
+    try:
+        names = CATALOG.list_json(TARGETS_DIR)
+    except FileNotFoundError:
+        return {}
+    targets = {}
+    for name in names:
+        # One unreadable target file must not take every region down with it
+        try:
+            targets[name[:-len('.json')]] = CATALOG.load(TARGETS_DIR, name)
+        except (OSError, ValueError) as e:
+            print(f"Outfits: Ignoring template file {name}: {e}")
+    return targets
+
+
+def _compile_tables(region_code, data, styles, targets, keys, sources):
+    slots = {}
+    tags = {}
+    for slot, (source, key) in SLOT_SOURCES.items():
+        if source == "region":
+            entries, part = data.get(key, []), None
+        elif source == "styles":
+            entries, part = styles.get(key), None
+        elif source == "jewelry":
+            entries, part = data.get("jewelry", []), key
+        else:
+            entries = None
+        if entries is not None:
+            names, found = _entry_names(entries, part), _entry_tags(entries, part)
+        else:
+            region_poses, style_poses = data.get("poses", []), styles.get("poses")
+            names, found = _merge_unique(_entry_names(region_poses), _entry_tags(region_poses),
+                                         _entry_names(style_poses), _entry_tags(style_poses))
+        if found:
+            names, found = _for_region(names, found, region_code)
+        slots[slot] = names
+        tags[slot] = found
+    # Catalog fingerprint: changes whenever any file feeding the tables changes
+    stamps = [(key, CATALOG.version(region_code, key + '.json')) for key in data]
+    stamps += [(key, CATALOG.version('styles', key + '.json')) for key in styles]
+    stamps += [(key, CATALOG.version(TARGETS_DIR, key + '.json')) for key in targets]
+    version = hashlib.sha1(repr(stamps).encode("utf-8")).hexdigest()
+    templates = merge_specs(targets, data.get(REGION_FILE))
+    return CompiledRegion(region_code, slots, tags, templates, keys, sources, version)
+
+
+class DrawPlan:
+    """
+    The random slots of one request, prepared for drawing many items:
+    values(seed) equals SeedStream(seed) through draw_excluding, with the
+    substream arithmetic and SlotTable.pick inlined over each table's
+    draw_state(). For catalogs with "excludes" tags, triggers[j] maps a value
+    of random slot j to the (later random slot, positions) pairs it narrows,
+    and the narrowed tables are cached per (slot, excluded set); requests
+    without exclusions skip all of that.
+    """
+
+    def __init__(self, compiled, fixed, random_slots, gender="unisex", age="random"):
+        self.compiled = compiled
+        self.fixed = fixed
+        self.gender = gender
+        self.age = age
+        self.slots = [(slot, slot_key(slot), table.draw_state()) for slot, table in random_slots]
+        self.triggers = None
+        exclusions = compiled.exclusions()
+        if exclusions:
+            order = {slot: j for j, (slot, _) in enumerate(random_slots)}
+            self.triggers = [{} for _ in random_slots]
+            for (slot, name), hit in exclusions.items():
+                j = order.get(slot)
+                if j is not None:
+                    later = tuple((order[other], positions) for other, positions in hit.items() if order.get(other, -1) > j)
+                    if later:
+                        self.triggers[j][name] = later
+            excluded = compiled.excluded_by(fixed)
+            self.excluded = [excluded.get(slot, frozenset()) for slot, _ in random_slots]
+            self._narrowed = {}
+
+    def narrowed(self, j, excluded):
+        # draw_state of random slot j under an excluded set (None when nothing qualifies), cached
+        key = (j, excluded)
+        state = self._narrowed.get(key, key)
+        if state is key:
+            table = self.compiled.table(self.slots[j][0], self.gender, self.age, excluded)
+            state = self._narrowed[key] = None if table is None else table.draw_state()
+        return state
+
+    def values(self, seed):
+        values = dict(self.fixed)
+        base = splitmix64(seed & MASK64)
+        triggers = self.triggers
+        narrowed = None  # random slot index -> excluded set, once an earlier value narrows it
+        for j, (slot, key, state) in enumerate(self.slots):
+            if narrowed is not None and j in narrowed:
+                state = self.narrowed(j, narrowed[j])
+                if state is None:
+                    values[slot] = ""
+                    continue
+            n, prob, alias, names, decoded = state
+            # SeedStream(seed).uniform(slot), then SlotTable.pick
+            x = base ^ key
+            x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & MASK64
+            x = (x ^ (x >> 27)) * 0x94d049bb133111eb & MASK64
+            x = ((x ^ (x >> 31)) >> 11) * UNIT * n
+            k = int(x)
+            if k >= n:
+                k = n - 1
+            if prob is not None and x - k >= prob[k]:
+                k = alias[k]
+            value = decoded[k]
+            if value is None:
+                value = decoded[k] = names[k]
+            values[slot] = value
+            if triggers is not None:
+                hit = triggers[j].get(value)
+                if hit:
+                    if narrowed is None:
+                        narrowed = {}
+                    for other, positions in hit:
+                        narrowed[other] = narrowed.get(other, self.excluded[other]) | positions
+        return values
+
+
 class EthnicOutfitGenerator:
     def __init__(self, region_code, seed=None):
         self.region_code = region_code
-        self.data_dir = os.path.join(os.path.dirname(__file__), "..", "data", region_code)
+        self.data_dir = CATALOG.path(region_code)
         self.seed = seed
-        self.rng = random.Random(seed) if seed is not None else None
-        # Load all relevant data files dynamically
-        self.data = {}
-        for fname in os.listdir(self.data_dir):
-            if fname.endswith('.json'):
-                key = fname.replace('.json', '')
-                with open(os.path.join(self.data_dir, fname), 'r', encoding='utf-8') as f:
-                    self.data[key] = json.load(f)
-        # Load country info from common JSON
-        self.country_info = {"name": region_code.upper(), "flag": ""}
-        try:
-            common_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'common', 'country_codes.json')
-            with open(common_path, 'r', encoding='utf-8') as f:
-                self.country_info = json.load(f).get(region_code, self.country_info)
-        except Exception:
-            pass
-
-    def get_choice(self, input_str, default_choices):
-        if input_str.lower() == "disabled":
-            return ""
-        elif input_str.lower() == "random":
-            # Only pick from non-random, non-disabled options
-            item_names = [c["name"] if isinstance(c, dict) else c for c in default_choices if c not in ("random", "disabled")]
-            if not item_names:
-                return ""
-            if self.rng is not None:
-                return self.rng.choice(item_names)
-            else:
-                return random.choice(item_names)
-        else:
-            return input_str
+        # Load all relevant data files through the shared catalog cache
+        self.data = CATALOG.load_region(region_code)
+        self.country_info = get_country_info(region_code)
 
-    def clean_description(self, description):
-        description = re.sub(" +", " ", description)
-        description = description.replace(" , ", ", ")
-        description = description.replace("., ", ", ")
-        description = description.strip()
-        if description.endswith(","):
-            description = description[:-1]
-        return description
+    @classmethod
+    def IS_CHANGED(cls, cache_mode="always reroll", **kwargs):
+        # "deterministic": output depends only on the inputs, the seed and the catalog files,
+        # so ComfyUI may reuse the previous result and skip downstream nodes.
+        if cache_mode != "deterministic" or kwargs.get("seed") is None:
+            return float("nan")
+        region_code = getattr(cls, 'region_code', None)
+        raw = json.dumps([region_code, compile_region(region_code).version, sorted(kwargs.items())], default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -58,186 +569,235 @@ class EthnicOutfitGenerator:
         region_code = getattr(cls, 'region_code', None)
         if not region_code:
             raise ValueError("region_code must be set on the node class!")
-        data_dir = os.path.join(os.path.dirname(__file__), "..", "data", region_code)
-        styles_dir = os.path.join(os.path.dirname(__file__), "..", "data", "styles")
-        def load_options(key, from_styles=False, append_common_poses=False, default_random=True, add_disabled=True):
-            options = ["random"]
-            if add_disabled:
-                options.append("disabled")
-            try:
-                if from_styles:
-                    with open(os.path.join(styles_dir, key + '.json'), 'r', encoding='utf-8') as f:
-                        loaded = json.load(f)
-                        if isinstance(loaded, list):
-                            options += loaded
-                else:
-                    with open(os.path.join(data_dir, key + '.json'), 'r', encoding='utf-8') as f:
-                        loaded = json.load(f)
-                        if isinstance(loaded, list):
-                            options += loaded
-                # Append common poses if requested
-                if append_common_poses and key == 'poses':
-                    try:
-                        with open(os.path.join(styles_dir, 'poses.json'), 'r', encoding='utf-8') as f:
-                            common_poses = json.load(f)
-                            if isinstance(common_poses, list):
-                                for pose in common_poses:
-                                    if pose not in options:
-                                        options.append(pose)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-            return options
-        def load_jewelry_options(part):
-            # Loads jewelry.json and filters by part
-            region_code = getattr(cls, 'region_code', None)
-            data_dir = os.path.join(os.path.dirname(__file__), "..", "data", region_code)
-            options = ["random", "disabled"]
-            try:
-                with open(os.path.join(data_dir, 'jewelry.json'), 'r', encoding='utf-8') as f:
-                    loaded = json.load(f)
-                    if isinstance(loaded, list):
-                        filtered = [j["name"] for j in loaded if isinstance(j, dict) and j.get("part") == part]
-                        options += filtered
-            except Exception:
-                pass
-            return options
+        tables = compile_region(region_code)
         return {
             "required": {
                 # Gender and age on top (no 'disabled')
                 "gender": (["unisex", "male", "female", "transexual"], {"default": "random"}),
                 "age": (["random", "infant", "young child", "older child", "teen", "young adult", "adult", "middle aged", "elderly"], {"default": "random"}),
                 # Sorted head to toe, chest_clothing and artists removed
-                "hair_style": (load_options('hair_styles', from_styles=True, add_disabled=True), {"default": "random"}),
-                "head_gear": (load_options('head_gear', add_disabled=True), {"default": "random"}),
-                "torso_clothing": (load_options('torso_clothing', add_disabled=False), {"default": "random"}),
-                "arm_clothing": (load_options('arm_clothing', add_disabled=True), {"default": "random"}),
-                "jewelry_head": (load_jewelry_options('head'), {"default": "random"}),
-                "jewelry_wrist": (load_jewelry_options('wrist'), {"default": "random"}),
-                "jewelry_hand": (load_jewelry_options('hand'), {"default": "random"}),
-                "jewelry_ankle": (load_jewelry_options('ankle'), {"default": "random"}),
-                "jewelry_waist": (load_jewelry_options('waist'), {"default": "random"}),
-                "jewelry_ears": (load_jewelry_options('ears'), {"default": "random"}),
-                "jewelry_nose": (load_jewelry_options('nose'), {"default": "random"}),
-                "fabric_colors": (load_options('fabric_colors', add_disabled=True), {"default": "random"}),
-                "leg_clothing": (load_options('leg_clothing', add_disabled=True), {"default": "random"}),
-                "footwear": (load_options('footwear', add_disabled=True), {"default": "random"}),
-                "pose": (load_options('poses', append_common_poses=True, add_disabled=True), {"default": "random"}),
+                "hair_style": (tables.options('hair_style'), {"default": "random"}),
+                "head_gear": (tables.options('head_gear'), {"default": "random"}),
+                "torso_clothing": (tables.options('torso_clothing', add_disabled=False), {"default": "random"}),
+                "arm_clothing": (tables.options('arm_clothing'), {"default": "random"}),
+                "jewelry_head": (tables.options('jewelry_head'), {"default": "random"}),
+                "jewelry_wrist": (tables.options('jewelry_wrist'), {"default": "random"}),
+                "jewelry_hand": (tables.options('jewelry_hand'), {"default": "random"}),
+                "jewelry_ankle": (tables.options('jewelry_ankle'), {"default": "random"}),
+                "jewelry_waist": (tables.options('jewelry_waist'), {"default": "random"}),
+                "jewelry_ears": (tables.options('jewelry_ears'), {"default": "random"}),
+                "jewelry_nose": (tables.options('jewelry_nose'), {"default": "random"}),
+                "fabric_colors": (tables.options('fabric_colors'), {"default": "random"}),
+                "leg_clothing": (tables.options('leg_clothing'), {"default": "random"}),
+                "footwear": (tables.options('footwear'), {"default": "random"}),
+                "pose": (tables.options('pose'), {"default": "random"}),
                 "detailed_description": (["enabled", "disabled"], {"default": "enabled"}),
                 "trigger_word": ("STRING", {"default": ""}),
                 "custom_text": ("STRING", {"default": ""}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+            },
+            "optional": {
+                # "always reroll" re-executes on every queue; "deterministic" lets ComfyUI cache by inputs + seed
+                "cache_mode": (CACHE_MODES, {"default": "always reroll"}),
+                "fabric_materials": (tables.options('fabric_materials'), {"default": "random"}),
+                "fabric_designs": (tables.options('fabric_designs'), {"default": "random"}),
+                # Description template: "default", or one tuned for a target model (data/templates/)
+                "template": (target_names(tables.templates) or ["default"], {"default": "default"}),
             }
         }
 
+    @classmethod
+    def VALIDATE_INPUTS(cls, hair_style=None, head_gear=None, torso_clothing=None, arm_clothing=None,
+                        jewelry_head=None, jewelry_wrist=None, jewelry_hand=None, jewelry_ankle=None,
+                        jewelry_waist=None, jewelry_ears=None, jewelry_nose=None, fabric_colors=None,
+                        leg_clothing=None, footwear=None, pose=None, fabric_materials=None, fabric_designs=None):
+        # ComfyUI leaves the inputs named here to this method: one index lookup per catalog combo
+        # instead of a scan of its option list, which may also be capped (see catalog_index)
+        values = dict(locals())
+        del values["cls"]
+        compiled = compile_region(cls.region_code)
+        for slot, value in values.items():
+            if value is None:
+                continue
+            # torso_clothing has no "disabled" option (see INPUT_TYPES)
+            specials = ("random",) if slot == "torso_clothing" else ("random", "disabled")
+            if value not in specials and value not in compiled.index(slot):
+                return f"Value not in list: {slot}: '{value}' is not in the {cls.region_code} catalog"
+        return True
+
+    def slot_plan(self, kwargs, compiled=None):
+        # Splits slots into values fixed by the inputs and (slot, SlotTable) pairs that must be drawn.
+        # The tables honour the gender/age tags and the "excludes" of the fixed values.
+        compiled = compiled or compile_region(self.region_code)
+        gender = kwargs.get("gender", "unisex")
+        age = kwargs.get("age", "random")
+        fixed = {}
+        pending = []
+        for slot in compiled.slots:
+            value = kwargs.get(slot, "")
+            choice = value.lower()
+            if choice == "disabled":
+                fixed[slot] = ""
+            elif choice == "random":
+                pending.append(slot)
+            else:
+                fixed[slot] = value
+        excluded = compiled.excluded_by(fixed)
+        random_slots = []
+        for slot in pending:
+            table = compiled.table(slot, gender, age, excluded.get(slot, frozenset()))
+            if table is None:
+                fixed[slot] = ""
+            else:
+                random_slots.append((slot, table))
+        return fixed, random_slots
+
+    @staticmethod
+    def draw_excluding(stream, values, random_slots, compiled, gender="unisex", age="random"):
+        # The draw loop for catalogs with "excludes" tags: every value drawn narrows the
+        # tables of the slots after it (to another cached table, so draws stay O(1))
+        exclusions = compiled.exclusions()
+        excluded = compiled.excluded_by(values)
+        for slot, table in random_slots:
+            if slot in excluded:
+                table = compiled.table(slot, gender, age, excluded[slot])
+                if table is None:
+                    values[slot] = ""
+                    continue
+            value = table.value(stream.uniform(slot))
+            values[slot] = value
+            for other, positions in exclusions.get((slot, value), {}).items():
+                excluded[other] = excluded.get(other, frozenset()) | positions
+        return values
+
+    def draw_plan(self, kwargs, compiled=None):
+        compiled = compiled or compile_region(self.region_code)
+        fixed, random_slots = self.slot_plan(kwargs, compiled)
+        return compiled.draw_plan(fixed, random_slots, kwargs.get("gender", "unisex"), kwargs.get("age", "random"))
+
+    def draw_slots(self, kwargs, compiled=None):
+        # Resolves every slot to its final value; "random" slots are O(1) draws from the compiled
+        # tables, each from its own substream of the seed (see substreams)
+        return self.draw_plan(kwargs, compiled).values(self.seed if self.seed is not None else random.getrandbits(64))
+
+    def draw_slot(self, slot, **kwargs):
+        """
+        Value of one slot in generate_description(**kwargs) without drawing the
+        other slots (unless "excludes" tags make it depend on the values before it).
+        """
+        seed = kwargs.get("seed", 0)
+        if seed is None:
+            seed = random.getrandbits(64)
+        compiled = compile_region(self.region_code)
+        values, random_slots = self.slot_plan(kwargs, compiled)
+        order = [s for s, _ in random_slots]
+        if slot not in order:
+            return values.get(slot, "")
+        k = order.index(slot)
+        if compiled.exclusions():
+            values = self.draw_excluding(SeedStream(seed), values, random_slots[:k + 1], compiled, kwargs.get("gender", "unisex"), kwargs.get("age", "random"))
+            return values[slot]
+        return random_slots[k][1].value(uniform(seed, slot))
+
+    def description_template(self, target="default", detailed=True):
+        return compile_region(self.region_code).template(target, detailed)
+
+    def description_options(self, kwargs, compiled=None):
+        # build_description keyword arguments for a node call, with the template compiled once
+        detailed = kwargs.get("detailed_description", "enabled") == "enabled"
+        compiled = compiled or compile_region(self.region_code)
+        return {
+            "age": kwargs.get("age", "random"),
+            "gender": kwargs.get("gender", "unisex"),
+            "detailed": detailed,
+            "trigger_word": kwargs.get("trigger_word", ""),
+            "custom_text": kwargs.get("custom_text", ""),
+            "template": compiled.template(kwargs.get("template", "default"), detailed),
+        }
+
+    @staticmethod
+    def description_fields(values, age="random", gender="unisex", trigger_word="", custom_text=""):
+        # Template fields: the slot values plus the subject and free-text inputs ("" when unset)
+        fields = dict(values)
+        fields["age"] = "" if age in ("random", None) else age
+        fields["gender"] = "" if gender in ("unisex", "random", None) else gender
+        fields["trigger_word"] = (trigger_word or "").strip()
+        fields["custom_text"] = (custom_text or "").strip()
+        return fields
+
+    def build_description(self, values, age="random", gender="unisex", detailed=True, trigger_word="", custom_text="", template="default"):
+        # template: a target name (see data/templates/) or an already compiled DescriptionTemplate
+        if isinstance(template, str):
+            template = self.description_template(template, detailed)
+        return template.render(self.description_fields(values, age, gender, trigger_word, custom_text))
+
+    def iter_generate(self, count, **kwargs):
+        # Lazily yields (item_seed, slot values, description) for seeds seed .. seed + count - 1
+        seed = kwargs.get("seed", 0)
+        if seed is None:
+            seed = random.getrandbits(64)
+        compiled = compile_region(self.region_code)
+        plan = self.draw_plan(kwargs, compiled)
+        options = self.description_options(kwargs, compiled)
+        build = self.build_description
+        for i in range(count):
+            item_seed = (seed + i) & MASK64
+            values = plan.values(item_seed)
+            yield item_seed, values, build(values, **options)
+
     def generate_description(self, **kwargs):
         seed = kwargs.get("seed", 0)
         # If seed is None, use unseeded randomness for true randomization
-        if seed is not None:
-            self.seed = seed
-            self.rng = random.Random(seed)
-        else:
-            self.seed = None
-            self.rng = None
-        def getval(key, default):
-            return kwargs.get(key, default)
-        gender = getval("gender", "unisex")
-        age = getval("age", "random")
-        detailed = kwargs.get("detailed_description", "enabled") == "enabled"
-        trigger_word = kwargs.get("trigger_word", "")
-        custom_text = kwargs.get("custom_text", "")
-        head_gear = self.get_choice(getval("head_gear", ""), self.data.get("head_gear", []))
-        chest_clothing = self.get_choice(getval("chest_clothing", ""), self.data.get("chest_clothing", []))
-        leg_clothing = self.get_choice(getval("leg_clothing", ""), self.data.get("leg_clothing", []))
-        arm_clothing = self.get_choice(getval("arm_clothing", ""), self.data.get("arm_clothing", []))
-        def get_jewelry_choice(key, part):
-            # Only use jewelry for the correct part
-            options = [j["name"] for j in self.data.get("jewelry", []) if isinstance(j, dict) and j.get("part") == part]
-            return self.get_choice(kwargs.get(key, ""), options)
-        jewelry_head = get_jewelry_choice("jewelry_head", "head")
-        jewelry_wrist = get_jewelry_choice("jewelry_wrist", "wrist")
-        jewelry_hand = get_jewelry_choice("jewelry_hand", "hand")
-        jewelry_ankle = get_jewelry_choice("jewelry_ankle", "ankle")
-        jewelry_waist = get_jewelry_choice("jewelry_waist", "waist")
-        jewelry_ears = get_jewelry_choice("jewelry_ears", "ears")
-        jewelry_nose = get_jewelry_choice("jewelry_nose", "nose")
-        footwear = self.get_choice(getval("footwear", ""), self.data.get("footwear", []))
-        fabric_colors = self.get_choice(getval("fabric_colors", ""), self.data.get("fabric_colors", []))
-        torso_clothing = self.get_choice(getval("torso_clothing", ""), self.data.get("torso_clothing", []))
-        hair_style = self.get_choice(getval("hair_style", ""), self.data.get("hair_styles", []))
-        # Merge poses from region and common styles/poses.json
-        poses = list(self.data.get("poses", []))
-        common_poses_path = os.path.join(os.path.dirname(__file__), "..", "styles", "poses.json")
-        if os.path.exists(common_poses_path):
-            with open(common_poses_path, 'r', encoding='utf-8') as f:
-                common_poses = json.load(f)
-                poses.extend([p for p in common_poses if p not in poses])
-        pose = self.get_choice(getval("pose", ""), poses)
-
-        components = []
-        if trigger_word:
-            components.append(trigger_word)
-            components.append(", ")
-        if age and age != "random":
-            components.append(f"{age} ")
-        if gender and gender != "unisex":
-            components.append(f"{gender} ")
-        if detailed:
-            if chest_clothing or torso_clothing:
-                components.append("dressed in ")
-        if chest_clothing:
-            components.append(chest_clothing)
-        if torso_clothing:
-            if chest_clothing:
-                components.append(" and ")
-            components.append(torso_clothing)
-        if leg_clothing:
-            if chest_clothing or torso_clothing:
-                components.append(" with ")
-            components.append(leg_clothing)
-        if arm_clothing:
-            components.append(", sleeves: ")
-            components.append(arm_clothing)
-        if fabric_colors:
-            components.append(f" in {fabric_colors}")
-        if head_gear:
-            components.append(", wearing ")
-            components.append(head_gear)
-        if jewelry_head:
-            components.append(", head jewelry: ")
-            components.append(jewelry_head)
-        if jewelry_wrist:
-            components.append(", wrist jewelry: ")
-            components.append(jewelry_wrist)
-        if jewelry_hand:
-            components.append(", hand jewelry: ")
-            components.append(jewelry_hand)
-        if jewelry_ankle:
-            components.append(", ankle jewelry: ")
-            components.append(jewelry_ankle)
-        if jewelry_waist:
-            components.append(", waist/navel jewelry: ")
-            components.append(jewelry_waist)
-        if jewelry_ears:
-            components.append(", earrings: ")
-            components.append(jewelry_ears)
-        if jewelry_nose:
-            components.append(", nose jewelry: ")
-            components.append(jewelry_nose)
-        if hair_style:
-            components.append(f", hairstyle: {hair_style}")
-        if footwear:
-            components.append(", finished with ")
-            components.append(footwear)
-        if pose:
-            if detailed:
-                components.append(", ")
-                components.append(pose)
-            else:
-                components = [pose]
-        description = "".join(components)
-        description = self.clean_description(description)
-        if custom_text:
-            description += ", " + custom_text
+        self.seed = seed
+        with METRICS.timed("outfit.generate", region=self.region_code):
+            compiled = compile_region(self.region_code)
+            values = self.draw_slots(kwargs, compiled)
+            description = self.build_description(values, **self.description_options(kwargs, compiled))
         return description, seed
+
+
+class EthnicOutfitBatchGenerator(EthnicOutfitGenerator):
+    """
+    Generates batch_size descriptions in one execution from one compiled catalog.
+    Item i uses seed + i, so it matches a single-node run with that seed.
+    """
+
+    RETURN_TYPES = (
+        "STRING",
+        "INT",
+    )
+    RETURN_NAMES = (
+        "descriptions",
+        "seeds",
+    )
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "generate_batch"
+    CATEGORY = CATEGORY
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        types = super().INPUT_TYPES()
+        types["required"]["batch_size"] = ("INT", {"default": 4, "min": 1, "max": 65536})
+        # "numpy" draws the whole batch at once, with the same values as "python" (see substreams)
+        types["required"]["engine"] = (ENGINES, {"default": "python"})
+        # Anything but "random" walks the combinations of enumerate_slots (all random slots when empty)
+        # from position start, each at most once; the engine is not used then
+        types["optional"]["order"] = (ORDERS, {"default": "random"})
+        types["optional"]["enumerate_slots"] = ("STRING", {"default": ""})
+        types["optional"]["start"] = ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff})
+        return types
+
+    def generate_batch(self, batch_size=1, engine="python", order="random", enumerate_slots="", start=0, **kwargs):
+        with METRICS.timed("outfit.generate_batch", region=self.region_code, engine=engine, batch_size=batch_size):
+            if order != "random":
+                from . import enumeration
+                return enumeration.generate_batch(self, batch_size, start, order, enumerate_slots, **kwargs)
+            if engine == "numpy":
+                from . import vector_engine
+                return vector_engine.generate_batch(self, batch_size, **kwargs)
+            descriptions = []
+            seeds = []
+            for item_seed, _, description in self.iter_generate(batch_size, **kwargs):
+                descriptions.append(description)
+                seeds.append(item_seed)
+            return descriptions, seeds
@@ -0,0 +1,301 @@
+# generate.py
+# Headless bulk export of outfit prompts, usable without ComfyUI:
+#   python -m nodes.generate --region in --count 1000000 --seed 42 --out prompts.jsonl
+# Only the standard library and ethnic_outfit_common are imported at startup.
+import json
+import os
+import sys
+from .ethnic_outfit_common import EthnicOutfitGenerator, SLOT_SOURCES, ENGINES, ORDERS
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+
+def default_inputs():
+    # Same defaults the outfit nodes show in ComfyUI: every slot random, detailed output
+    inputs = {slot: "random" for slot in SLOT_SOURCES}
+    inputs.update({
+        "gender": "unisex",
+        "age": "random",
+        "detailed_description": "enabled",
+        "trigger_word": "",
+        "custom_text": "",
+        "template": "default",
+    })
+    return inputs
+
+
+def iter_records(region="in", count=1, seed=0, start=0, engine="python", **inputs):
+    """
+    Yields one dict per prompt with its seed, every chosen slot value and the
+    final description, for items start .. start + count - 1 of base seed.
+    Records are produced lazily, so memory stays flat. With an order other
+    than "random" (see enumeration.py) the items are positions of a walk over
+    the slot combinations, and excluded combinations are left out.
+    """
+    kwargs = default_inputs()
+    kwargs.update(inputs)
+    order = kwargs.pop("order", "random")
+    enumerate_slots = kwargs.pop("enumerate_slots", "")
+    generator = EthnicOutfitGenerator(region)
+    if order != "random":
+        from . import enumeration
+        kwargs["seed"] = seed
+        items = enumeration.iter_enumerate(generator, count, start, order, enumerate_slots, **kwargs)
+    elif engine == "numpy":
+        from . import vector_engine
+        kwargs["seed"] = seed
+        items = vector_engine.iter_generate(generator, count, start, **kwargs)
+    else:
+        kwargs["seed"] = seed + start
+        items = generator.iter_generate(count, **kwargs)
+    for item_seed, values, description in items:
+        record = {"region": region, "seed": item_seed, "gender": kwargs["gender"], "age": kwargs["age"]}
+        for slot in SLOT_SOURCES:
+            record[slot] = values[slot]
+        record["description"] = description
+        yield record
+
+
+def record_columns():
+    return ["region", "seed", "gender", "age"] + list(SLOT_SOURCES) + ["description"]
+
+
+def write_jsonl(records, fp):
+    count = 0
+    for record in records:
+        fp.write(json.dumps(record, ensure_ascii=False))
+        fp.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(records, fp):
+    import csv
+    writer = csv.DictWriter(fp, fieldnames=record_columns())
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def write_parquet(records, path, chunk_size=65536):
+    # Columnar output in fixed-size row groups; pyarrow is optional and only needed here
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+    columns = record_columns()
+    schema = pa.schema([(c, pa.uint64() if c == "seed" else pa.string()) for c in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        chunk = {c: [] for c in columns}
+        for record in records:
+            for c in columns:
+                chunk[c].append(record[c])
+            count += 1
+            if len(chunk["seed"]) >= chunk_size:
+                writer.write_table(pa.table(chunk, schema=schema))
+                chunk = {c: [] for c in columns}
+        if chunk["seed"]:
+            writer.write_table(pa.table(chunk, schema=schema))
+    return count
+
+
+def guess_format(out):
+    ext = os.path.splitext(out)[1].lower().lstrip(".")
+    return ext if ext in FORMATS else "jsonl"
+
+
+def export(out, region="in", count=1, seed=0, fmt=None, start=0, engine="python", dedup=0.0, dedup_window=None, **inputs):
+    """
+    Writes count records to out ("-" for stdout) and returns the number written.
+    dedup > 0 drops records whose description is a near duplicate (estimated
+    Jaccard similarity >= dedup) of one of the last dedup_window kept ones.
+    """
+    fmt = fmt or guess_format(out)
+    records = iter_records(region, count, seed, start, engine, **inputs)
+    if dedup:
+        from .dedup import CAPACITY, NearDuplicateFilter
+        index = NearDuplicateFilter(dedup, capacity=dedup_window or CAPACITY)
+        records = index.filter(records, key=lambda record: record["description"])
+        try:
+            return _write(out, fmt, records)
+        finally:
+            print(index.report(), file=sys.stderr)
+    return _write(out, fmt, records)
+
+
+def _write(out, fmt, records):
+    if fmt == "parquet":
+        if out == "-":
+            raise ValueError("Parquet output needs a file path")
+        return write_parquet(records, out)
+    writer = write_csv if fmt == "csv" else write_jsonl
+    if out == "-":
+        return writer(records, sys.stdout)
+    with open(out, "w", encoding="utf-8", newline="") as fp:
+        return writer(records, fp)
+
+
+def shard_ranges(count, shards):
+    # Contiguous (offset, length) slices of the seed range; shard k covers seeds seed + offset ...
+    shards = max(1, min(shards, count)) if count else 1
+    base, extra = divmod(count, shards)
+    ranges = []
+    offset = 0
+    for k in range(shards):
+        length = base + (1 if k < extra else 0)
+        ranges.append((offset, length))
+        offset += length
+    return ranges
+
+
+def shard_path(out, index, total):
+    root, ext = os.path.splitext(out)
+    return f"{root}.part-{index:05d}-of-{total:05d}{ext}"
+
+
+def _write_shard(task):
+    # Runs in a worker process; the catalog is compiled once per process and reused across shards
+    path, region, offset, length, seed, fmt, engine, inputs = task
+    return export(path, region, length, seed, fmt, offset, engine, **inputs)
+
+
+def merge_shards(paths, out, fmt):
+    import shutil
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for path in paths:
+                shard = pq.ParquetFile(path)
+                if writer is None:
+                    writer = pq.ParquetWriter(out, shard.schema_arrow)
+                for i in range(shard.num_row_groups):
+                    writer.write_table(shard.read_row_group(i))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    target = sys.stdout.buffer if out == "-" else open(out, "wb")
+    try:
+        for n, path in enumerate(paths):
+            with open(path, "rb") as src:
+                if fmt == "csv" and n > 0:
+                    src.readline()  # header is written once, by the first shard
+                shutil.copyfileobj(src, target)
+        target.flush()
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+
+
+def export_parallel(out, region="in", count=1, seed=0, fmt=None, engine="python", workers=None, shards=None, keep_shards=False, start=0, **inputs):
+    """
+    Splits the seed range into contiguous shards written by a process pool.
+    Merged output is byte-identical to export() with the same arguments; with
+    keep_shards the shard files are left in place instead of being merged.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    fmt = fmt or guess_format(out)
+    if fmt == "parquet" and out == "-":
+        raise ValueError("Parquet output needs a file path")
+    workers = workers or os.cpu_count() or 1
+    ranges = shard_ranges(count, shards or workers)
+    if out == "-":
+        import tempfile
+        shard_dir = tempfile.mkdtemp(prefix="outfits-shards-")
+        shard_base = os.path.join(shard_dir, "prompts." + fmt)
+    else:
+        shard_base = out
+    paths = [shard_path(shard_base, k, len(ranges)) for k in range(len(ranges))]
+    tasks = [(path, region, start + offset, length, seed, fmt, engine, inputs) for path, (offset, length) in zip(paths, ranges)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        written = sum(pool.map(_write_shard, tasks))
+    if not keep_shards:
+        merge_shards(paths, out, fmt)
+        for path in paths:
+            os.remove(path)
+        if out == "-":
+            os.rmdir(shard_dir)
+    return written
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m nodes.generate", description="Export outfit prompts without ComfyUI.")
+    parser.add_argument("--region", default="in", help="Region code, i.e. a directory under data/ (default: in)")
+    parser.add_argument("--count", type=int, default=1, help="Number of prompts to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed; item i uses seed + i")
+    parser.add_argument("--start", type=int, default=0, help="Index of the first item, to split a run across machines")
+    parser.add_argument("--out", default="-", help="Output file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS, help="Output format (default: from the file extension, else jsonl)")
+    parser.add_argument("--gender", default="unisex")
+    parser.add_argument("--age", default="random")
+    parser.add_argument("--trigger-word", default="")
+    parser.add_argument("--custom-text", default="")
+    parser.add_argument("--no-detailed", action="store_true", help="Short descriptions (the pose, else the outfit), like detailed_description=disabled")
+    parser.add_argument("--template", default="default", help="Description template: default or a target model under data/templates/ (flux, sdxl)")
+    parser.add_argument("--engine", choices=ENGINES, default="python",
+                        help="python: one item at a time; numpy: vectorized blocks with the same items (see nodes/substreams.py)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes; >1 shards the seed range (0 = all cores)")
+    parser.add_argument("--shards", type=int, help="Number of shards (default: one per worker)")
+    parser.add_argument("--keep-shards", action="store_true", help="Leave the .part-NNNNN-of-NNNNN shard files instead of merging them")
+    parser.add_argument("--order", choices=ORDERS, default="random",
+                        help="random: independent draws; product/shuffled/stratified: each slot combination at most once (see nodes/enumeration.py)")
+    parser.add_argument("--enumerate", default="", metavar="SLOTS",
+                        help="Comma-separated slots to enumerate with --order (default: every random slot); the others are drawn per item")
+    parser.add_argument("--dedup", type=float, default=0.0, metavar="THRESHOLD",
+                        help="Drop near-duplicate descriptions (MinHash estimated Jaccard >= THRESHOLD, e.g. 0.8); single process only")
+    parser.add_argument("--dedup-window", type=int, default=None, metavar="N",
+                        help="Kept descriptions each new one is compared against (default: 100000); bounds memory")
+    parser.add_argument("--set", action="append", default=[], metavar="SLOT=VALUE",
+                        help="Fix a slot (e.g. footwear=mojaris, pose=disabled); repeatable")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    inputs = {
+        "gender": args.gender,
+        "age": args.age,
+        "trigger_word": args.trigger_word,
+        "custom_text": args.custom_text,
+        "detailed_description": "disabled" if args.no_detailed else "enabled",
+        "template": args.template,
+    }
+    if args.order != "random":
+        if args.engine != "python":
+            raise SystemExit("generate: --order enumerates combinations itself and cannot be combined with --engine numpy")
+        inputs["order"] = args.order
+        inputs["enumerate_slots"] = args.enumerate
+    for item in args.set:
+        slot, sep, value = item.partition("=")
+        if not sep or slot not in SLOT_SOURCES:
+            raise SystemExit(f"Invalid --set {item!r}; expected one of {', '.join(SLOT_SOURCES)} as SLOT=VALUE")
+        inputs[slot] = value
+    if args.order != "random":
+        from .enumeration import CombinationSpace
+        space = CombinationSpace(EthnicOutfitGenerator(args.region), dict(default_inputs(), **inputs), args.enumerate)
+        print(f"generate: {space.size} combinations of {', '.join(slot for slot, _ in space.axes) or 'no slots'}", file=sys.stderr)
+    try:
+        if args.dedup and (args.workers != 1 or args.shards or args.keep_shards):
+            raise ValueError("--dedup compares every record with the ones before it and cannot be combined with --workers/--shards")
+        if args.workers != 1 or args.shards or args.keep_shards:
+            written = export_parallel(args.out, args.region, args.count, args.seed, args.format, args.engine,
+                                      workers=args.workers or None, shards=args.shards,
+                                      keep_shards=args.keep_shards, start=args.start, **inputs)
+        else:
+            written = export(args.out, args.region, args.count, args.seed, args.format, args.start, args.engine,
+                             dedup=args.dedup, dedup_window=args.dedup_window, **inputs)
+    except (RuntimeError, ValueError, OSError) as e:
+        raise SystemExit(f"generate: {e}")
+    print(f"generate: wrote {written} prompts for region {args.region}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# instrumentation.py
+# Opt-in timings and counters for the nodes' hot paths (catalog I/O, region
+# compilation, generation, Ollama HTTP calls), exposed as structured log
+# lines and, inside ComfyUI, at GET /outfits/metrics (JSON, or Prometheus
+# text with ?format=prometheus).
+#
+# Enable with COMFYUI_OUTFITS_METRICS=1 (or =log to also log every timing at
+# INFO on the "comfyui_outfits" logger). While disabled, timed() hands back a
+# shared no-op context manager and count() returns immediately.
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+_MODE = os.environ.get("COMFYUI_OUTFITS_METRICS", "").strip().lower()
+ENABLED = _MODE not in ("", "0", "false", "no", "off")
+LOG_EVENTS = _MODE == "log"
+SAMPLES = 1024  # most recent timings kept per phase for percentiles
+QUANTILES = (0.5, 0.9, 0.99)
+
+logger = logging.getLogger("comfyui_outfits")
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "fields", "start")
+
+    def __init__(self, metrics, name, fields):
+        self.metrics = metrics
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, error=exc_type is not None, **self.fields)
+        return False
+
+
+def percentile(ordered, q):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """
+    Per-phase timing summaries (count, total, errors and percentiles over the
+    last SAMPLES observations), counters, and gauges: callables registered by
+    other modules (e.g. catalog and response cache hit rates) that are only
+    evaluated when a snapshot is taken.
+    """
+
+    def __init__(self, enabled=ENABLED, log_events=LOG_EVENTS, samples=SAMPLES):
+        self.enabled = enabled
+        self.log_events = log_events
+        self.samples = samples
+        self._timings = {}  # phase -> [count, total seconds, errors, deque of recent seconds]
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def timed(self, name, **fields):
+        """Context manager recording the wall time of the block under name."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, fields)
+
+    def observe(self, name, seconds, error=False, **fields):
+        if not self.enabled:
+            return
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = [0, 0.0, 0, deque(maxlen=self.samples)]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] += bool(error)
+            timing[3].append(seconds)
+        level = logging.INFO if self.log_events else logging.DEBUG
+        if logger.isEnabledFor(level):
+            event = {"event": name, "ms": round(seconds * 1000, 3)}
+            if error:
+                event["error"] = True
+            event.update(fields)
+            logger.log(level, json.dumps(event, default=str))
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name, fn, label=None):
+        # fn() returns a number or a flat dict of numbers; with label, a dict of label value ->
+        # flat dict of numbers (one per Ollama server, say), exported with the value as that label
+        self._gauges[name] = (fn, label)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {name: (t[0], t[1], t[2], sorted(t[3])) for name, t in self._timings.items()}
+            counters = dict(self._counters)
+        phases = {}
+        for name, (n, total, errors, ordered) in timings.items():
+            phase = {"count": n, "total": total, "errors": errors, "max": ordered[-1] if ordered else None}
+            for q in QUANTILES:
+                phase[f"p{int(q * 100)}"] = percentile(ordered, q)
+            phases[name] = phase
+        gauges = {}
+        for name, (fn, _) in self._gauges.items():
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = {"error": str(e)}
+        return {"enabled": self.enabled, "timings": phases, "counters": counters, "gauges": gauges}
+
+    def prometheus(self):
+        """Snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        families = {}  # metric -> (type, sample lines); samples of one metric stay together under one TYPE line
+
+        def sample(metric, kind, labels, value):
+            text = ",".join(f'{key}="{_label_value(v)}"' for key, v in labels.items())
+            families.setdefault(metric, (kind, []))[1].append(f"{metric}{{{text}}} {value}" if text else f"{metric} {value}")
+
+        for name, phase in snap["timings"].items():
+            for q in QUANTILES:
+                sample("outfits_phase_seconds", "summary", {"phase": name, "quantile": q}, phase[f"p{int(q * 100)}"])
+            sample("outfits_phase_seconds_sum", "summary", {"phase": name}, phase["total"])
+            sample("outfits_phase_seconds_count", "summary", {"phase": name}, phase["count"])
+        for name, phase in snap["timings"].items():
+            sample("outfits_phase_errors_total", "counter", {"phase": name}, phase["errors"])
+        for name, value in snap["counters"].items():
+            sample("outfits_" + _metric_name(name) + "_total", "counter", {}, value)
+        for name, value in snap["gauges"].items():
+            label = self._gauges[name][1]
+            if label is None:
+                groups = [({}, value if isinstance(value, dict) else {"": value})]
+            else:
+                groups = [({label: key}, values) for key, values in value.items() if isinstance(values, dict)]
+            for labels, values in groups:
+                for key, number in values.items():
+                    if isinstance(number, bool) or not isinstance(number, (int, float)):
+                        continue
+                    sample("outfits_" + _metric_name(f"{name}_{key}" if key else name), "gauge", labels, number)
+        lines = []
+        for metric, (kind, samples) in families.items():
+            # The _sum and _count series belong to the summary's TYPE line
+            if not (kind == "summary" and metric != "outfits_phase_seconds"):
+                lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+
+def register_routes():
+    """Adds GET /outfits/metrics to ComfyUI's server; returns False outside ComfyUI."""
+    try:
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return False
+    instance = getattr(PromptServer, "instance", None)
+    if instance is None:
+        return False
+
+    @instance.routes.get("/outfits/metrics")
+    async def outfits_metrics(request):
+        if request.query.get("format") == "prometheus":
+            return web.Response(text=METRICS.prometheus(), content_type="text/plain")
+        return web.json_response(METRICS.snapshot())
+
+    return True
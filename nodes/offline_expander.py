@@ -0,0 +1,82 @@
+# offline_expander.py
+# Deterministic, CPU-only prompt expansion used when Ollama is unavailable or
+# slow (see CircuitBreaker in ollama_client), so a batch gets usable prompts
+# instead of "ERROR: ..." strings.
+#
+# Each data/prompts/<style>.json may carry an "offline" section next to its
+# LLM instructions:
+#   {"template": <description template, see templates.py>,
+#    "random": [style inputs a "random" choice fills]}
+# The template fields are the keywords and the style inputs of the prompter;
+# art_style renders as its description from art_styles.json. Inputs left on
+# "random" draw from their data/styles catalog (only those listed in "random";
+# the rest stay empty, as the LLM would otherwise pick them) with an RNG seeded
+# from the seed and the keywords, so the same inputs always expand the same way.
+# A style file without an offline section falls back to the SDXL one.
+import random
+from collections.abc import Mapping
+from .ethnic_outfit_common import CATALOG, catalog_index
+from .templates import DescriptionTemplate
+
+# Style dropdowns: input name -> data/styles file (art_styles.json maps each name to its description)
+STYLE_OPTIONS = {
+    "photographer": "photographers.json",
+    "camera": "cameras.json",
+    "film": "film.json",
+    "movement": "movements.json",
+    "art_style": "art_styles.json",
+    "lighting": "lighting.json",
+    "shot_type": "shot_types.json",
+    "photography_type": "photography_types.json",
+}
+PROMPT_FILES = {"sdxl": "sdxl.json", "flux": "flux.json"}
+DEFAULT_STYLE = "sdxl"
+
+_templates = {}  # style -> (loaded file, DescriptionTemplate, random inputs)
+
+
+def offline_template(style):
+    """(DescriptionTemplate, inputs filled on "random") of a prompt style, rebuilt when its file changes."""
+    style = style.lower() if style and style.lower() in PROMPT_FILES else DEFAULT_STYLE
+    data = CATALOG.load('prompts', PROMPT_FILES[style])
+    cached = _templates.get(style)
+    if cached is not None and cached[0] is data:
+        return cached[1], cached[2]
+    section = data.get("offline") if isinstance(data, Mapping) else None
+    if not isinstance(section, Mapping) or "template" not in section:
+        if style == DEFAULT_STYLE:
+            raise ValueError(f"No offline template in data/prompts/{PROMPT_FILES[style]}")
+        template, fill = offline_template(DEFAULT_STYLE)
+    else:
+        template = DescriptionTemplate(section["template"], name=f"offline/{style}")
+        fill = tuple(name for name in section.get("random", ()) if name in STYLE_OPTIONS)
+    _templates[style] = (data, template, fill)
+    return template, fill
+
+
+def expand_offline(keywords, style, choices, seed):
+    """
+    Prompt for keywords in a prompt style ("SDXL", "Flux"; anything else uses
+    SDXL) from the style choices (input name -> value, "random" or "disabled").
+    """
+    template, fill = offline_template(style)
+    rng = None
+    values = {"keywords": keywords.strip().rstrip(".,; ")}
+    for name in template.fields:
+        if name not in STYLE_OPTIONS:
+            continue
+        value = choices.get(name) or "disabled"
+        if value == "random":
+            value = "disabled"
+            if name in fill:
+                if rng is None:
+                    rng = random.Random(f"{seed}:{keywords}")
+                names = catalog_index('styles', STYLE_OPTIONS[name]).names
+                if names:
+                    value = names[rng.randrange(len(names))]
+        if value == "disabled":
+            value = ""
+        elif name == "art_style":
+            value = CATALOG.load('styles', STYLE_OPTIONS[name]).get(value, "")
+        values[name] = value
+    return template.render(values)
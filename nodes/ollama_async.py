@@ -0,0 +1,203 @@
+# ollama_async.py
+# Non-blocking Ollama requests. Every request runs on one event loop: ComfyUI's
+# server loop when it is running, else a private background loop. Callers on
+# any thread or loop get a concurrent.futures.Future back, so:
+#   - the Ollama nodes, on ComfyUI versions that await coroutine node
+#     functions, free the execution worker while Ollama answers and
+#     independent branches of the graph keep running
+#   - identical requests in flight (same response key: model digest,
+#     instructions, prompt, seed, budgets) share one upstream call
+#   - a request can be started before the node runs (IS_CHANGED prefetches
+#     when the keywords are a widget value, if COMFYUI_OUTFITS_PREFETCH_PROMPTS=1)
+#     and the node joins it
+# Plain requests use aiohttp (a ComfyUI dependency) with one pooled session
+# per server; streamed ones keep the requests implementation (early stop and
+# interrupt checks) on a worker thread, as does everything when aiohttp is
+# missing. asyncio and aiohttp are imported on first use.
+import os
+import sys
+import threading
+from .ollama_client import INTERRUPT_POLL, POOL_SIZE, StreamInterrupted, base_url, clean_completion, get_breaker
+from .instrumentation import METRICS
+
+
+def async_execution_supported():
+    # COMFYUI_OUTFITS_ASYNC=1/0 forces it; by default it follows ComfyUI's executor, which
+    # awaits coroutine node functions since its async rework (execution._async_map_node_over_list)
+    mode = os.environ.get("COMFYUI_OUTFITS_ASYNC", "auto").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return False
+    if mode in ("1", "true", "yes", "on"):
+        return True
+    execution = sys.modules.get("execution")
+    return execution is not None and hasattr(execution, "_async_map_node_over_list")
+
+
+ASYNC_EXECUTION = async_execution_supported()
+# Opt-in: IS_CHANGED starts the Ollama call for cacheable requests whose keywords are already known.
+# Off by default, since validation then sends requests for prompts that may never execute.
+PREFETCH_PROMPTS = os.environ.get("COMFYUI_OUTFITS_PREFETCH_PROMPTS", "0") == "1"
+
+
+def _server_loop():
+    try:
+        from server import PromptServer
+    except ImportError:
+        return None
+    loop = getattr(getattr(PromptServer, "instance", None), "loop", None)
+    return loop if loop is not None and loop.is_running() else None
+
+
+class AsyncOllama:
+    """Runs Ollama requests on a shared event loop and coalesces identical ones by response key."""
+
+    def __init__(self):
+        self._loop = None
+        self._sessions = {}  # base url -> aiohttp.ClientSession, only touched on the loop
+        self._pending = {}  # response key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._loop.is_running():
+                self._loop = _server_loop() or self._start_loop()
+            return self._loop
+
+    @staticmethod
+    def _start_loop():
+        import asyncio
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        loop.call_soon(started.set)
+        threading.Thread(target=loop.run_forever, name="ollama-async", daemon=True).start()
+        started.wait()
+        return loop
+
+    def pending(self, key):
+        """Future of the request in flight for key, or None."""
+        return self._pending.get(key)
+
+    def start(self, key, ollama_url, payload, timeout, blocking, stream=False, store=False):
+        """
+        Future of the completion text for payload, joining the request already
+        in flight for key if there is one. blocking() makes the same request
+        synchronously; it is used (on a worker thread) for streamed requests
+        and when aiohttp is unavailable. With store, the response is written
+        to the response cache.
+        """
+        import asyncio
+        loop = self.loop()
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                METRICS.count("ollama.coalesced")
+                return future
+            future = asyncio.run_coroutine_threadsafe(self._request(key, ollama_url, payload, timeout, blocking, stream, store), loop)
+            self._pending[key] = future
+            self.requests += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    async def _request(self, key, ollama_url, payload, timeout, blocking, stream, store):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        if stream or aiohttp is None:
+            text = await loop.run_in_executor(None, blocking)
+        else:
+            text = await self._post(aiohttp, ollama_url, payload, timeout)
+        if store and text:
+            from .response_cache import RESPONSES
+            await loop.run_in_executor(None, RESPONSES.put, key, text)
+        return text
+
+    async def _post(self, aiohttp, ollama_url, payload, timeout):
+        import asyncio
+        import json
+        import time
+        from requests.exceptions import ConnectionError, HTTPError, Timeout
+        breaker = get_breaker(ollama_url)
+        start = time.perf_counter()
+        session = self._sessions.get(base_url(ollama_url))
+        if session is None or session.closed:
+            session = self._sessions[base_url(ollama_url)] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=POOL_SIZE))
+        connect, read = timeout
+        # Errors surface as requests exceptions, like the synchronous path, and feed the circuit breaker
+        try:
+            with METRICS.timed("ollama.generate", model=payload.get("model"), mode="async"):
+                async with session.post(ollama_url, json=payload, timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)) as response:
+                    if response.status >= 400:
+                        breaker.record(False)
+                        raise HTTPError(f"{response.status} Server Error: {response.reason} for url: {ollama_url}")
+                    body = await response.text()
+        except asyncio.TimeoutError as e:
+            breaker.record(False)
+            raise Timeout(f"Ollama did not answer in time: {e}") from e
+        except aiohttp.ClientError as e:
+            breaker.record(False)
+            raise ConnectionError(str(e)) from e
+        breaker.record(True, time.perf_counter() - start)
+        lines = body.strip().splitlines()
+        return clean_completion(json.loads(lines[-1]).get("response", ""))
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "in_flight": len(self._pending)}
+
+
+ASYNC_OLLAMA = AsyncOllama()
+METRICS.gauge("ollama_async", ASYNC_OLLAMA.stats)
+
+
+async def wait_for(future, interrupted=None):
+    """
+    Awaits a concurrent Future from any event loop. Raises StreamInterrupted
+    once interrupted() returns True; the request itself goes on for anyone
+    else waiting on it, and a stored response stays cached.
+    """
+    import asyncio
+    import time
+    start = time.perf_counter()
+    wrapped = asyncio.wrap_future(future)
+    while True:
+        done, _ = await asyncio.wait({wrapped}, timeout=INTERRUPT_POLL)
+        if done:
+            return wrapped.result()
+        if interrupted is not None and interrupted():
+            raise StreamInterrupted({"ttft": None, "tokens": 0, "seconds": time.perf_counter() - start, "stopped": "interrupted"})
+
+
+def wait_pending(future, timeout, interrupted=None):
+    """
+    Blocking counterpart of wait_for, for a request already in flight: waits
+    at most timeout seconds, polling interrupted() every INTERRUPT_POLL.
+    Raises requests' Timeout or StreamInterrupted; either way the future is
+    cancelled, so an abandoned request does not keep running on the loop.
+    """
+    import time
+    from requests.exceptions import Timeout
+    start = time.perf_counter()
+    try:
+        while True:
+            remaining = start + timeout - time.perf_counter()
+            if remaining <= 0:
+                raise Timeout(f"Ollama did not answer within {timeout:.1f}s")
+            try:
+                return future.result(timeout=min(INTERRUPT_POLL, remaining))
+            except TimeoutError:
+                if future.done():
+                    raise
+            if interrupted is not None and interrupted():
+                raise StreamInterrupted({"ttft": None, "tokens": 0, "seconds": time.perf_counter() - start, "stopped": "interrupted"})
+    finally:
+        future.cancel()
@@ -0,0 +1,352 @@
+# ollama_client.py
+# Shared HTTP plumbing for the Ollama nodes: one pooled keep-alive session per
+# Ollama server, a TTL cache of installed models refreshed in the background,
+# and a circuit breaker per server that sends the nodes to the offline expander
+# while the server keeps failing or answering too slowly.
+# requests is imported on first use, so registering the nodes stays cheap.
+import json
+import os
+import re
+import socket
+import threading
+import time
+from .instrumentation import METRICS
+
+DEFAULT_URL = "http://127.0.0.1:11434/api/generate"
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 60.0
+TAGS_TIMEOUT = 5.0
+MODELS_TTL = 30.0
+POOL_SIZE = 16
+# Circuit breaker: consecutive failures (or calls slower than the limit, 0 = no limit) that open it
+BREAKER_FAILURES = int(os.environ.get("COMFYUI_OUTFITS_BREAKER_FAILURES", 3))
+BREAKER_LATENCY = float(os.environ.get("COMFYUI_OUTFITS_BREAKER_LATENCY", 0))
+PROBE_INTERVAL = 5.0
+PROBE_MAX_INTERVAL = 60.0
+# How often waits on Ollama check ComfyUI's interrupt flag
+INTERRUPT_POLL = 0.1
+
+
+def base_url(ollama_url):
+    # "http://host:11434/api/generate" -> "http://host:11434"
+    url = (ollama_url or DEFAULT_URL).strip().rstrip("/")
+    for suffix in ("/api/generate", "/api/tags", "/api"):
+        if url.endswith(suffix):
+            return url[:-len(suffix)]
+    return url
+
+
+def tags_url(ollama_url):
+    return base_url(ollama_url) + "/api/tags"
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(ollama_url):
+    """Returns the pooled keep-alive session for the server behind ollama_url."""
+    key = base_url(ollama_url)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sessions[key] = session
+    return session
+
+
+class ModelCache:
+    """
+    Installed models per Ollama server, fetched from /api/tags. Stale entries
+    are served while a background thread refreshes them, so callers only block
+    when a server has never answered (and then only up to `wait` seconds).
+    """
+
+    def __init__(self, ttl=MODELS_TTL):
+        self.ttl = ttl
+        self._entries = {}  # base url -> (fetched_at, [model dicts])
+        self._refreshing = {}  # base url -> Thread
+        self._lock = threading.Lock()
+
+    def fetch(self, ollama_url, timeout=TAGS_TIMEOUT):
+        # Synchronous /api/tags call; raises requests exceptions on failure
+        with METRICS.timed("ollama.tags", url=base_url(ollama_url)):
+            response = get_session(ollama_url).get(tags_url(ollama_url), timeout=timeout)
+            response.raise_for_status()
+        models = response.json().get("models", [])
+        self._entries[base_url(ollama_url)] = (time.monotonic(), models)
+        return models
+
+    def _refresh(self, key):
+        try:
+            self.fetch(key)
+        except Exception as e:
+            # Not a breaker failure: only generation calls open it (and the probe closes it)
+            print(f"OllamaPrompter: Could not fetch installed models: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+    def refresh_async(self, ollama_url):
+        key = base_url(ollama_url)
+        with self._lock:
+            thread = self._refreshing.get(key)
+            if thread is None:
+                thread = threading.Thread(target=self._refresh, args=(key,), name="ollama-tags", daemon=True)
+                self._refreshing[key] = thread
+                thread.start()
+        return thread
+
+    def models(self, ollama_url, wait=None):
+        """
+        Cached model dicts for ollama_url. A stale or missing entry triggers a
+        background refresh; wait bounds how long to block when nothing is
+        cached yet (None waits for the tags timeout, 0 never blocks).
+        """
+        entry = self._entries.get(base_url(ollama_url))
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        thread = self.refresh_async(ollama_url)
+        if entry is None and wait != 0:
+            thread.join(TAGS_TIMEOUT if wait is None else wait)
+            entry = self._entries.get(base_url(ollama_url))
+        return entry[1] if entry is not None else []
+
+    def peek(self, ollama_url):
+        """Model dicts last fetched from ollama_url, stale or not; never touches the network."""
+        entry = self._entries.get(base_url(ollama_url))
+        return entry[1] if entry is not None else []
+
+    def names(self, ollama_url, wait=None):
+        return [m["name"] for m in self.models(ollama_url, wait)]
+
+    def digest(self, ollama_url, model_name, wait=None):
+        # Content digest of an installed model; changes when the model is re-pulled
+        for m in self.models(ollama_url, wait):
+            if m.get("name") == model_name:
+                return m.get("digest", "")
+        return ""
+
+    def invalidate(self, ollama_url=None):
+        if ollama_url is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(base_url(ollama_url), None)
+
+
+MODELS = ModelCache()
+
+
+class CircuitBreaker:
+    """
+    Health of one Ollama server. `failures` consecutive failed (or too slow)
+    calls open the breaker: callers then skip Ollama at once, and a background
+    thread probes /api/tags with growing intervals until it answers. After a
+    recovery a single failure opens the breaker again.
+    """
+
+    def __init__(self, url, failures=BREAKER_FAILURES, latency_limit=BREAKER_LATENCY):
+        self.url = url
+        self.threshold = max(1, failures)
+        self.latency_limit = latency_limit
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._probe = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        return self.opened_at is None
+
+    def record(self, ok, seconds=None):
+        # A call slower than the limit counts as a failure even when it succeeded
+        if ok and self.latency_limit and seconds is not None and seconds > self.latency_limit:
+            print(f"OllamaPrompter: Ollama took {seconds:.2f}s, over the {self.latency_limit:.2f}s limit")
+            ok = False
+        with self._lock:
+            if ok:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures < self.threshold or self.opened_at is not None:
+                return
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            print(f"OllamaPrompter: {self.failures} failed Ollama calls, using the offline expander until {self.url} recovers")
+            METRICS.count("ollama.breaker_opened")
+            if self._probe is None:
+                self._probe = threading.Thread(target=self._run_probe, name="ollama-probe", daemon=True)
+                self._probe.start()
+
+    def _run_probe(self):
+        interval = PROBE_INTERVAL
+        while True:
+            time.sleep(interval)
+            try:
+                MODELS.fetch(self.url)
+                break
+            except Exception:
+                interval = min(interval * 2, PROBE_MAX_INTERVAL)
+        with self._lock:
+            print(f"OllamaPrompter: {self.url} answers again after {time.monotonic() - self.opened_at:.0f}s")
+            self.opened_at = None
+            self.failures = self.threshold - 1
+            self._probe = None
+
+    def stats(self):
+        return {"open": int(self.is_open), "failures": self.failures, "trips": self.trips}
+
+
+_breakers = {}
+
+
+def get_breaker(ollama_url):
+    """The CircuitBreaker of the server behind ollama_url."""
+    key = base_url(ollama_url)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _sessions_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(key))
+    return breaker
+
+
+METRICS.gauge("ollama_breakers", lambda: {url: breaker.stats() for url, breaker in _breakers.items()}, label="url")
+
+
+# A sentence ends at . ! or ? followed by whitespace or the end of the text
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+
+
+def clean_completion(text):
+    # Drop the quotation marks an LLM may wrap its answer in
+    text = text.strip()
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+    if text.startswith("'") and text.endswith("'"):
+        text = text[1:-1]
+    return text
+
+
+def truncate_sentences(text, max_sentences):
+    for n, match in enumerate(_SENTENCE_END.finditer(text), 1):
+        if n == max_sentences:
+            return text[:match.end()]
+    return text
+
+
+class StreamInterrupted(Exception):
+    """Raised by stream_completion when interrupted() fired; carries the partial stats."""
+
+    def __init__(self, stats):
+        super().__init__("generation interrupted")
+        self.stats = stats
+
+
+class _Watchdog(threading.Thread):
+    """
+    Polls interrupted() while a streamed response is read and, once it fires,
+    shuts the response's socket down, so a read waiting on Ollama for its next
+    chunk returns at once instead of when the chunk (or the read timeout) comes.
+    """
+
+    def __init__(self, response, interrupted, poll=INTERRUPT_POLL):
+        super().__init__(name="ollama-watchdog", daemon=True)
+        self.response = response
+        self.interrupted = interrupted
+        self.poll = poll
+        self.fired = False
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.poll):
+            if self.interrupted():
+                self.fired = True
+                # urllib3 2 keeps the connection on the raw response; closing alone would not wake a blocked read
+                sock = getattr(getattr(self.response.raw, "_connection", None), "sock", None)
+                try:
+                    if sock is not None:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    else:
+                        self.response.close()
+                except OSError:
+                    pass
+                return
+
+    def stop(self):
+        self._done.set()
+
+
+def stream_completion(ollama_url, payload, timeout, max_tokens=0, max_sentences=0, interrupted=None):
+    """
+    Consumes /api/generate NDJSON chunks as they arrive and stops early on the
+    token or sentence budget, or as soon as interrupted() returns True (checked
+    every INTERRUPT_POLL seconds while waiting for a chunk). Leaving early
+    closes the connection, which makes Ollama abandon the generation. Returns
+    (text, stats) with time-to-first-token, chunk count and stop reason; an
+    interrupt raises StreamInterrupted instead.
+    """
+    start = time.perf_counter()
+    stats = {"ttft": None, "tokens": 0, "seconds": 0.0, "stopped": "done"}
+    parts = []
+    sentences = 0
+    body = dict(payload, stream=True)
+    with get_session(ollama_url).post(ollama_url, json=body, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        watchdog = None
+        if interrupted is not None:
+            watchdog = _Watchdog(response, interrupted)
+            watchdog.start()
+        try:
+            for line in response.iter_lines():
+                if interrupted is not None and interrupted():
+                    stats["stopped"] = "interrupted"
+                    break
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if token:
+                    if stats["ttft"] is None:
+                        stats["ttft"] = time.perf_counter() - start
+                    parts.append(token)
+                    stats["tokens"] += 1
+                if chunk.get("done"):
+                    break
+                if max_tokens and stats["tokens"] >= max_tokens:
+                    stats["stopped"] = "max_tokens"
+                    break
+                if max_sentences and any(c in token for c in ".!?"):
+                    sentences = len(_SENTENCE_END.findall("".join(parts)))
+                    if sentences >= max_sentences:
+                        stats["stopped"] = "max_sentences"
+                        break
+        except Exception:
+            # A read cut short by the watchdog fails (or ends) because of the interrupt
+            if watchdog is None or not watchdog.fired:
+                raise
+        finally:
+            if watchdog is not None:
+                watchdog.stop()
+        if watchdog is not None and watchdog.fired:
+            stats["stopped"] = "interrupted"
+    stats["seconds"] = time.perf_counter() - start
+    if stats["stopped"] == "interrupted":
+        raise StreamInterrupted(stats)
+    METRICS.observe("ollama.stream", stats["seconds"], stopped=stats["stopped"], tokens=stats["tokens"])
+    if stats["ttft"] is not None:
+        METRICS.observe("ollama.ttft", stats["ttft"])
+    text = "".join(parts)
+    if max_sentences:
+        text = truncate_sentences(text, max_sentences)
+    return text, stats
@@ -1,9 +1,39 @@
 # OllamaPrompter.py
 # A ComfyUI node that enhances prompts using Ollama's LLMs.
-import requests
 import json
 import os
-from .ethnic_outfit_common import CATEGORY
+import random
+import time
+from .ethnic_outfit_common import CATEGORY, CATALOG, catalog_index
+from .ollama_client import DEFAULT_URL, CONNECT_TIMEOUT, READ_TIMEOUT, POOL_SIZE, MODELS, get_breaker, get_session, stream_completion, clean_completion, StreamInterrupted
+from .ollama_async import ASYNC_EXECUTION, ASYNC_OLLAMA, PREFETCH_PROMPTS, wait_for, wait_pending
+from .offline_expander import STYLE_OPTIONS, expand_offline
+from .response_cache import RESPONSES, cache_key
+from .instrumentation import METRICS
+
+# Longest INPUT_TYPES waits for a first /api/tags answer; later refreshes happen in the background.
+# The first call starts the fetch, so registering the package touches neither requests nor the network.
+INPUT_TYPES_WAIT = 1.0
+DEFAULT_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+RETRY_BACKOFF = 0.5
+
+
+def processing_interrupted():
+    # ComfyUI's interrupt flag; always False when running outside ComfyUI
+    try:
+        import comfy.model_management
+    except ImportError:
+        return False
+    return comfy.model_management.processing_interrupted()
+
+
+def throw_if_interrupted():
+    try:
+        import comfy.model_management
+    except ImportError:
+        return
+    comfy.model_management.throw_exception_if_processing_interrupted()
+
 
 class OllamaPrompter:
     """
@@ -14,47 +44,44 @@ class OllamaPrompter:
     
     # Helper to fetch installed models for dropdown
     @classmethod
-    def get_installed_models(cls, ollama_url="http://127.0.0.1:11434/api/generate"):
-        try:
-            # IMPORTANT: The URL for fetching tags is /api/tags, not part of /api/generate
-            tags_url = ollama_url.replace("/api/generate", "/api/tags")
-            response = requests.get(tags_url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            # Return a list of model names. If empty, ComfyUI will show an empty dropdown.
-            return [m["name"] for m in data.get("models", [])]
-        except Exception as e:
-            print(f"OllamaPrompter: Could not fetch installed models: {e}")
-            # Return an empty list on error to prevent ComfyUI from crashing.
-            # The dropdown will be empty, signaling a problem to the user.
-            return []
+    def get_installed_models(cls, ollama_url=DEFAULT_URL, wait=None):
+        # Served from the TTL cache in ollama_client; /api/tags is refreshed in the background.
+        # Returns an empty list while Ollama is unreachable, so the dropdown signals the problem.
+        return MODELS.names(ollama_url, wait)
 
     @classmethod
     def load_json_options(cls, filename):
-        # Load from data/styles instead of styles
-        styles_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'styles')
-        path = os.path.join(styles_dir, filename)
+        # Load from data/styles through the shared catalog cache
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return list(CATALOG.load('styles', filename))
         except Exception as e:
             print(f"OllamaPrompter: Could not load {filename}: {e}")
             return []
 
     @classmethod
     def load_art_styles(cls):
-        styles_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'styles')
-        path = os.path.join(styles_dir, 'art_styles.json')
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)  # Return the full dict
+            return CATALOG.load('styles', 'art_styles.json')  # Return the full dict
         except Exception as e:
             print(f"OllamaPrompter: Could not load art_styles.json: {e}")
             return {}
 
+    @classmethod
+    def style_index(cls, name):
+        # CatalogIndex of one style input, or None when its file cannot be loaded
+        try:
+            return catalog_index('styles', STYLE_OPTIONS[name])
+        except Exception as e:
+            print(f"OllamaPrompter: Could not load {STYLE_OPTIONS[name]}: {e}")
+            return None
+
+    @classmethod
+    def style_options(cls, name):
+        index = cls.style_index(name)
+        return index.options(("random", "disabled")) if index is not None else ["random", "disabled"]
+
     @staticmethod
     def load_prompt_instructions(style):
-        prompts_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'prompts')
         # Use case-insensitive matching for style keys
         style_map = {
             'sdxl': 'sdxl.json',
@@ -63,11 +90,9 @@ class OllamaPrompter:
         filename = style_map.get(style.lower() if style else '', None)
         if not filename:
             return None
-        path = os.path.join(prompts_dir, filename)
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('instructions', None)
+            data = CATALOG.load('prompts', filename)
+            return data.get('instructions', None)
         except Exception as e:
             print(f"OllamaPrompter: Could not load prompt instructions for {style}: {e}")
             return None
@@ -75,17 +100,17 @@ class OllamaPrompter:
     # Define the input types for the node
     @classmethod
     def INPUT_TYPES(cls):
-        installed_models = cls.get_installed_models()
-        # Load all dropdowns from data/styles (ignore poses and hair_style)
-        cameras = ["random", "disabled"] + cls.load_json_options('cameras.json')
-        films = ["random", "disabled"] + cls.load_json_options('film.json')
-        movements = ["random", "disabled"] + cls.load_json_options('movements.json')
-        art_styles_dict = cls.load_art_styles()
-        art_styles = ["random", "disabled"] + list(art_styles_dict.keys())
-        photographers = ["random", "disabled"] + cls.load_json_options('photographers.json')
-        lighting = ["random", "disabled"] + cls.load_json_options('lighting.json')
-        shot_types = ["random", "disabled"] + cls.load_json_options('shot_types.json')
-        photography_types = ["random", "disabled"] + cls.load_json_options('photography_types.json')
+        installed_models = cls.get_installed_models(wait=INPUT_TYPES_WAIT)
+        # Load all dropdowns from data/styles (ignore poses and hair_style); the lists are
+        # cached per file and capped by COMFYUI_OUTFITS_MAX_OPTIONS (see catalog_index)
+        cameras = cls.style_options('camera')
+        films = cls.style_options('film')
+        movements = cls.style_options('movement')
+        art_styles = cls.style_options('art_style')
+        photographers = cls.style_options('photographer')
+        lighting = cls.style_options('lighting')
+        shot_types = cls.style_options('shot_type')
+        photography_types = cls.style_options('photography_type')
         return {
             "required": {
                 "keywords": ("STRING", {
@@ -113,28 +138,64 @@ class OllamaPrompter:
             },
             "optional": {
                 "ollama_url": ("STRING", {
-                    "default": "http://127.0.0.1:11434/api/generate"
+                    "default": DEFAULT_URL
                 }),
+                "connect_timeout": ("FLOAT", {"default": CONNECT_TIMEOUT, "min": 0.1, "max": 60.0, "step": 0.1}),
+                "read_timeout": ("FLOAT", {"default": READ_TIMEOUT, "min": 1.0, "max": 600.0, "step": 1.0}),
+                # Reuse stored responses for identical (model digest, instructions, prompt, seed) requests
+                "use_cache": ("BOOLEAN", {"default": True}),
+                # Streaming reads tokens as they arrive, honours ComfyUI's interrupt and can stop early
+                "stream": ("BOOLEAN", {"default": False}),
+                "max_tokens": ("INT", {"default": 0, "min": 0, "max": 8192, "tooltip": "0 = no limit"}),
+                "max_sentences": ("INT", {"default": 0, "min": 0, "max": 100, "tooltip": "Streaming only; 0 = no limit"}),
+                # Expand the keywords offline (see offline_expander) instead of returning an error
+                "offline_fallback": ("BOOLEAN", {"default": True, "tooltip": "Use the offline expander while Ollama is unreachable or too slow"}),
             }
         }
 
+    @classmethod
+    def VALIDATE_INPUTS(cls, photographer=None, camera=None, film=None, movement=None, art_style=None, lighting=None, shot_type=None, photography_type=None):
+        # One index lookup per style combo instead of ComfyUI's scan of the (possibly capped) option list.
+        # The batch node (INPUT_IS_LIST) gets every input as a list.
+        values = dict(locals())
+        del values["cls"]
+        for name, value in values.items():
+            if value is None:
+                continue
+            index = None
+            for choice in value if isinstance(value, list) else [value]:
+                if choice in ("random", "disabled"):
+                    continue
+                if index is None:
+                    index = cls.style_index(name)
+                if index is None or choice not in index:
+                    return f"Value not in list: {name}: '{choice}' is not in {STYLE_OPTIONS[name]}"
+        return True
+
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("descriptive_prompt",)
-    FUNCTION = "generate_prompt"
+    # Coroutine on ComfyUI versions that await node functions (see ollama_async)
+    FUNCTION = "generate_prompt_async" if ASYNC_EXECUTION else "generate_prompt"
     CATEGORY = CATEGORY
 
-    def generate_prompt(self, keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url="http://127.0.0.1:11434/api/generate"):
-        if not keywords.strip():
-            print("OllamaPrompter: No keywords provided. Returning empty string.")
-            return ("",)
-        # --- Seed validation and sanitization ---
+    @staticmethod
+    def sanitize_seed(seed):
         try:
             if isinstance(seed, str):
-                seed = int(seed.strip()) if seed.strip() else 0
-            elif not isinstance(seed, int):
-                seed = 0
+                return int(seed.strip()) if seed.strip() else 0
+            return seed if isinstance(seed, int) else 0
         except Exception:
-            seed = 0
+            return 0
+
+    @staticmethod
+    def resolve_style(prompt_style, seed):
+        # Handle random prompt_style; seeded so the same inputs always build the same request
+        return random.Random(seed).choice(["Flux", "SDXL"]) if prompt_style == "random" else prompt_style
+
+    @classmethod
+    def compose_prompt(cls, keywords, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed):
+        # Returns (prompt, system instructions, sanitized seed); no network access
+        seed = cls.sanitize_seed(seed)
         # Compose extra options with prefixes
         extra = []
         if photographer and photographer not in ["disabled", "random"]: extra.append(f"photographer: {photographer}")
@@ -145,45 +206,109 @@ class OllamaPrompter:
         if shot_type and shot_type not in ["disabled", "random"]: extra.append(f"shot type: {shot_type}")
         if photography_type and photography_type not in ["disabled", "random"]: extra.append(f"photography type: {photography_type}")
         # Use art_style description instead of name
-        art_styles_dict = self.load_art_styles()
+        art_styles_dict = cls.load_art_styles()
         if art_style and art_style not in ["disabled", "random"] and art_style in art_styles_dict:
             extra.append(f"art style: {art_styles_dict[art_style]}")
         prompt_full = keywords
         if extra:
             prompt_full = f"{keywords}, " + ", ".join(extra)
-        print(f"OllamaPrompter: Contacting Ollama at {ollama_url} with model {model_name} and style {prompt_style}...")
 
         # Use custom instructions if override is enabled
         if override_instructions and custom_instructions.strip():
             instructions = custom_instructions.strip()
         else:
-            # Handle random prompt_style
-            styles = ["Flux", "SDXL"]
-            style = prompt_style
-            if style == "random":
-                import random
-                style = random.choice(styles)
-            if style in styles:
-                loaded_instructions = self.load_prompt_instructions(style)
+            style = cls.resolve_style(prompt_style, seed)
+            if style in ("Flux", "SDXL"):
+                loaded_instructions = cls.load_prompt_instructions(style)
                 if loaded_instructions:
                     instructions = loaded_instructions
                 else:
                     instructions = "Prompt instructions not found."
             else:
                 instructions = ""
-        # All old hardcoded elif/else blocks for prompt_style removed
+        return prompt_full, instructions, seed
+
+    @classmethod
+    def offline_prompt(cls, keywords, seed, prompt_style, **choices):
+        # Expansion without Ollama (see offline_expander); the keywords themselves if even that fails
+        seed = cls.sanitize_seed(seed)
+        try:
+            prompt = expand_offline(keywords, cls.resolve_style(prompt_style, seed), choices, seed)
+        except Exception as e:
+            print(f"OllamaPrompter: Offline expansion failed: {e}")
+            return keywords
+        METRICS.count("ollama.offline")
+        return prompt
+
+    @staticmethod
+    def response_key(model_name, ollama_url, instructions, prompt_full, seed, stream=False, max_tokens=0, max_sentences=0, digest=None):
+        # Budgets change the output, so they are part of the key whenever they are in effect
+        max_sentences = max_sentences if stream else 0
+        variant = [seed, max_tokens, max_sentences] if max_tokens or max_sentences else seed
+        if digest is None:
+            digest = MODELS.digest(ollama_url, model_name)
+        return cache_key(model_name, digest, instructions, prompt_full, variant)
+
+    # Inputs IS_CHANGED needs as constants; a linked one is missing from its arguments
+    CACHE_KEY_INPUTS = ("keywords", "model_name", "prompt_style", "photographer", "camera", "film", "movement", "art_style",
+                        "lighting", "shot_type", "photography_type", "override_instructions", "custom_instructions", "seed")
 
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # A response already in the cache is fully determined by its key, so ComfyUI may skip the node.
+        # Anything else (cache off, linked inputs, not yet cached, last run failed) must execute again.
+        # Runs during validation: only the cached model list is read, nothing waits on the network, and
+        # no request is sent unless COMFYUI_OUTFITS_PREFETCH_PROMPTS=1 (see ollama_async).
+        if not kwargs.get("use_cache", True) or any(not isinstance(kwargs.get(name), (str, int, bool)) for name in cls.CACHE_KEY_INPUTS):
+            return float("nan")
+        keywords = kwargs["keywords"]
+        if not keywords.strip():
+            return float("nan")
+        ollama_url = kwargs.get("ollama_url", DEFAULT_URL)
+        stream = kwargs.get("stream", False)
+        max_tokens = kwargs.get("max_tokens", 0)
+        max_sentences = kwargs.get("max_sentences", 0)
+        prompt_full, instructions, seed = cls.compose_prompt(**{name: kwargs[name] for name in cls.CACHE_KEY_INPUTS if name != "model_name"})
+        models = MODELS.peek(ollama_url)
+        if not models:
+            return float("nan")
+        model = next((m for m in models if m["name"] == kwargs["model_name"]), models[0])
+        model_name = model["name"]
+        key = cls.response_key(model_name, ollama_url, instructions, prompt_full, seed, stream, max_tokens, max_sentences, digest=model.get("digest", ""))
+        if RESPONSES.contains(key):
+            return key
+        if PREFETCH_PROMPTS and get_breaker(ollama_url).allow():
+            # The keywords are known already: hand the call to the shared loop (see ollama_async), which
+            # runs it while the rest of the graph executes. generate_prompt joins it, and the response
+            # lands in the cache either way.
+            payload = cls.build_payload(model_name, instructions, prompt_full, seed, max_tokens)
+            timeout = (kwargs.get("connect_timeout", CONNECT_TIMEOUT), kwargs.get("read_timeout", READ_TIMEOUT))
+            blocking = lambda: cls.request_completion(ollama_url, payload, timeout, stream, max_tokens, max_sentences)
+            ASYNC_OLLAMA.start(key, ollama_url, payload, timeout, blocking, stream, store=True)
+        return float("nan")
+
+    @classmethod
+    def resolve_model(cls, model_name, ollama_url):
+        # Returns the installed model to use, or None when Ollama reports no models
         # This check is good, but now less critical at runtime since the dropdown ensures a valid model is selected
         # It's still good practice to keep it as a fallback.
-        installed_models = self.get_installed_models(ollama_url)
+        installed_models = cls.get_installed_models(ollama_url)
+        if installed_models and model_name != "disabled" and model_name not in installed_models:
+            # The cached list may predate an 'ollama pull'; check once more before falling back
+            try:
+                installed_models = [m["name"] for m in MODELS.fetch(ollama_url)]
+            except Exception as e:
+                print(f"OllamaPrompter: Could not fetch installed models: {e}")
         if not installed_models:
-            error_message = "OllamaPrompter Error: No models found in Ollama. Please pull a model (e.g., 'ollama pull llama3')."
-            print(error_message)
-            return (f"ERROR: NO OLLAMA MODELS FOUND. Original keywords: {keywords}",)
+            print("OllamaPrompter Error: No models found in Ollama. Please pull a model (e.g., 'ollama pull llama3').")
+            return None
         if model_name not in installed_models:
             print(f"OllamaPrompter: Model '{model_name}' not found. Using first installed model: {installed_models[0]}")
             model_name = installed_models[0]
+        return model_name
 
+    @staticmethod
+    def build_payload(model_name, instructions, prompt_full, seed, max_tokens=0):
         payload = {
             "model": model_name,
             "system": instructions,
@@ -193,36 +318,302 @@ class OllamaPrompter:
                 "seed": seed
             }
         }
+        if max_tokens:
+            payload["options"]["num_predict"] = max_tokens
+        return payload
 
+    @staticmethod
+    def request_completion(ollama_url, payload, timeout, stream=False, max_tokens=0, max_sentences=0):
+        # One /api/generate round trip; raises on HTTP, parse or interrupt errors.
+        # Connection and HTTP errors and the latency (time to first token when streaming) feed the circuit breaker.
+        from requests.exceptions import RequestException
+        breaker = get_breaker(ollama_url)
+        start = time.perf_counter()
         try:
-            response = requests.post(ollama_url, json=payload, timeout=60)
-            response.raise_for_status()
+            if stream:
+                text, stats = stream_completion(ollama_url, payload, timeout, max_tokens, max_sentences, interrupted=processing_interrupted)
+            else:
+                with METRICS.timed("ollama.generate", model=payload.get("model")):
+                    response = get_session(ollama_url).post(ollama_url, json=payload, timeout=timeout)
+                    response.raise_for_status()
+        except RequestException:
+            breaker.record(False)
+            raise
+        if stream:
+            breaker.record(True, stats["ttft"] if stats["ttft"] is not None else stats["seconds"])
+            ttft = f"{stats['ttft'] * 1000:.0f} ms" if stats["ttft"] is not None else "n/a"
+            print(f"OllamaPrompter: Streamed {stats['tokens']} chunks in {stats['seconds']:.2f}s, time to first token {ttft}, stopped: {stats['stopped']}")
+            final_prompt = text.strip()
+        else:
+            breaker.record(True, time.perf_counter() - start)
             lines = response.text.strip().splitlines()
             response_json = json.loads(lines[-1])
             final_prompt = response_json.get("response", "").strip()
-            # Clean up potential quotation marks from the LLM response
-            if final_prompt.startswith('"') and final_prompt.endswith('"'):
-                final_prompt = final_prompt[1:-1]
-            if final_prompt.startswith("'") and final_prompt.endswith("'"):
-                final_prompt = final_prompt[1:-1]
+        return clean_completion(final_prompt)
+
+    def prepare_request(self, keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url=DEFAULT_URL, use_cache=True, stream=False, max_tokens=0, max_sentences=0, offline=None):
+        # (response key, model, payload, None) for a request to send, or (None, None, None, output)
+        # when the output is already known (no keywords, no models, cached, offline). offline() is
+        # the offline expansion, or None to report errors instead.
+        if not keywords.strip():
+            print("OllamaPrompter: No keywords provided. Returning empty string.")
+            return None, None, None, ""
+        if offline is not None and not get_breaker(ollama_url).allow():
+            # Ollama failed repeatedly: do not wait on it until the background probe sees it again
+            output = offline()
+            print(f"OllamaPrompter: Ollama at {ollama_url} is unavailable. Offline prompt: {output}")
+            return None, None, None, output
+        prompt_full, instructions, seed = self.compose_prompt(keywords, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed)
+        print(f"OllamaPrompter: Contacting Ollama at {ollama_url} with model {model_name} and style {prompt_style}...")
+
+        model_name = self.resolve_model(model_name, ollama_url)
+        if model_name is None:
+            if offline is not None:
+                output = offline()
+                print(f"OllamaPrompter: Offline prompt: {output}")
+                return None, None, None, output
+            return None, None, None, f"ERROR: NO OLLAMA MODELS FOUND. Original keywords: {keywords}"
+
+        # The key also identifies the request in flight, so it is computed with the cache off too
+        key = self.response_key(model_name, ollama_url, instructions, prompt_full, seed, stream, max_tokens, max_sentences)
+        if use_cache:
+            cached = RESPONSES.get(key)
+            if cached is not None:
+                print(f"OllamaPrompter: Cached prompt: {cached}")
+                return None, None, None, cached
+        return key, model_name, self.build_payload(model_name, instructions, prompt_full, seed, max_tokens), None
+
+    @staticmethod
+    def failure_output(e, keywords, offline=None):
+        # Node output for a failed request: the offline expansion when offline() is given, else an
+        # error string. An interrupt is handed back to ComfyUI instead.
+        from requests.exceptions import RequestException
+        if isinstance(e, StreamInterrupted):
+            # The connection is already closed
+            print(f"OllamaPrompter: Generation interrupted after {e.stats['tokens']} chunks")
+            throw_if_interrupted()
+            return ""
+        if isinstance(e, RequestException):
+            error_message = f"OllamaPrompter Error: Could not connect to Ollama. Make sure Ollama is running and the URL is correct. Details: {e}"
+            output = f"ERROR: OLLAMA NOT REACHABLE. Using original keywords: {keywords}"
+        else:
+            error_message = f"OllamaPrompter Error: An unexpected error occurred. {e}"
+            output = f"ERROR: UNEXPECTED. Using original keywords: {keywords}"
+        print(error_message)
+        if offline is not None:
+            output = offline()
+            print(f"OllamaPrompter: Offline prompt: {output}")
+        return output
+
+    def offline_expansion(self, keywords, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, seed, offline_fallback=True):
+        # offline() callable for prepare_request / failure_output, or None when the fallback is off
+        if not offline_fallback:
+            return None
+        choices = dict(photographer=photographer, camera=camera, film=film, movement=movement, art_style=art_style, lighting=lighting, shot_type=shot_type, photography_type=photography_type)
+        return lambda: self.offline_prompt(keywords, seed, prompt_style, **choices)
+
+    def generate_prompt(self, keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url=DEFAULT_URL, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, use_cache=True, stream=False, max_tokens=0, max_sentences=0, offline_fallback=True):
+        offline = self.offline_expansion(keywords, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, seed, offline_fallback)
+        key, _, payload, output = self.prepare_request(keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url, use_cache, stream, max_tokens, max_sentences, offline)
+        if output is not None:
+            return (output,)
+        try:
+            pending = ASYNC_OLLAMA.pending(key)
+            if pending is not None:
+                # Prefetched by IS_CHANGED (or requested by another node): wait for that call, as long
+                # as a request of our own could take, and give up on it when ComfyUI interrupts
+                final_prompt = wait_pending(pending, connect_timeout + read_timeout, processing_interrupted)
+            else:
+                final_prompt = self.request_completion(ollama_url, payload, (connect_timeout, read_timeout), stream, max_tokens, max_sentences)
             print(f"OllamaPrompter: Received prompt: {final_prompt}")
+            if use_cache and final_prompt:
+                RESPONSES.put(key, final_prompt)
             return (final_prompt,)
-        except requests.exceptions.RequestException as e:
-            error_message = f"OllamaPrompter Error: Could not connect to Ollama. Make sure Ollama is running and the URL is correct. Details: {e}"
-            print(error_message)
-            return (f"ERROR: OLLAMA NOT REACHABLE. Using original keywords: {keywords}",)
         except Exception as e:
-            error_message = f"OllamaPrompter Error: An unexpected error occurred. {e}"
-            print(error_message)
-            return (f"ERROR: UNEXPECTED. Using original keywords: {keywords}",)
+            return (self.failure_output(e, keywords, offline),)
+
+    async def generate_prompt_async(self, keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url=DEFAULT_URL, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, use_cache=True, stream=False, max_tokens=0, max_sentences=0, offline_fallback=True):
+        # generate_prompt for ComfyUI's async executor: the request runs on the shared loop (see
+        # ollama_async), joined with identical ones in flight, and the worker is free meanwhile
+        import asyncio
+        offline = self.offline_expansion(keywords, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, seed, offline_fallback)
+        key, _, payload, output = await asyncio.to_thread(self.prepare_request, keywords, model_name, prompt_style, photographer, camera, film, movement, art_style, lighting, shot_type, photography_type, override_instructions, custom_instructions, seed, ollama_url, use_cache, stream, max_tokens, max_sentences, offline)
+        if output is not None:
+            return (output,)
+        timeout = (connect_timeout, read_timeout)
+        blocking = lambda: self.request_completion(ollama_url, payload, timeout, stream, max_tokens, max_sentences)
+        try:
+            final_prompt = await wait_for(ASYNC_OLLAMA.start(key, ollama_url, payload, timeout, blocking, stream, store=use_cache), processing_interrupted)
+            print(f"OllamaPrompter: Received prompt: {final_prompt}")
+            return (final_prompt,)
+        except Exception as e:
+            return (self.failure_output(e, keywords, offline),)
 
     def __call__(self, **kwargs):
         return self.generate_prompt(**kwargs)
 
+class OllamaBatchPrompter(OllamaPrompter):
+    """
+    Expands a list of keyword strings (e.g. from an outfit batch node) with up
+    to `concurrency` requests in flight. Results keep the input order, and each
+    item is retried on its own, so one failure never fails the whole batch.
+    """
+
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
+    RETURN_NAMES = ("descriptive_prompts",)
+    FUNCTION = "generate_prompts_async" if ASYNC_EXECUTION else "generate_prompts"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        types = super().INPUT_TYPES()
+        # Match Ollama's own OLLAMA_NUM_PARALLEL when it is set for this process
+        types["optional"]["concurrency"] = ("INT", {"default": min(DEFAULT_CONCURRENCY, POOL_SIZE), "min": 1, "max": POOL_SIZE})
+        types["optional"]["retries"] = ("INT", {"default": 2, "min": 0, "max": 10})
+        return types
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("nan")
+
+    def expand_request(self, keywords, seed, model_name, options):
+        # (response key, payload, None) for one item, or (None, None, output) when it needs no request
+        if not keywords.strip():
+            return None, None, ""
+        prompt_full, instructions, seed = self.compose_prompt(keywords, seed=seed, **options["compose"])
+        key = self.response_key(model_name, options["ollama_url"], instructions, prompt_full, seed, options["stream"], options["max_tokens"], options["max_sentences"])
+        if options["use_cache"]:
+            cached = RESPONSES.get(key)
+            if cached is not None:
+                return None, None, cached
+        return key, self.build_payload(model_name, instructions, prompt_full, seed, options["max_tokens"]), None
+
+    def failed_item(self, keywords, seed, options):
+        # Output for an item Ollama could not expand
+        if not keywords.strip():
+            return ""
+        if options["offline_fallback"]:
+            return self.offline_prompt(keywords, seed, **options["compose"])
+        return f"ERROR: OLLAMA REQUEST FAILED. Using original keywords: {keywords}"
+
+    def expand_one(self, keywords, seed, model_name, options, retries):
+        key, payload, output = self.expand_request(keywords, seed, model_name, options)
+        if output is not None:
+            return output
+        breaker = get_breaker(options["ollama_url"])
+        for attempt in range(retries + 1):
+            if options["offline_fallback"] and not breaker.allow():
+                break
+            if processing_interrupted():
+                throw_if_interrupted()
+            try:
+                final_prompt = self.request_completion(options["ollama_url"], payload, options["timeout"], options["stream"], options["max_tokens"], options["max_sentences"])
+                if options["use_cache"] and final_prompt:
+                    RESPONSES.put(key, final_prompt)
+                return final_prompt
+            except StreamInterrupted:
+                throw_if_interrupted()
+                return ""
+            except Exception as e:
+                print(f"OllamaBatchPrompter: Attempt {attempt + 1}/{retries + 1} failed for '{keywords[:40]}': {e}")
+                if attempt < retries:
+                    time.sleep(min(RETRY_BACKOFF * 2 ** attempt, 5.0))
+        return self.failed_item(keywords, seed, options)
+
+    async def expand_one_async(self, keywords, seed, model_name, options, retries):
+        # expand_one on the shared loop; duplicates within and across batches share one call
+        import asyncio
+        key, payload, output = await asyncio.to_thread(self.expand_request, keywords, seed, model_name, options)
+        if output is not None:
+            return output
+        url, timeout = options["ollama_url"], options["timeout"]
+        blocking = lambda: self.request_completion(url, payload, timeout, options["stream"], options["max_tokens"], options["max_sentences"])
+        breaker = get_breaker(url)
+        for attempt in range(retries + 1):
+            if options["offline_fallback"] and not breaker.allow():
+                break
+            try:
+                future = ASYNC_OLLAMA.start(key, url, payload, timeout, blocking, options["stream"], store=options["use_cache"])
+                return await wait_for(future, processing_interrupted)
+            except StreamInterrupted:
+                throw_if_interrupted()
+                return ""
+            except Exception as e:
+                print(f"OllamaBatchPrompter: Attempt {attempt + 1}/{retries + 1} failed for '{keywords[:40]}': {e}")
+                if attempt < retries:
+                    await asyncio.sleep(min(RETRY_BACKOFF * 2 ** attempt, 5.0))
+        return self.failed_item(keywords, seed, options)
+
+    def batch_options(self, keywords, seed, ollama_url, concurrency, retries, kwargs):
+        # INPUT_IS_LIST: every input arrives as a list; widgets are one-element lists
+        def first(value, default):
+            return value[0] if value else default
+        ollama_url = first(ollama_url, DEFAULT_URL)
+        seeds = seed if len(seed) == len(keywords) else [first(seed, 0)] * len(keywords)
+        compose_args = ("prompt_style", "photographer", "camera", "film", "movement", "art_style", "lighting", "shot_type", "photography_type", "override_instructions", "custom_instructions")
+        options = {
+            "compose": {name: first(kwargs.get(name), "") for name in compose_args},
+            "ollama_url": ollama_url,
+            "timeout": (first(kwargs.get("connect_timeout"), CONNECT_TIMEOUT), first(kwargs.get("read_timeout"), READ_TIMEOUT)),
+            "use_cache": first(kwargs.get("use_cache"), True),
+            "stream": first(kwargs.get("stream"), False),
+            "max_tokens": first(kwargs.get("max_tokens"), 0),
+            "max_sentences": first(kwargs.get("max_sentences"), 0),
+            "offline_fallback": first(kwargs.get("offline_fallback"), True),
+        }
+        return options, seeds, min(first(concurrency, DEFAULT_CONCURRENCY), POOL_SIZE), first(retries, 2)
+
+    def offline_batch(self, keywords, seeds, options):
+        # The whole batch without Ollama, or None when it should be tried (or the fallback is off)
+        if not options["offline_fallback"] or get_breaker(options["ollama_url"]).allow():
+            return None
+        print(f"OllamaBatchPrompter: Ollama at {options['ollama_url']} is unavailable. Expanding {len(keywords)} prompts offline...")
+        return [self.failed_item(k, s, options) for k, s in zip(keywords, seeds)]
+
+    def no_models(self, keywords, seeds, options):
+        if options["offline_fallback"]:
+            return [self.failed_item(k, s, options) for k, s in zip(keywords, seeds)]
+        return [f"ERROR: NO OLLAMA MODELS FOUND. Original keywords: {k}" for k in keywords]
+
+    def generate_prompts(self, keywords, model_name, seed, ollama_url=None, concurrency=None, retries=None, **kwargs):
+        options, seeds, concurrency, retries = self.batch_options(keywords, seed, ollama_url, concurrency, retries, kwargs)
+        offline = self.offline_batch(keywords, seeds, options)
+        if offline is not None:
+            return (offline,)
+        model = self.resolve_model(model_name[0] if model_name else "disabled", options["ollama_url"])
+        if model is None:
+            return (self.no_models(keywords, seeds, options),)
+        print(f"OllamaBatchPrompter: Expanding {len(keywords)} prompts with {model}, {concurrency} in flight...")
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(keywords) or 1)), thread_name_prefix="ollama-batch") as pool:
+            results = list(pool.map(lambda item: self.expand_one(item[0], item[1], model, options, retries), zip(keywords, seeds)))
+        return (results,)
+
+    async def generate_prompts_async(self, keywords, model_name, seed, ollama_url=None, concurrency=None, retries=None, **kwargs):
+        import asyncio
+        options, seeds, concurrency, retries = self.batch_options(keywords, seed, ollama_url, concurrency, retries, kwargs)
+        offline = self.offline_batch(keywords, seeds, options)
+        if offline is not None:
+            return (offline,)
+        model = await asyncio.to_thread(self.resolve_model, model_name[0] if model_name else "disabled", options["ollama_url"])
+        if model is None:
+            return (self.no_models(keywords, seeds, options),)
+        print(f"OllamaBatchPrompter: Expanding {len(keywords)} prompts with {model}, {concurrency} in flight...")
+        slots = asyncio.Semaphore(max(1, concurrency))
+
+        async def expand(item):
+            async with slots:
+                return await self.expand_one_async(item[0], item[1], model, options, retries)
+        results = await asyncio.gather(*(expand(item) for item in zip(keywords, seeds)))
+        return (list(results),)
+
+
 NODE_CLASS_MAPPINGS = {
-    "OllamaPrompter": OllamaPrompter
+    "OllamaPrompter": OllamaPrompter,
+    "OllamaBatchPrompter": OllamaBatchPrompter
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "OllamaPrompter": "✨ Ollama Prompter"
+    "OllamaPrompter": "✨ Ollama Prompter",
+    "OllamaBatchPrompter": "✨ Ollama Batch Prompter"
 }
\ No newline at end of file
@@ -0,0 +1,78 @@
+# regions.py
+# Region outfit nodes generated from the catalog. Every directory under data/
+# that holds catalog files (other than the shared common/, styles/, prompts/
+# and templates/) becomes a single and a batch node; names and flags come from
+# data/common/country_codes.json. Adding a region only needs data files.
+import re
+from .ethnic_outfit_common import EthnicOutfitGenerator, EthnicOutfitBatchGenerator, CATALOG, CATEGORY, get_country_info
+
+NON_REGION_DIRS = ("common", "styles", "prompts", "templates")
+
+
+def region_codes():
+    """
+    Region directories, those listed in country_codes.json first (in file
+    order), then any others alphabetically. Directory listings are cached by
+    mtime in the catalog store, so this is a handful of stat calls once warm.
+    """
+    found = [d for d in CATALOG.list_dirs() if d not in NON_REGION_DIRS and CATALOG.list_json(d)]
+    codes = CATALOG.load_default('common', 'country_codes.json', default={})
+    listed = [code for code in codes if code in found]
+    return listed + [code for code in found if code not in listed]
+
+
+def class_prefix(region_code, info):
+    # "Indian" -> IndianOutfitNode; falls back to the country name, then the code
+    for text in (info.get("demonym"), info.get("name"), region_code.upper()):
+        prefix = re.sub(r"[^0-9A-Za-z]", "", text or "")
+        if prefix and not prefix[0].isdigit():
+            return prefix
+    return "Region" + re.sub(r"[^0-9A-Za-z]", "", region_code)
+
+
+def _node_init(self, seed=None):
+    EthnicOutfitGenerator.__init__(self, self.region_code, seed)
+
+
+def make_region_nodes(region_code):
+    """Returns ({class name: class}, {class name: display name}) for one region."""
+    info = get_country_info(region_code)
+    prefix = class_prefix(region_code, info)
+    label = f'{info.get("flag", "")} {info.get("name", region_code.upper())} Outfit'.strip()
+    single = type(f"{prefix}OutfitNode", (EthnicOutfitGenerator,), {
+        "__module__": __name__,
+        "__init__": _node_init,
+        "RETURN_TYPES": ("STRING", "INT"),
+        "RETURN_NAMES": ("description", "seed"),
+        "FUNCTION": "generate_description",
+        "CATEGORY": CATEGORY,
+        "region_code": region_code,
+    })
+    batch = type(f"{prefix}OutfitBatchNode", (EthnicOutfitBatchGenerator,), {
+        "__module__": __name__,
+        "__init__": _node_init,
+        "region_code": region_code,
+    })
+    classes = {single.__name__: single, batch.__name__: batch}
+    names = {single.__name__: label, batch.__name__: f"{label} (Batch)"}
+    return classes, names
+
+
+def build_mappings():
+    class_mappings = {}
+    display_names = {}
+    for region_code in region_codes():
+        classes, names = make_region_nodes(region_code)
+        for name, cls in classes.items():
+            if name in class_mappings:
+                print(f"Outfits: Skipping region '{region_code}', node {name} already registered for '{class_mappings[name].region_code}'")
+                break
+        else:
+            class_mappings.update(classes)
+            display_names.update(names)
+    return class_mappings, display_names
+
+
+NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS = build_mappings()
+# Module attributes, so the generated classes can be imported and pickled by name
+globals().update(NODE_CLASS_MAPPINGS)
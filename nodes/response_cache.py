@@ -0,0 +1,168 @@
+# response_cache.py
+# Persistent, content-addressed cache of Ollama completions.
+# Non-streaming requests with a fixed seed are deterministic for a given
+# (model digest, system instructions, prompt, seed), so their responses are
+# stored in SQLite under a hash of that tuple and survive ComfyUI restarts.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from .instrumentation import METRICS
+
+CACHE_DIR = os.environ.get(
+    "COMFYUI_OUTFITS_CACHE_DIR",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "cache")),
+)
+MAX_ENTRIES = int(os.environ.get("COMFYUI_OUTFITS_CACHE_MAX_ENTRIES", 20000))
+MAX_BYTES = int(os.environ.get("COMFYUI_OUTFITS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+MEMORY_ENTRIES = 1024
+EVICT_TO = 0.9  # eviction trims to this share of the budgets, so it runs once per batch of writes
+
+
+def cache_key(model, digest, system, prompt, seed):
+    raw = json.dumps([model, digest or "", system or "", prompt, seed], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LRU store with an in-memory front for hot keys. Memory hits
+    do not touch the database: their last_used times are written with the
+    next database access. Disk hits refresh last_used directly. Entry and
+    byte totals are kept as running counts, and once either budget is
+    exceeded eviction drops the least recently used rows down to EVICT_TO of
+    both budgets.
+    """
+
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "ollama_responses.sqlite3")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> last_used of memory hits not yet written
+        self._count = self._bytes = 0  # rows and response bytes in the database
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        # Opened (and sqlite3 imported) lazily so importing the node never touches the filesystem
+        if self._conn is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._count, self._bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        if len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self, db):
+        if self._touched:
+            db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                           [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def get(self, key):
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self._touched[key] = time.time()
+                self.hits += 1
+                return response
+            import sqlite3
+            try:
+                db = self._db()
+                self._flush_touched(db)
+                row = db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            except sqlite3.Error as e:
+                print(f"OllamaPrompter: Response cache read failed: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def contains(self, key):
+        return self.get(key) is not None
+
+    def put(self, key, response):
+        import sqlite3
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._remember(key, response)
+            self._touched.pop(key, None)
+            try:
+                db = self._db()
+                self._flush_touched(db)
+                old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, response, size, now, now),
+                )
+                self._count += old is None
+                self._bytes += size - (old[0] if old else 0)
+                if self._count > self.max_entries or self._bytes > self.max_bytes:
+                    self._evict(db)
+            except sqlite3.Error as e:
+                print(f"OllamaPrompter: Response cache write failed: {e}")
+
+    def _evict(self, db):
+        # Recounted here, as another process may share the file
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._count, self._bytes = count, total
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Drop the least recently used rows until both totals are down to EVICT_TO of their budget
+        excess_rows = max(0, count - int(self.max_entries * EVICT_TO))
+        excess_bytes = max(0, total - int(self.max_bytes * EVICT_TO))
+        dropped_rows = dropped_bytes = 0
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if dropped_rows >= excess_rows and dropped_bytes >= excess_bytes:
+                break
+            doomed.append((key,))
+            dropped_rows += 1
+            dropped_bytes += size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._count -= dropped_rows
+        self._bytes -= dropped_bytes
+        for (key,) in doomed:
+            self._memory.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if os.path.exists(self.path):
+                self._db().execute("DELETE FROM responses")
+                self._count = self._bytes = 0
+
+
+RESPONSES = ResponseCache()
+METRICS.gauge("response_cache", RESPONSES.stats)
@@ -0,0 +1,163 @@
+# sampling.py
+# Weighted, constraint-aware slot sampling for the compiled region catalogs.
+#
+# Catalog entries may be dicts carrying optional tags next to "name":
+#   "weight":   relative draw weight (default 1)
+#   "gender":   genders the entry suits, e.g. ["female"] ("unisex" suits all)
+#   "age":      ages the entry suits, e.g. ["teen", "young adult"]
+#   "region":   region codes the entry is used in (for shared files like styles/poses.json)
+#   "excludes": entry names (in any slot) that must not appear together with it
+# Every (slot, gender, age, excluded entries) combination gets its own
+# candidate table, built on first use and cached, so a draw is O(1) (Vose
+# alias method for weighted tables, one scaled uniform for uniform ones) and
+# never rejects.
+from array import array
+from .catalog_pack import StringView
+
+TAG_KEYS = ("weight", "gender", "age", "region", "excludes")
+# Request values that do not constrain anything
+UNCONSTRAINED = ("", "random", "unisex", None)
+
+
+def _as_set(value):
+    if value is None:
+        return frozenset()
+    if isinstance(value, str):
+        return frozenset((value,))
+    return frozenset(v for v in value if isinstance(v, str))
+
+
+def normalize_tags(raw):
+    # Raw tag mapping from a catalog entry -> {"weight": float, "gender"/"age"/"region"/"excludes": frozenset}
+    tags = {}
+    if "weight" in raw:
+        try:
+            weight = float(raw["weight"])
+        except (TypeError, ValueError):
+            weight = 1.0
+        tags["weight"] = max(weight, 0.0)
+    for key in ("gender", "age", "region", "excludes"):
+        if key in raw:
+            tags[key] = _as_set(raw[key])
+    return tags
+
+
+def allows(tags, key, value):
+    # Whether an entry's gender/age tag admits the requested value
+    if value in UNCONSTRAINED:
+        return True
+    allowed = tags.get(key)
+    if not allowed:
+        return True
+    return value in allowed or (key == "gender" and "unisex" in allowed)
+
+
+def subset(names, positions):
+    # names restricted to positions, keeping packed views packed
+    if isinstance(names, StringView):
+        return StringView(names.pack, array("I", (names.ids[p] for p in positions)))
+    return tuple(names[p] for p in positions)
+
+
+class AliasTable:
+    """Vose alias table over indices 0..n-1: pick(u) maps one uniform in [0, 1) to an index."""
+
+    __slots__ = ("n", "prob", "alias")
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        self.n = n
+        self.prob = prob
+        self.alias = alias
+
+    def pick(self, u):
+        x = u * self.n
+        i = min(int(x), self.n - 1)
+        return i if x - i < self.prob[i] else self.alias[i]
+
+
+class SlotTable:
+    """
+    Candidates of one slot under one constraint combination. names are the
+    candidate values, positions their indices in the compiled slot table
+    (None when every entry is a candidate), alias is None for uniform weights.
+    """
+
+    __slots__ = ("names", "positions", "alias", "_state")
+
+    def __init__(self, names, positions=None, alias=None):
+        self.names = names
+        self.positions = positions
+        self.alias = alias
+        self._state = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def pick(self, u):
+        # Candidate index for a uniform u in [0, 1)
+        if self.alias is not None:
+            return self.alias.pick(u)
+        return min(int(u * len(self.names)), len(self.names) - 1)
+
+    def value(self, u):
+        # The candidate a uniform draw u (see substreams) selects
+        return self.names[self.pick(u)]
+
+    def position(self, k):
+        return k if self.positions is None else self.positions[k]
+
+    def draw_state(self):
+        """
+        (size, alias probabilities, aliases, names, decoded names) for loops that
+        inline pick(): the alias lists are None for uniform weights, and packed
+        names are decoded into the last list (None until first drawn) once each.
+        """
+        if self._state is None:
+            names = self.names
+            decoded = [None] * len(names) if isinstance(names, StringView) else names
+            prob, alias = (None, None) if self.alias is None else (self.alias.prob, self.alias.alias)
+            self._state = (len(names), prob, alias, names, decoded)
+        return self._state
+
+
+def build_table(names, tags, gender=None, age=None, excluded=()):
+    """SlotTable of the entries that pass the gender/age tags and are not excluded; None if none do."""
+    if not tags and not excluded:
+        return SlotTable(names) if len(names) else None
+    positions = []
+    weights = []
+    for p in range(len(names)):
+        if p in excluded:
+            continue
+        entry = tags.get(p)
+        weight = 1.0
+        if entry is not None:
+            if not (allows(entry, "gender", gender) and allows(entry, "age", age)):
+                continue
+            weight = entry.get("weight", 1.0)
+        if weight > 0:
+            positions.append(p)
+            weights.append(weight)
+    if not positions:
+        return None
+    alias = AliasTable(weights) if len(set(weights)) > 1 else None
+    if len(positions) == len(names):
+        return SlotTable(names, None, alias)
+    return SlotTable(subset(names, positions), tuple(positions), alias)
@@ -0,0 +1,80 @@
+# substreams.py
+# Counter-based random substreams for slot draws.
+#
+# Item seed S and slot name s give one independent 64-bit draw
+#   bits(S, s, n) = mix64((splitmix64(S) ^ key(s)) + n * GOLDEN)
+# where key(s) hashes the slot name and n is a counter (0 for the single
+# uniform a slot draw needs). A slot's value depends only on S, its name and
+# its candidate table (SlotTable.pick maps the uniform to an entry): adding a
+# slot or fixing another one leaves every other draw unchanged, and any slot
+# of any seed is computed directly, without drawing the rest.
+# uniforms() evaluates the same arithmetic on NumPy uint64 arrays, so the
+# python and numpy engines, batches and single calls agree value for value.
+import hashlib
+
+MASK64 = 0xffffffffffffffff
+GOLDEN = 0x9e3779b97f4a7c15
+UNIT = 2.0 ** -53  # top 53 bits -> [0, 1), exact in a double
+
+
+def mix64(x):
+    # splitmix64 finalizer
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & MASK64
+    return x ^ (x >> 31)
+
+
+def splitmix64(x):
+    return mix64((x + GOLDEN) & MASK64)
+
+
+_slot_keys = {}
+
+
+def slot_key(slot):
+    key = _slot_keys.get(slot)
+    if key is None:
+        key = _slot_keys[slot] = int.from_bytes(hashlib.blake2b(slot.encode("utf-8"), digest_size=8).digest(), "little")
+    return key
+
+
+class SeedStream:
+    """The substreams of one item seed."""
+
+    __slots__ = ("seed", "base")
+
+    def __init__(self, seed):
+        self.seed = seed & MASK64
+        self.base = splitmix64(self.seed)
+
+    def bits(self, slot, counter=0):
+        return mix64(((self.base ^ slot_key(slot)) + counter * GOLDEN) & MASK64)
+
+    def uniform(self, slot, counter=0):
+        return (self.bits(slot, counter) >> 11) * UNIT
+
+
+def uniform(seed, slot, counter=0):
+    """Draw counter of slot's substream for seed, in [0, 1)."""
+    return SeedStream(seed).uniform(slot, counter)
+
+
+def uniforms(seeds, slots, counter=0):
+    """(len(seeds) x len(slots)) float64 array of uniform(seed, slot) for a NumPy uint64 array of seeds."""
+    import numpy as np
+    u64 = np.uint64
+
+    def mix(x):
+        x = (x ^ (x >> u64(30))) * u64(0xbf58476d1ce4e5b9)
+        x = (x ^ (x >> u64(27))) * u64(0x94d049bb133111eb)
+        return x ^ (x >> u64(31))
+
+    out = np.empty((len(seeds), len(slots)), dtype=np.float64)
+    # uint64 arithmetic wraps modulo 2^64, like the masks of the scalar version
+    with np.errstate(over="ignore"):
+        base = mix(np.asarray(seeds, dtype=np.uint64) + u64(GOLDEN))
+        offset = u64(counter * GOLDEN & MASK64)
+        for j, slot in enumerate(slots):
+            bits = mix((base ^ u64(slot_key(slot))) + offset)
+            out[:, j] = (bits >> u64(11)).astype(np.float64) * UNIT
+    return out
@@ -0,0 +1,207 @@
+# templates.py
+# Declarative description templates, compiled once into str.format plans.
+#
+# data/templates/<target>.json holds the "detailed" and "simple" template of
+# one target model (default, flux, sdxl, ...); data/<region>/templates.json
+# may override any of them per region as {"<target>": {"detailed": ...}}.
+#
+# A template is a tree:
+#   "text {field}"   emitted only when every field it names is non-empty
+#   [a, b, ...]      the emitted items joined by single spaces
+#   {"items": [...], "join": ", ", "prefix": "", "suffix": "",
+#    "first": false, "capitalize": false}
+#                    the emitted items joined by "join" (only the first one
+#                    with "first"), wrapped in prefix / suffix, nothing when
+#                    no item is emitted; "capitalize" upper-cases its first letter
+# Fields are the slot names plus age, gender, trigger_word and custom_text.
+# What gets emitted depends only on which fields are empty, so each emptiness
+# pattern is resolved once into a flat format string: rendering is a tuple of
+# flags, a dict lookup and one str.format_map call, with no cleanup pass.
+from collections.abc import Mapping, Sequence
+from string import Formatter
+
+TARGETS_DIR = "templates"
+REGION_FILE = "templates"  # data/<region>/templates.json
+MODES = ("detailed", "simple")
+MAX_PLANS = 4096  # emptiness patterns cached per template
+
+
+def capitalize(text):
+    return text[:1].upper() + text[1:]
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class _Text:
+    __slots__ = ("pieces", "fields")
+
+    def __init__(self, text):
+        # pieces: literal strings and (field, capitalized) pairs
+        self.pieces = []
+        self.fields = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                self.pieces.append(literal)
+            if field is not None:
+                if not field or spec or conversion:
+                    raise ValueError(f"Unsupported placeholder in template text {text!r}")
+                self.pieces.append((field, False))
+                self.fields.append(field)
+
+    def resolve(self, present):
+        if all(present(f) for f in self.fields):
+            return list(self.pieces)
+        return []
+
+    def walk(self):
+        return self.fields
+
+
+class _Group:
+    __slots__ = ("items", "join", "prefix", "suffix", "first", "capitalize")
+
+    def __init__(self, items, join=" ", prefix="", suffix="", first=False, capitalize=False):
+        self.items = items
+        self.join = join
+        self.prefix = prefix
+        self.suffix = suffix
+        self.first = first
+        self.capitalize = capitalize
+
+    def resolve(self, present):
+        out = []
+        for item in self.items:
+            pieces = item.resolve(present)
+            if not pieces:
+                continue
+            if out and self.join:
+                out.append(self.join)
+            out.extend(pieces)
+            if self.first:
+                break
+        if not out:
+            return out
+        if self.prefix:
+            out.insert(0, self.prefix)
+        if self.suffix:
+            out.append(self.suffix)
+        if self.capitalize:
+            head = out[0]
+            out[0] = capitalize(head) if isinstance(head, str) else (head[0], True)
+        return out
+
+    def walk(self):
+        return [f for item in self.items for f in item.walk()]
+
+
+def compile_spec(spec):
+    """Template tree (as loaded from JSON or the catalog pack) -> resolvable node."""
+    if isinstance(spec, str):
+        return _Text(spec)
+    if isinstance(spec, Mapping):
+        unknown = set(spec) - {"items", "join", "prefix", "suffix", "first", "capitalize"}
+        if unknown:
+            raise ValueError(f"Unknown template keys: {', '.join(sorted(unknown))}")
+        return _Group(
+            [compile_spec(item) for item in spec.get("items", ())],
+            join=spec.get("join", " "),
+            prefix=spec.get("prefix", ""),
+            suffix=spec.get("suffix", ""),
+            first=bool(spec.get("first", False)),
+            capitalize=bool(spec.get("capitalize", False)),
+        )
+    if isinstance(spec, Sequence):
+        return _Group([compile_spec(item) for item in spec])
+    raise ValueError(f"Invalid template node: {spec!r}")
+
+
+class DescriptionTemplate:
+    """A compiled template; render(values) fills it from a field -> text mapping."""
+
+    def __init__(self, spec, name="default"):
+        self.name = name
+        self.root = compile_spec(spec)
+        self.fields = tuple(dict.fromkeys(self.root.walk()))
+        self._plans = {}
+
+    def pieces(self, present):
+        # Literal strings and (field, capitalized) pairs for one emptiness pattern
+        return self.root.resolve(present)
+
+    def plan(self, key):
+        # key: one emptiness flag per self.fields -> (format string, capitalized fields)
+        plan = self._plans.get(key)
+        if plan is None:
+            flags = dict(zip(self.fields, key))
+            parts = []
+            capitalized = []
+            for piece in self.pieces(flags.__getitem__):
+                if isinstance(piece, str):
+                    parts.append(_escape(piece))
+                elif piece[1]:
+                    parts.append("{^%s}" % piece[0])
+                    capitalized.append(piece[0])
+                else:
+                    parts.append("{%s}" % piece[0])
+            plan = ("".join(parts), tuple(dict.fromkeys(capitalized)))
+            if len(self._plans) < MAX_PLANS:
+                self._plans[key] = plan
+        return plan
+
+    def render(self, values):
+        get = values.get
+        fmt, capitalized = self.plan(tuple([bool(get(f)) for f in self.fields]))
+        if capitalized:
+            values = dict(values)
+            for field in capitalized:
+                values["^" + field] = capitalize(values[field])
+        return fmt.format_map(values)
+
+    def specialize(self, constants, variables):
+        """
+        The template for rows where the fields in variables (all non-empty) vary
+        and every other field is taken from constants, as (texts, args): a row
+        renders as texts[0] + value_0 + texts[1] + ... + value_k + texts[k + 1],
+        where args[k] = (index into variables, capitalized) gives value_k.
+        """
+        index = {field: j for j, field in enumerate(variables)}
+        texts = [[]]
+        args = []
+        present = lambda f: f in index or bool(constants.get(f))
+        for piece in self.pieces(present):
+            if isinstance(piece, str):
+                texts[-1].append(piece)
+            elif piece[0] in index:
+                args.append((index[piece[0]], piece[1]))
+                texts.append([])
+            else:
+                value = constants[piece[0]]
+                texts[-1].append(capitalize(value) if piece[1] else value)
+        return tuple("".join(text) for text in texts), tuple(args)
+
+
+def merge_specs(targets, region_specs):
+    """{target: {mode: spec}} from the shared target files, overridden per mode by the region's file."""
+    merged = {name: dict(spec) for name, spec in targets.items() if isinstance(spec, Mapping)}
+    if isinstance(region_specs, Mapping):
+        for name, spec in region_specs.items():
+            if isinstance(spec, Mapping):
+                merged.setdefault(name, {}).update(spec)
+    return merged
+
+
+def target_names(specs):
+    # "default" first, then the rest alphabetically
+    names = sorted(specs)
+    return (["default"] if "default" in specs else []) + [n for n in names if n != "default"]
+
+
+def build_template(specs, target="default", detailed=True):
+    mode = MODES[0] if detailed else MODES[1]
+    for name in (target, "default"):
+        spec = specs.get(name, {}).get(mode)
+        if spec is not None:
+            return DescriptionTemplate(spec, name)
+    raise ValueError(f"No '{mode}' description template for target '{target}' (see data/{TARGETS_DIR}/)")
@@ -0,0 +1,270 @@
+# vector_engine.py
+# NumPy sampling engine for bulk outfit generation.
+#
+# Seed semantics: item i of base seed S uses seed S + i, and each random slot
+# takes its uniform from that seed's substream for the slot (see substreams).
+# Blocks of up to BLOCK_SIZE items compute their (rows x random slots) matrix
+# of uniforms in one pass and map each column through the slot's table (its
+# alias table when weighted), exactly like SlotTable.pick, so every item
+# equals the "python" engine's and the single node's for the same seed.
+#
+# Rows whose earlier values exclude entries of a later slot ("excludes" tags)
+# are redrawn from the matching narrowed table with the same uniform, so
+# nothing is rejected; descriptions use one specialized template per
+# pattern of empty random slots.
+import numpy as np
+from .ethnic_outfit_common import compile_region
+from .substreams import MASK64, uniforms
+from .templates import capitalize
+
+BLOCK_SIZE = 65536
+
+
+class _Arrays:
+    """A SlotTable as arrays: candidate names, alias table, and each candidate's index in the slot's base table."""
+
+    __slots__ = ("names", "n", "prob", "alias", "base")
+
+    def __init__(self, table, base_positions=None):
+        self.names = np.array(list(table), dtype=object)
+        self.n = len(self.names)
+        self.prob = self.alias = None
+        if table.alias is not None:
+            self.prob = np.array(table.alias.prob)
+            self.alias = np.array(table.alias.alias, dtype=np.int64)
+        self.base = None
+        if base_positions is not None:
+            # Narrowed tables are subsets of the base table, both in compiled-position order
+            self.base = np.searchsorted(base_positions, _positions(table))
+
+    def pick(self, u):
+        # Vectorized SlotTable.pick: uniforms -> candidate indices
+        x = u * self.n
+        i = np.minimum(x.astype(np.int64), self.n - 1)
+        if self.prob is None:
+            return i
+        return np.where(x - i < self.prob[i], i, self.alias[i])
+
+
+def _positions(table):
+    return np.arange(len(table), dtype=np.int64) if table.positions is None else np.array(table.positions, dtype=np.int64)
+
+
+class VectorPlan:
+    """
+    Per-request plan: the random slots' tables as arrays, the "excludes" tags
+    that can narrow them as lookup arrays, and the description template
+    specialized to per-candidate text pieces (fixed slots inlined, one
+    piece per random slot), one per pattern of empty random slots.
+
+    Draws track each row's index into the slot's base table. For every later
+    slot an earlier slot's "excludes" reach, a code array over the earlier
+    slot's base candidates says which excluded set its value contributes, so
+    the rows needing a narrowed table are found, grouped by the combined
+    excluded set and redrawn with the same uniforms by one vectorized pick
+    per group (narrowed tables are cached per excluded set).
+    """
+
+    def __init__(self, generator, kwargs):
+        self.generator = generator
+        self.compiled = compile_region(generator.region_code)
+        self.fixed, random_slots = generator.slot_plan(kwargs, self.compiled)
+        self.slots = [slot for slot, _ in random_slots]
+        self.gender = kwargs.get("gender", "unisex")
+        self.age = kwargs.get("age", "random")
+        self.tables = [_Arrays(table) for _, table in random_slots]
+        self.base_positions = [_positions(table) for _, table in random_slots]
+        self.base_excluded = self.compiled.excluded_by(self.fixed)
+        self.triggers = self._triggers()
+        self._narrowed = {}
+        # Slots whose value can be "" in some rows, which changes the emitted phrases
+        self.maybe_empty = [j for j, arrays in enumerate(self.tables) if self.triggers[j] or (arrays.names == "").any()]
+        self.options = generator.description_options(kwargs, self.compiled)
+        options = self.options
+        self.constants = generator.description_fields(self.fixed, options["age"], options["gender"],
+                                                      options["trigger_word"], options["custom_text"])
+        self._templates = {}
+
+    def _triggers(self):
+        # triggers[j]: [(k, codes, hits)] for the earlier random slots k whose values exclude entries of
+        # slot j: codes[index + 1] is 0, or c when base candidate index of slot k excludes hits[c - 1]
+        triggers = [[] for _ in self.slots]
+        exclusions = self.compiled.exclusions()
+        if not exclusions:
+            return triggers
+        order = {slot: j for j, slot in enumerate(self.slots)}
+        by_slot = {}
+        for (slot, name), hit in exclusions.items():
+            if slot in order:
+                by_slot.setdefault(order[slot], []).append((name, hit))
+        for k, entries in sorted(by_slot.items()):
+            where = {}
+            for index, name in enumerate(self.tables[k].names):
+                where.setdefault(name, []).append(index)
+            for j in range(k + 1, len(self.slots)):
+                codes = np.zeros(self.tables[k].n + 1, dtype=np.int64)
+                hits = []
+                for name, hit in entries:
+                    positions = hit.get(self.slots[j])
+                    if positions and name in where:
+                        hits.append(positions)
+                        codes[np.array(where[name]) + 1] = len(hits)
+                if hits:
+                    triggers[j].append((k, codes, hits))
+        return triggers
+
+    def narrowed(self, j, excluded):
+        # _Arrays of random slot j under an excluded set (None when nothing qualifies), cached
+        key = (j, excluded)
+        if key not in self._narrowed:
+            table = self.compiled.table(self.slots[j], self.gender, self.age, excluded)
+            self._narrowed[key] = None if table is None else _Arrays(table, self.base_positions[j])
+        return self._narrowed[key]
+
+    def block_uniforms(self, seed, first, rows):
+        # Uniforms of items first .. first + rows - 1, one column per random slot
+        seeds = np.uint64(seed & MASK64) + np.arange(first, first + rows, dtype=np.uint64)
+        return uniforms(seeds, self.slots)
+
+    def columns(self, draws):
+        # Column value arrays of one block, exactly like draw_excluding row by row, and each
+        # row's index into the slot's base table (-1 where the slot is empty)
+        columns = []
+        indices = []
+        for j, arrays in enumerate(self.tables):
+            u = draws[:, j]
+            index = arrays.pick(u)
+            column = arrays.names[index]
+            if self.triggers[j]:
+                self.redraw_excluded(j, u, index, column, indices)
+            indices.append(index)
+            columns.append(column)
+        return columns, indices
+
+    def redraw_excluded(self, j, u, index, column, indices):
+        # Rows whose earlier values exclude entries of slot j, grouped by the combined trigger
+        # codes (one excluded set per group), are redrawn from the narrowed table in place
+        triggers = self.triggers[j]
+        groups = np.zeros(len(u), dtype=np.int64)
+        for k, codes, hits in triggers:
+            groups = groups * (len(hits) + 1) + codes[indices[k] + 1]
+            groups = np.unique(groups, return_inverse=True)[1].reshape(-1)
+        order = np.argsort(groups, kind="stable")
+        ends = np.cumsum(np.bincount(groups))
+        base = self.base_excluded.get(self.slots[j], frozenset())
+        for end, count in zip(ends, np.diff(ends, prepend=0)):
+            rows = order[end - count:end]
+            excluded = base
+            for k, codes, hits in triggers:
+                code = codes[indices[k][rows[0]] + 1]
+                if code:
+                    excluded = excluded | hits[code - 1]
+            if excluded == base:
+                continue
+            narrowed = self.narrowed(j, excluded)
+            if narrowed is None:
+                index[rows] = -1
+                column[rows] = ""
+            else:
+                picked = narrowed.pick(u[rows])
+                index[rows] = narrowed.base[picked]
+                column[rows] = narrowed.names[picked]
+
+    def iter_blocks(self, seed, start, count):
+        # Yields (first item index, rows, column value arrays, base-table indices) covering
+        # items start .. start + count - 1
+        end = start + count
+        item = start
+        while item < end:
+            rows = min(BLOCK_SIZE, end - item)
+            yield (item, rows) + self.columns(self.block_uniforms(seed, item, rows))
+            item += rows
+
+    def template(self, empty):
+        """
+        The template specialized for rows whose random slots in empty are "" (cached per
+        pattern), as (text, pieces): text alone when no random slot is emitted, otherwise
+        pieces[k] = (j, array) gives the k-th emitted slot j and, per base candidate of j,
+        its value with the text that follows it, so a row is one join of indexed pieces.
+        """
+        plan = self._templates.get(empty)
+        if plan is None:
+            constants = dict(self.constants)
+            constants.update((self.slots[j], "") for j in empty)
+            variables = [j for j in range(len(self.slots)) if j not in empty]
+            texts, args = self.options["template"].specialize(constants, [self.slots[j] for j in variables])
+            pieces = []
+            for k, (i, cap) in enumerate(args):
+                lead = texts[0] if k == 0 else ""
+                names = self.tables[variables[i]].names
+                array = np.empty(len(names), dtype=object)
+                array[:] = [lead + (capitalize(name) if cap else name) + texts[k + 1] for name in names]
+                pieces.append((variables[i], array))
+            plan = self._templates[empty] = (texts[0], tuple(pieces))
+        return plan
+
+    def format(self, empty, indices, rows, selected=None):
+        # Descriptions of all rows, or of the selected ones, under one emptiness pattern
+        text, pieces = self.template(empty)
+        if not pieces:
+            return [text] * (rows if selected is None else len(selected))
+        columns = [(array[indices[j]] if selected is None else array[indices[j][selected]]).tolist() for j, array in pieces]
+        if len(columns) == 1:
+            return columns[0]
+        return list(map("".join, zip(*columns)))
+
+    def descriptions(self, columns, indices, rows):
+        if not self.maybe_empty:
+            return self.format((), indices, rows)
+        # One pattern code per row: bit b set when random slot maybe_empty[b] is ""
+        patterns = np.zeros(rows, dtype=np.int64)
+        for b, j in enumerate(self.maybe_empty):
+            patterns |= (columns[j] == "").astype(np.int64) << b
+        codes, groups = np.unique(patterns, return_inverse=True)
+        if len(codes) == 1:
+            return self.format(self._empty(codes[0]), indices, rows)
+        groups = groups.reshape(-1)
+        out = np.empty(rows, dtype=object)
+        for g, code in enumerate(codes):
+            selected = np.flatnonzero(groups == g)
+            out[selected] = self.format(self._empty(code), indices, rows, selected)
+        return out.tolist()
+
+    def _empty(self, code):
+        return tuple(j for b, j in enumerate(self.maybe_empty) if code >> b & 1)
+
+    def iter_values(self, columns, rows):
+        for i in range(rows):
+            values = dict(self.fixed)
+            for slot, column in zip(self.slots, columns):
+                values[slot] = column[i]
+            yield values
+
+
+def _base_seed(kwargs):
+    seed = kwargs.get("seed", 0)
+    return int(np.random.default_rng().integers(0, 2 ** 63)) if seed is None else seed
+
+
+def iter_generate(generator, count, start=0, **kwargs):
+    """
+    Vectorized counterpart of EthnicOutfitGenerator.iter_generate: yields
+    (seed + i, values, description) for items start .. start + count - 1.
+    """
+    seed = _base_seed(kwargs)
+    plan = VectorPlan(generator, kwargs)
+    for first, rows, columns, indices in plan.iter_blocks(seed, start, count):
+        descriptions = plan.descriptions(columns, indices, rows)
+        for i, (values, description) in enumerate(zip(plan.iter_values(columns, rows), descriptions)):
+            yield (seed + first + i) & 0xffffffffffffffff, values, description
+
+
+def generate_batch(generator, batch_size, **kwargs):
+    """Descriptions and item seeds for items 0 .. batch_size - 1, without building per-row dicts."""
+    seed = _base_seed(kwargs)
+    plan = VectorPlan(generator, kwargs)
+    descriptions = []
+    for _, rows, columns, indices in plan.iter_blocks(seed, 0, batch_size):
+        descriptions.extend(plan.descriptions(columns, indices, rows))
+    seeds = [(seed + i) & 0xffffffffffffffff for i in range(batch_size)]
+    return descriptions, seeds
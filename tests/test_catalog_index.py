@@ -0,0 +1,138 @@
+# CatalogIndex: search ranking, the COMFYUI_OUTFITS_MAX_OPTIONS cap, membership
+# across catalog reloads, and the /outfits/options pages built on it.
+import json
+import sys
+import types
+
+import pytest
+
+from nodes import catalog_index
+from nodes import ethnic_outfit_common as common
+from nodes.catalog_index import CatalogIndex, find_index, options_page
+from nodes.catalog_pack import build
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator
+
+NAMES = ["Sari", "Salwar Kameez", "Sarong", "Kurta", "Lehenga Choli", "Anarkali", "Kurti", "sari blouse"]
+
+
+def names(index, positions):
+    return [index.names[p] for p in positions]
+
+
+def test_prefix_matches_come_first_alphabetically():
+    index = CatalogIndex(NAMES)
+    assert names(index, index.matches("sa")) == ["Salwar Kameez", "Sari", "sari blouse", "Sarong"]
+    # Case and spacing are folded; "Sarong" only shares a trigram, so it comes last
+    assert names(index, index.matches("  SARI ")) == ["Sari", "sari blouse", "Sarong"]
+    assert list(index.matches("")) == list(range(len(NAMES)))
+
+
+def test_substring_matches_follow_prefix_matches():
+    index = CatalogIndex(NAMES)
+    # "rt" is too short for trigrams; "ame" goes through the posting lists
+    assert names(index, index.matches("rt")) == ["Kurta", "Kurti"]
+    assert names(index, index.matches("ame")) == ["Salwar Kameez"]
+    assert names(index, index.matches("blouse")) == ["sari blouse"]
+
+
+def test_near_misses_rank_by_shared_trigrams():
+    index = CatalogIndex(NAMES)
+    assert names(index, index.matches("lehnga choli"))[0] == "Lehenga Choli"
+    assert names(index, index.matches("anarkalli")) == ["Anarkali"]
+    assert index.matches("zzzz") == []
+
+
+def test_search_pages_through_one_query():
+    index = CatalogIndex([f"item {i:03d}" for i in range(120)])
+    total, first = index.search("item", 0, 50)
+    assert total == 120 and first[0] == "item 000" and len(first) == 50
+    assert index.search("item", 100, 50) == (120, [f"item {i:03d}" for i in range(100, 120)])
+
+
+def test_membership_uses_exact_names():
+    index = CatalogIndex(NAMES)
+    assert "Sari" in index and "sari" not in index
+    assert index.position("Kurti") == 6
+    assert index.position("Kurta ") is None
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    region = tmp_path / "xx"
+    region.mkdir()
+    (region / "footwear.json").write_text(json.dumps(["sandals", "boots", "mojaris", "juttis"]), encoding="utf-8")
+    (region / "torso_clothing.json").write_text(json.dumps(["qipao", "kurta"]), encoding="utf-8")
+    monkeypatch.setattr(common, "CATALOG", common.CatalogStore(str(tmp_path)))
+    monkeypatch.setattr(common, "_compiled_regions", {})
+    monkeypatch.setattr(common, "CATALOG_CHECK_INTERVAL", 0.0)
+    return tmp_path
+
+
+def region_node(region_code):
+    return type("XXOutfitNode", (EthnicOutfitGenerator,), {"region_code": region_code})
+
+
+def test_max_options_caps_the_combo_but_not_validation(catalog, monkeypatch):
+    monkeypatch.setattr(catalog_index, "MAX_OPTIONS", 2)
+    assert common.compile_region("xx").options("footwear") == ["random", "disabled", "sandals", "boots"]
+    node = region_node("xx")
+    assert node.VALIDATE_INPUTS(footwear="juttis") is True
+    assert "not in the xx catalog" in node.VALIDATE_INPUTS(footwear="clogs")
+    assert options_page("xx/footwear", "jut")["items"] == ["juttis"]
+
+
+def test_membership_follows_an_edited_catalog(catalog):
+    assert "clogs" not in find_index("xx/footwear")
+    (catalog / "xx" / "footwear.json").write_text(json.dumps(["sandals", "clogs"]), encoding="utf-8")
+    index = find_index("xx/footwear")
+    assert "clogs" in index and "boots" not in index
+
+
+def test_membership_follows_a_rebuilt_pack(catalog):
+    build(str(catalog))
+    store = common.CATALOG
+    index = find_index("xx/footwear")
+    assert "mojaris" in index and "clogs" not in index
+    generation = store.generation
+    (catalog / "xx" / "footwear.json").write_text(json.dumps(["clogs", "mojaris"]), encoding="utf-8")
+    build(str(catalog))
+    index = find_index("xx/footwear")
+    assert store.generation == generation + 1
+    # Ids of the new pack, not the closed one
+    assert "clogs" in index and "sandals" not in index
+    assert index.position("mojaris") == 1
+
+
+def test_options_page(catalog):
+    page = options_page("xx/footwear", "s", offset=0, limit=2)
+    assert page == {"catalog": "xx/footwear", "query": "s", "total": 4, "offset": 0, "items": ["sandals", "boots"]}
+    assert options_page("xx/footwear", "s", offset=-5, limit=10 ** 6)["items"] == ["sandals", "boots", "mojaris", "juttis"]
+    with pytest.raises(KeyError, match="Invalid catalog name"):
+        options_page("../etc/footwear")
+    with pytest.raises(OSError):
+        options_page("xx/no_such_file")
+
+
+def test_options_route(catalog, monkeypatch):
+    web = pytest.importorskip("aiohttp.web")
+    from aiohttp.test_utils import TestClient, TestServer
+    import asyncio
+
+    routes = web.RouteTableDef()
+    server = types.ModuleType("server")
+    server.PromptServer = types.SimpleNamespace(instance=types.SimpleNamespace(routes=routes))
+    monkeypatch.setitem(sys.modules, "server", server)
+    assert catalog_index.register_routes()
+
+    async def fetch():
+        app = web.Application()
+        app.add_routes(routes)
+        async with TestClient(TestServer(app)) as client:
+            ok = await client.get("/outfits/options", params={"catalog": "xx/footwear", "q": "boo"})
+            bad = await client.get("/outfits/options", params={"catalog": "xx/footwear", "limit": "x"})
+            missing = await client.get("/outfits/options", params={"catalog": "xx/hats"})
+            return (ok.status, await ok.json()), bad.status, missing.status
+
+    ok, bad, missing = asyncio.run(fetch())
+    assert ok == (200, {"catalog": "xx/footwear", "query": "boo", "total": 1, "offset": 0, "items": ["boots"]})
+    assert (bad, missing) == (400, 404)
@@ -0,0 +1,45 @@
+# The catalog pack only stands in for JSON files that still exist, and is closed when rebuilt.
+import json
+import os
+
+import pytest
+
+from nodes.catalog_pack import build, stale_files
+from nodes.ethnic_outfit_common import CatalogStore
+
+
+def write(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(value), encoding="utf-8")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write(tmp_path / "xx" / "footwear.json", ["sandals", "boots"])
+    write(tmp_path / "xx" / "head_gear.json", ["turban"])
+    build(str(tmp_path))
+    return tmp_path
+
+
+def test_deleted_file_is_not_served_from_a_stale_pack(data_dir):
+    store = CatalogStore(str(data_dir))
+    assert list(store.load("xx", "head_gear.json")) == ["turban"]
+    os.remove(data_dir / "xx" / "head_gear.json")
+    with pytest.raises(FileNotFoundError):
+        store.load("xx", "head_gear.json")
+    assert store.list_json("xx") == ("footwear.json",)
+    assert list(store.load_region("xx")) == ["footwear"]
+    assert stale_files(store.pack(), str(data_dir)) == ["xx/head_gear.json"]
+
+
+def test_rebuilt_pack_closes_the_old_one(data_dir):
+    store = CatalogStore(str(data_dir))
+    old = store.pack()
+    assert list(store.load("xx", "footwear.json")) == ["sandals", "boots"]
+    write(data_dir / "xx" / "footwear.json", ["sandals", "boots", "mojaris"])
+    build(str(data_dir))
+    generation = store.generation
+    assert list(store.load_region("xx")["footwear"]) == ["sandals", "boots", "mojaris"]
+    assert store.pack() is not old
+    assert old._mm.closed
+    assert store.generation == generation + 1
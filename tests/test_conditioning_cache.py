@@ -0,0 +1,110 @@
+# Conditioning cache: "fragments" output against a full encode, store eviction and encoder keys,
+# with the NumPy stand-in encoder.
+import numpy as np
+import pytest
+
+from nodes.conditioning_cache import (CachedEncoder, ConditioningStore, HashingTextEncoder, _chunk_count,
+                                      encode_text, encoder_key, fragments)
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator
+from nodes.generate import default_inputs
+from nodes.response_cache import EVICT_TO
+
+
+def descriptions(count, **overrides):
+    kwargs = dict(default_inputs(), seed=3, **overrides)
+    return [d for _, _, d in EthnicOutfitGenerator("in").iter_generate(count, **kwargs)]
+
+
+def assert_same(a, b):
+    assert len(a) == len(b)
+    for (cond_a, options_a), (cond_b, options_b) in zip(a, b):
+        np.testing.assert_array_equal(cond_a, cond_b)
+        np.testing.assert_array_equal(options_a["pooled_output"], options_b["pooled_output"])
+
+
+@pytest.fixture
+def encoder(tmp_path):
+    return CachedEncoder(HashingTextEncoder(), ConditioningStore(str(tmp_path / "conditioning.sqlite3"), disk_bytes=0))
+
+
+def test_fragments_of_a_one_chunk_prompt_match_a_full_encode(encoder):
+    text = descriptions(1, detailed_description="disabled")[0]
+    assert _chunk_count(encoder.clip.tokenize(text)) == 1
+    assert_same(encoder.encode(text, "fragments"), encode_text(HashingTextEncoder(), text))
+
+
+def test_long_prompts_are_packed_into_whole_chunks_and_reused(encoder):
+    text = ", ".join(descriptions(3))
+    pieces = encoder.pieces(text)
+    assert len(pieces) > 1
+    assert ", ".join(pieces) == ", ".join(fragments(text))
+    assert all(_chunk_count(encoder.clip.tokenize(piece)) == 1 for piece in pieces)
+    conditioning = encoder.encode(text, "fragments")
+    # One 77-token chunk per piece, each exactly the full encode of that piece
+    assert conditioning[0][0].shape[1] == 77 * len(pieces)
+    expected = [encode_text(HashingTextEncoder(), piece) for piece in pieces]
+    np.testing.assert_array_equal(conditioning[0][0], np.concatenate([e[0][0] for e in expected], axis=1))
+    calls = encoder.clip.calls
+    encoder.encode(text, "fragments")
+    assert encoder.clip.calls == calls
+
+
+def test_memory_eviction_keeps_the_most_recently_used(tmp_path):
+    entry = [[np.zeros((1, 77, 8), dtype=np.float32), {}]]
+    size = entry[0][0].nbytes
+    store = ConditioningStore(str(tmp_path / "conditioning.sqlite3"), memory_bytes=2 * size, disk_bytes=0)
+    store.put("a", entry)
+    store.put("b", entry)
+    assert store.get("a") is entry
+    store.put("c", entry)
+    assert store.get("b") is None
+    assert store.get("a") is entry and store.get("c") is entry
+    assert store.stats()["memory_bytes"] == 2 * size
+
+
+def test_spill_eviction_keeps_a_running_total(tmp_path):
+    pytest.importorskip("safetensors")
+    entry = [[np.ones((1, 77, 8), dtype=np.float32), {"pooled_output": np.ones((1, 8), dtype=np.float32)}]]
+    size = sum(t.nbytes for t in (entry[0][0], entry[0][1]["pooled_output"]))
+    store = ConditioningStore(str(tmp_path / "conditioning.sqlite3"), memory_bytes=size, disk_bytes=10 * 2 * size)
+    for i in range(40):
+        store.put(f"k{i}", entry)
+    db = store._db()
+    count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conditioning_tensors").fetchone()
+    assert store._disk_used == total <= store.disk_bytes
+    assert 0 < count < 39
+    assert store.get("k0") is None  # least recently used, evicted
+    store.put("k40", entry)  # spills k39
+    assert store.get("k39") is not None
+
+
+class Weights:
+    # A parameter whose data must not be read
+    def __init__(self, shape):
+        self.shape = shape
+        self.dtype = "float16"
+
+    def __array__(self, *args, **kwargs):
+        raise AssertionError("weight data was read")
+
+
+class Model:
+    def state_dict(self):
+        return {"embed.weight": Weights((49408, 768)), "proj.weight": Weights((768, 768))}
+
+
+class Clip:
+    def __init__(self, model, path=None):
+        self.cond_stage_model = model
+        self.layer_idx = None
+        if path is not None:
+            self.model_path = path
+
+
+def test_encoder_key_reads_no_weights_and_tells_models_apart():
+    first, second = Model(), Model()
+    assert encoder_key(Clip(first)) == encoder_key(Clip(first))
+    assert encoder_key(Clip(first)) != encoder_key(Clip(second))
+    # A recorded path identifies the weights across loads (and restarts)
+    assert encoder_key(Clip(first, "clip_l.safetensors")) == encoder_key(Clip(second, "clip_l.safetensors"))
+    assert encoder_key(Clip(first, "clip_l.safetensors")) != encoder_key(Clip(first, "clip_g.safetensors"))
@@ -0,0 +1,33 @@
+# LSH index of the near-duplicate filter.
+from nodes.dedup import NearDuplicateFilter
+
+
+def signature(base, changed_bands=(), rows=8):
+    # 64 values; the bands listed get one value changed
+    values = [base * 1000 + i for i in range(64)]
+    for band in changed_bands:
+        values[band * rows] += 1
+    return values
+
+
+def test_bucket_keeps_every_prompt_not_just_the_newest():
+    index = NearDuplicateFilter(0.8, num_perm=64)
+    assert (index.bands, index.rows) == (8, 8)
+    first = signature(1)
+    other = signature(2)
+    other[:8] = first[:8]  # shares only band 0 with first, and is stored after it
+    assert index.check_signature(first)
+    assert index.check_signature(other)
+    # 57 of 64 values equal to first, but only band 0 in common: found through the bucket's older entry
+    assert not index.check_signature(signature(1, changed_bands=range(1, 8)))
+
+
+def test_aged_out_prompts_leave_the_buckets():
+    index = NearDuplicateFilter(0.8, num_perm=64, capacity=2)
+    assert index.check_signature(signature(1))
+    assert index.check_signature(signature(2))
+    assert not index.check_signature(signature(2))
+    assert index.check_signature(signature(3))  # reuses the slot of 1
+    assert index.check_signature(signature(1))  # 1 has aged out of the window
+    assert not index.check_signature(signature(3))
+    assert index.stats()["indexed"] == 2
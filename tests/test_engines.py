@@ -0,0 +1,74 @@
+# The numpy engine draws exactly the items of the python engine, and stays well ahead of it
+# on the regions with "excludes" tags (see benchmarks/engines.py).
+import json
+import os
+import shutil
+
+import pytest
+
+from benchmarks import engines
+from nodes import ethnic_outfit_common as common
+from nodes import vector_engine
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator
+from nodes.generate import default_inputs
+from nodes.regions import region_codes
+
+COUNT = 300
+REGIONS = region_codes()
+
+
+def inputs(**overrides):
+    kwargs = default_inputs()
+    kwargs.update(overrides)
+    return kwargs
+
+
+@pytest.mark.parametrize("region", REGIONS)
+@pytest.mark.parametrize("overrides", [{}, {"gender": "female", "age": "young"}, {"detailed_description": "disabled"}])
+def test_python_and_numpy_engines_agree(region, overrides):
+    generator = EthnicOutfitGenerator(region)
+    kwargs = inputs(seed=987654321, **overrides)
+    python = list(generator.iter_generate(COUNT, **kwargs))
+    numpy = list(vector_engine.iter_generate(generator, COUNT, **kwargs))
+    assert numpy == python
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_numpy_engine_start_matches_offset_seed(region):
+    generator = EthnicOutfitGenerator(region)
+    shifted = list(vector_engine.iter_generate(generator, 50, 1000, **inputs(seed=7)))
+    assert shifted == list(generator.iter_generate(50, **inputs(seed=1007)))
+
+
+@pytest.fixture
+def excludes_region(tmp_path, monkeypatch):
+    # "qipao" rules out the only leg garment, so that slot is empty in some rows and not others
+    for folder in ("templates", "styles"):
+        shutil.copytree(os.path.join(common.DATA_DIR, folder), tmp_path / folder)
+    region = tmp_path / "xx"
+    region.mkdir()
+    catalog = {
+        "torso_clothing": [{"name": "qipao", "excludes": ["skirt"], "weight": 3}, "blouse", "kurta"],
+        "leg_clothing": ["skirt"],
+        "head_gear": [{"name": "turban", "excludes": ["kurta"]}, "hat"],
+        "footwear": ["sandals", {"name": "boots", "weight": 2}],
+    }
+    for key, entries in catalog.items():
+        (region / f"{key}.json").write_text(json.dumps(entries), encoding="utf-8")
+    monkeypatch.setattr(common, "CATALOG", common.CatalogStore(str(tmp_path)))
+    monkeypatch.setattr(common, "_compiled_regions", {})
+    return EthnicOutfitGenerator("xx")
+
+
+def test_engines_agree_when_exclusions_empty_a_slot(excludes_region):
+    kwargs = inputs(seed=11)
+    python = list(excludes_region.iter_generate(COUNT, **kwargs))
+    assert {values["leg_clothing"] for _, values, _ in python} == {"", "skirt"}
+    assert list(vector_engine.iter_generate(excludes_region, COUNT, **kwargs)) == python
+
+
+def test_numpy_engine_speedup_on_regions_with_excludes():
+    results = engines.measure(batch=5000)
+    assert results
+    for region, result in results.items():
+        assert result["speedup"] >= engines.MIN_SPEEDUP, f"{region}: numpy is only x{result['speedup']:.1f} the python engine"
@@ -0,0 +1,68 @@
+# Enumeration mode walks each allowed slot combination exactly once.
+from itertools import product
+
+import pytest
+
+from nodes.enumeration import CombinationSpace, iter_enumerate
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator, ORDERS
+from nodes.generate import default_inputs
+
+SLOTS = "head_gear,torso_clothing,leg_clothing,footwear"
+WALK_ORDERS = ORDERS[1:]
+
+
+def inputs():
+    kwargs = default_inputs()
+    kwargs["seed"] = 99
+    return kwargs
+
+
+def allowed_combinations(space):
+    allowed = set()
+    for digits in product(*(range(len(table)) for _, table in space.axes)):
+        index = 0
+        for (_, table), k in zip(space.axes, digits):
+            index = index * len(table) + k
+        if space.allowed(space.digits(index)):
+            allowed.add(tuple(table.names[k] for (_, table), k in zip(space.axes, digits)))
+    return allowed
+
+
+@pytest.mark.parametrize("order", WALK_ORDERS)
+def test_full_walk_yields_each_allowed_combination_once(order):
+    generator = EthnicOutfitGenerator("cn")
+    space = CombinationSpace(generator, inputs(), SLOTS)
+    assert space.compiled.exclusions()
+    expected = allowed_combinations(space)
+    assert 0 < len(expected) < space.size
+    seen = [tuple(values[slot] for slot, _ in space.axes)
+            for _, values, _ in iter_enumerate(generator, space.size, 0, order, SLOTS, **inputs())]
+    assert len(seen) == len(set(seen))
+    assert set(seen) == expected
+
+
+@pytest.mark.parametrize("order", WALK_ORDERS)
+def test_sharded_walks_join_up(order):
+    generator = EthnicOutfitGenerator("cn")
+    whole = list(iter_enumerate(generator, 600, 0, order, SLOTS, **inputs()))
+    parts = []
+    for start in range(0, 600, 150):
+        parts += iter_enumerate(generator, 150, start, order, SLOTS, **inputs())
+    assert parts == whole
+
+
+@pytest.mark.parametrize("order", WALK_ORDERS)
+def test_fill_yields_count_distinct_items(order):
+    generator = EthnicOutfitGenerator("in")
+    items = list(iter_enumerate(generator, 500, 10 ** 6, order, None, fill=True, **inputs()))
+    assert len(items) == 500
+    assert len({tuple(sorted(values.items())) for _, values, _ in items}) == 500
+
+
+def test_next_allowed_matches_a_linear_scan():
+    space = CombinationSpace(EthnicOutfitGenerator("cn"), inputs(), SLOTS)
+    following = space.size
+    for index in range(space.size - 1, -1, -1):
+        if space.allowed(space.digits(index)):
+            following = index
+        assert space.next_allowed(index) == following
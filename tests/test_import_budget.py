@@ -0,0 +1,9 @@
+# Registration cost, as checked by python -m benchmarks.import_budget.
+from benchmarks.import_budget import BUDGET, measure
+
+
+def test_registration_stays_within_budget():
+    result = measure(runs=5)
+    assert result["deferred_loaded"] == []
+    assert result["catalog_files"] <= 1  # only country_codes.json, for the display names
+    assert result["seconds"] <= BUDGET, f"best of 5 imports took {result['seconds'] * 1000:.1f} ms"
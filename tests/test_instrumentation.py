@@ -0,0 +1,53 @@
+# Prometheus text output of /outfits/metrics?format=prometheus.
+import re
+
+from nodes.instrumentation import Metrics
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? \S+$')
+
+
+def families(text):
+    # metric name -> declared type, checking every sample follows the TYPE line of its family
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in types, f"second TYPE line for {name}"
+            types[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name = match.group(1)
+        family = name if name in types else re.sub(r"_(sum|count)$", "", name)
+        assert family in types, f"{name} has no TYPE line"
+    return types
+
+
+def test_every_sample_has_a_type_line():
+    metrics = Metrics(enabled=True)
+    with metrics.timed("outfit.generate"):
+        pass
+    try:
+        with metrics.timed("ollama.generate"):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+    metrics.count("dedup.kept", 3)
+    metrics.gauge("catalog", lambda: {"hits": 1, "hit_rate": 0.5})
+    types = families(metrics.prometheus())
+    assert types["outfits_phase_seconds"] == "summary"
+    assert types["outfits_phase_errors_total"] == "counter"
+    assert types["outfits_dedup_kept_total"] == "counter"
+    assert types["outfits_catalog_hit_rate"] == "gauge"
+
+
+def test_labelled_gauges_keep_the_label_out_of_the_name():
+    metrics = Metrics(enabled=True)
+    metrics.gauge("ollama_breakers", lambda: {
+        "http://127.0.0.1:11434": {"open": 0, "trips": 2},
+        'http://gpu-box:11434/"x"': {"open": 1, "trips": 5},
+    }, label="url")
+    text = metrics.prometheus()
+    assert set(families(text)) == {"outfits_ollama_breakers_open", "outfits_ollama_breakers_trips"}
+    assert 'outfits_ollama_breakers_trips{url="http://127.0.0.1:11434"} 2' in text
+    assert 'outfits_ollama_breakers_open{url="http://gpu-box:11434/\\"x\\""} 1' in text
@@ -0,0 +1,66 @@
+# EthnicOutfitGenerator.IS_CHANGED in "deterministic" cache mode: one key per
+# seed and inputs, and a new key whenever a catalog file feeding the region changes.
+import json
+import math
+import os
+import shutil
+
+import pytest
+
+from nodes import ethnic_outfit_common as common
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator
+from nodes.generate import default_inputs
+
+
+def key(node, **overrides):
+    kwargs = default_inputs()
+    kwargs.update(cache_mode="deterministic", seed=42)
+    kwargs.update(overrides)
+    return node.IS_CHANGED(**kwargs)
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join(common.DATA_DIR, "templates"), tmp_path / "templates")
+    region = tmp_path / "xx"
+    region.mkdir()
+    (region / "torso_clothing.json").write_text(json.dumps(["qipao", "kurta"]), encoding="utf-8")
+    (region / "footwear.json").write_text(json.dumps(["sandals", "boots"]), encoding="utf-8")
+    monkeypatch.setattr(common, "CATALOG", common.CatalogStore(str(tmp_path)))
+    monkeypatch.setattr(common, "_compiled_regions", {})
+    monkeypatch.setattr(common, "CATALOG_CHECK_INTERVAL", 0.0)
+    return type("XXOutfitNode", (EthnicOutfitGenerator,), {"region_code": "xx"})
+
+
+def test_same_seed_and_inputs_give_the_same_key(node):
+    assert key(node) == key(node)
+    assert key(node) != key(node, seed=43)
+    assert key(node) != key(node, footwear="boots")
+
+
+def test_other_modes_always_reroll(node):
+    assert math.isnan(key(node, cache_mode="always reroll"))
+    assert math.isnan(key(node, seed=None))
+
+
+def test_catalog_mtime_change_changes_the_key(node, tmp_path):
+    before = key(node)
+    path = tmp_path / "xx" / "footwear.json"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert key(node) != before
+
+
+def test_catalog_size_change_changes_the_key(node, tmp_path):
+    before = key(node)
+    (tmp_path / "xx" / "footwear.json").write_text(json.dumps(["sandals", "boots", "juttis"]), encoding="utf-8")
+    after = key(node)
+    assert after != before
+    assert key(node) == after
+
+
+def test_template_change_changes_the_key(node, tmp_path):
+    before = key(node)
+    with open(tmp_path / "templates" / "default.json", "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert key(node) != before
@@ -0,0 +1,104 @@
+# ollama_client against the local stub server (benchmarks/ollama_stub.py).
+import time
+
+import pytest
+
+from benchmarks.ollama_stub import OllamaStub
+from nodes import ollama_client
+from nodes.ollama_client import MODELS, CircuitBreaker, StreamInterrupted, get_breaker, stream_completion
+
+PAYLOAD = {"model": "stub:latest", "prompt": "a cat on a chair", "options": {"seed": 1}}
+
+
+def test_stream_reads_every_chunk():
+    with OllamaStub() as stub:
+        text, stats = stream_completion(stub.url, PAYLOAD, (1.0, 10.0), interrupted=lambda: False)
+    assert text == "A detailed portrait of a cat on a chair. "
+    assert stats["stopped"] == "done"
+
+
+def test_interrupt_does_not_wait_for_the_next_chunk():
+    with OllamaStub(token_latency=5.0) as stub:
+        start = time.perf_counter()
+        interrupted = lambda: time.perf_counter() - start > 0.3
+        with pytest.raises(StreamInterrupted) as raised:
+            stream_completion(stub.url, PAYLOAD, (1.0, 30.0), interrupted=interrupted)
+        assert time.perf_counter() - start < 1.5
+    assert raised.value.stats["stopped"] == "interrupted"
+    assert raised.value.stats["tokens"] == 1
+
+
+def test_failed_model_refresh_is_not_a_breaker_failure():
+    with OllamaStub() as stub:
+        url = stub.url
+    MODELS.refresh_async(url).join(5.0)  # the stub is gone: connection refused
+    assert MODELS.peek(url) == []
+    assert get_breaker(url).failures == 0
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def fast_probe(monkeypatch):
+    monkeypatch.setattr(ollama_client, "PROBE_INTERVAL", 0.05)
+    monkeypatch.setattr(ollama_client, "PROBE_MAX_INTERVAL", 0.1)
+
+
+def test_breaker_opens_after_threshold_failures(fast_probe):
+    with OllamaStub() as stub:
+        breaker = CircuitBreaker(stub.url, failures=3)
+        breaker.record(False)
+        breaker.record(True)  # a success resets the count
+        breaker.record(False)
+        breaker.record(False)
+        assert breaker.allow()
+        breaker.record(False)
+        assert not breaker.allow()
+        assert breaker.stats() == {"open": 1, "failures": 3, "trips": 1}
+        wait_until(breaker.allow)
+
+
+def test_probe_keeps_the_breaker_open_until_the_server_answers(fast_probe):
+    with OllamaStub() as down:
+        url = down.url
+    breaker = CircuitBreaker(url, failures=1)
+    breaker.record(False)
+    time.sleep(0.4)  # several probes, all refused
+    assert not breaker.allow()
+    with OllamaStub() as stub:
+        breaker.url = stub.url  # the probe reads the url on every attempt
+        wait_until(breaker.allow)
+        assert stub.requests >= 1
+    assert breaker.trips == 1
+
+
+def test_one_failure_after_recovery_reopens_the_breaker(fast_probe):
+    with OllamaStub() as stub:
+        breaker = CircuitBreaker(stub.url, failures=3)
+        for _ in range(3):
+            breaker.record(False)
+        wait_until(breaker.allow)
+        # Re-armed at threshold - 1: the server has to prove itself again
+        assert breaker.failures == 2
+        breaker.record(False)
+        assert not breaker.allow()
+        assert breaker.trips == 2
+        wait_until(breaker.allow)
+        breaker.record(True)
+        breaker.record(False)
+        assert breaker.allow()  # a success after recovery restores the full threshold
+        assert breaker.failures == 1
+
+
+def test_slow_successes_count_as_failures():
+    breaker = CircuitBreaker("http://127.0.0.1:9/api/generate", failures=2, latency_limit=0.5)
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.6)
+    assert breaker.failures == 1
+    breaker.record(True, None)  # no timing: counts as a plain success
+    assert breaker.failures == 0
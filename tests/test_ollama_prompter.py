@@ -0,0 +1,190 @@
+# OllamaPrompter behaviour, without a server or against the local stub (benchmarks/ollama_stub.py).
+import math
+import random
+import time
+
+import pytest
+from requests.exceptions import Timeout
+
+from benchmarks.ollama_stub import OllamaStub
+from nodes import ollama_prompter
+from nodes.ollama_async import ASYNC_OLLAMA, wait_pending
+from nodes import ollama_client
+from nodes.ollama_client import MODELS, StreamInterrupted, get_breaker
+from nodes.ollama_prompter import OllamaBatchPrompter, OllamaPrompter
+from nodes.response_cache import ResponseCache
+
+# Nothing listens here; any connection attempt would hang until its timeout
+UNREACHABLE = "http://10.255.255.1:11434/api/generate"
+INPUTS = {
+    "model_name": "llama3:latest", "prompt_style": "Flux",
+    "photographer": "random", "camera": "random", "film": "random", "movement": "random", "art_style": "random",
+    "lighting": "random", "shot_type": "random", "photography_type": "random",
+    "override_instructions": False, "custom_instructions": "", "seed": 5, "ollama_url": UNREACHABLE,
+}
+
+
+def test_is_changed_with_linked_keywords():
+    # ComfyUI leaves linked inputs out of the IS_CHANGED call
+    assert math.isnan(OllamaPrompter.IS_CHANGED(**INPUTS))
+
+
+def test_is_changed_does_not_wait_on_the_network():
+    start = time.perf_counter()
+    assert math.isnan(OllamaPrompter.IS_CHANGED(keywords="a cat", **INPUTS))
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(ollama_prompter, "RESPONSES", ResponseCache(str(tmp_path / "responses.sqlite3")))
+    with OllamaStub() as stub:
+        MODELS.fetch(stub.url)
+        yield stub
+        MODELS.invalidate(stub.url)
+    monkeypatch.delitem(ollama_client._breakers, ollama_client.base_url(stub.url), raising=False)
+
+
+def slow_request(stub, key):
+    stub.server.latency = 5.0
+    payload = OllamaPrompter.build_payload("stub:latest", "", key, 1)
+    timeout = (1.0, 10.0)
+    blocking = lambda: OllamaPrompter.request_completion(stub.url, payload, timeout)
+    return ASYNC_OLLAMA.start(key, stub.url, payload, timeout, blocking)
+
+
+def test_is_changed_sends_no_request_unless_prefetch_is_enabled(stub):
+    requests = stub.requests
+    assert math.isnan(OllamaPrompter.IS_CHANGED(keywords="a cat", **dict(INPUTS, ollama_url=stub.url)))
+    time.sleep(0.2)
+    assert stub.requests == requests
+    assert ASYNC_OLLAMA.stats()["in_flight"] == 0
+
+
+def test_joining_a_request_in_flight_times_out_and_cancels_it(stub):
+    future = slow_request(stub, "timeout")
+    start = time.perf_counter()
+    with pytest.raises(Timeout):
+        wait_pending(future, 0.3)
+    assert time.perf_counter() - start < 1.0
+    assert future.cancelled()
+
+
+def test_joining_a_request_in_flight_stops_on_interrupt(stub):
+    future = slow_request(stub, "interrupt")
+    start = time.perf_counter()
+    with pytest.raises(StreamInterrupted):
+        wait_pending(future, 30.0, interrupted=lambda: True)
+    assert time.perf_counter() - start < 1.0
+    assert future.cancelled()
+
+
+def test_node_waits_on_a_prefetched_request_no_longer_than_its_timeouts(stub, monkeypatch):
+    monkeypatch.setattr(ollama_prompter, "PREFETCH_PROMPTS", True)
+    stub.server.latency = 5.0
+    inputs = dict(INPUTS, keywords="a cat", ollama_url=stub.url)
+    assert math.isnan(OllamaPrompter.IS_CHANGED(**inputs))
+    assert ASYNC_OLLAMA.stats()["in_flight"] == 1
+    start = time.perf_counter()
+    (output,) = OllamaPrompter().generate_prompt(connect_timeout=0.1, read_timeout=1.0, **inputs)
+    assert time.perf_counter() - start < 2.5
+    choices = {name: inputs[name] for name in ("photographer", "camera", "film", "movement", "art_style", "lighting", "shot_type", "photography_type")}
+    assert output == OllamaPrompter.offline_prompt("a cat", 5, "Flux", **choices)
+    assert ASYNC_OLLAMA.stats()["in_flight"] == 0
+
+
+CHOICES = ("photographer", "camera", "film", "movement", "art_style", "lighting", "shot_type", "photography_type")
+
+
+def offline_output(inputs):
+    return OllamaPrompter.offline_prompt(inputs["keywords"], inputs["seed"], inputs["prompt_style"], **{name: inputs[name] for name in CHOICES})
+
+
+def test_open_breaker_short_circuits_to_the_offline_expander(stub, monkeypatch):
+    inputs = dict(INPUTS, model_name="stub:latest", keywords="a cat", ollama_url=stub.url)
+    monkeypatch.setattr(get_breaker(stub.url), "opened_at", time.monotonic())
+    requests = stub.requests
+    assert OllamaPrompter().generate_prompt(**inputs) == (offline_output(inputs),)
+    assert stub.requests == requests
+    # Without the fallback the node still tries Ollama
+    assert OllamaPrompter().generate_prompt(offline_fallback=False, **inputs) == ("A detailed portrait of a cat.",)
+    assert stub.requests == requests + 1
+
+
+def test_slow_answers_open_the_breaker(stub, monkeypatch):
+    monkeypatch.setattr(ollama_client, "PROBE_INTERVAL", 60.0)  # stays open for the test
+    breaker = get_breaker(stub.url)
+    monkeypatch.setattr(breaker, "threshold", 2)
+    monkeypatch.setattr(breaker, "latency_limit", 0.1)
+    stub.server.latency = 0.2
+    inputs = dict(INPUTS, model_name="stub:latest", ollama_url=stub.url, use_cache=False)
+    for keywords in ("a cat", "a dog"):
+        # Slow, but still the model's answer
+        assert OllamaPrompter().generate_prompt(**dict(inputs, keywords=keywords)) == (f"A detailed portrait of {keywords}.",)
+    assert not breaker.allow()
+    requests = stub.requests
+    inputs["keywords"] = "a bird"
+    assert OllamaPrompter().generate_prompt(**inputs) == (offline_output(inputs),)
+    assert stub.requests == requests
+
+
+def test_offline_expansion_is_deterministic_per_seed():
+    inputs = dict(INPUTS, keywords="a woman in a red sari")
+    random.seed(1)
+    first = offline_output(inputs)
+    random.seed(2)
+    assert offline_output(inputs) == first
+    outputs = {offline_output(dict(inputs, seed=seed)) for seed in range(20)}
+    assert first in outputs and len(outputs) > 1
+    assert "woman in a red sari" in first
+    # A random prompt style is drawn from the seed too
+    styled = dict(inputs, prompt_style="random")
+    assert offline_output(styled) == offline_output(styled)
+
+
+def batch_inputs(stub, keywords, **overrides):
+    # INPUT_IS_LIST: every input is a list, widgets a one-element one
+    inputs = {name: [value] for name, value in INPUTS.items() if name not in ("seed", "ollama_url")}
+    inputs.update(model_name=["stub:latest"], ollama_url=[stub.url], keywords=list(keywords), seed=list(range(len(keywords))))
+    inputs.update((name, [value]) for name, value in overrides.items())
+    return inputs
+
+
+def test_batch_keeps_the_input_order_and_bounds_concurrency(stub):
+    stub.server.latency = 0.1
+    keywords = [f"a cat number {i}" for i in range(12)]
+    (outputs,) = OllamaBatchPrompter().generate_prompts(**batch_inputs(stub, keywords, concurrency=3, use_cache=False))
+    assert outputs == [f"A detailed portrait of {k}." for k in keywords]
+    assert stub.server.max_in_flight == 3
+
+
+def test_async_batch_keeps_the_input_order_and_bounds_concurrency(stub):
+    import asyncio
+    stub.server.latency = 0.1
+    keywords = [f"a dog number {i}" for i in range(8)]
+    (outputs,) = asyncio.run(OllamaBatchPrompter().generate_prompts_async(**batch_inputs(stub, keywords, concurrency=2, use_cache=False)))
+    assert outputs == [f"A detailed portrait of {k}." for k in keywords]
+    assert stub.server.max_in_flight == 2
+
+
+def test_batch_retries_failed_items(stub, monkeypatch):
+    monkeypatch.setattr(ollama_prompter, "RETRY_BACKOFF", 0.01)
+    stub.server.failures = 2
+    requests = stub.requests
+    (outputs,) = OllamaBatchPrompter().generate_prompts(**batch_inputs(stub, ["a cat"], retries=2))
+    assert outputs == ["A detailed portrait of a cat."]
+    assert stub.requests == requests + 3  # two failures, then the answer
+    stub.server.failures = 10
+    (outputs,) = OllamaBatchPrompter().generate_prompts(**batch_inputs(stub, ["a dog"], retries=1, offline_fallback=False))
+    assert outputs == ["ERROR: OLLAMA REQUEST FAILED. Using original keywords: a dog"]
+
+
+def test_open_breaker_expands_the_whole_batch_offline(stub, monkeypatch):
+    monkeypatch.setattr(get_breaker(stub.url), "opened_at", time.monotonic())
+    keywords = ["a cat", "", "a dog"]
+    inputs = batch_inputs(stub, keywords)
+    requests = stub.requests
+    (outputs,) = OllamaBatchPrompter().generate_prompts(**inputs)
+    assert stub.requests == requests
+    expected = [offline_output(dict(INPUTS, keywords=k, seed=s)) if k else "" for s, k in enumerate(keywords)]
+    assert outputs == expected
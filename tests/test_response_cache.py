@@ -0,0 +1,27 @@
+from nodes.response_cache import EVICT_TO, ResponseCache
+
+
+def keys(cache):
+    return {key for (key,) in cache._db().execute("SELECT key FROM responses")}
+
+
+def test_memory_hits_count_as_recent_use(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_entries=10)
+    for i in range(10):
+        cache.put(f"k{i}", "response")
+    assert cache.get("k0") == "response"  # served from memory
+    cache.put("k10", "response")
+    assert "k0" in keys(cache)
+    assert "k1" not in keys(cache)
+
+
+def test_eviction_runs_in_batches_and_keeps_totals(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_entries=100, max_bytes=10 ** 9)
+    for i in range(101):
+        cache.put(f"k{i}", "x" * i)
+    assert len(keys(cache)) == int(100 * EVICT_TO)
+    count, total = cache._db().execute("SELECT COUNT(*), SUM(size) FROM responses").fetchone()
+    assert (cache._count, cache._bytes) == (count, total)
+    for i in range(101, 101 + 100 - int(100 * EVICT_TO)):
+        cache.put(f"k{i}", "x")
+    assert len(keys(cache)) == 100  # no eviction until the budget is exceeded again
@@ -0,0 +1,61 @@
+# Weighted, constraint-aware slot sampling (nodes/sampling.py) on the shipped catalogs.
+import math
+from collections import Counter
+from functools import lru_cache
+
+import pytest
+
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator, compile_region
+from nodes.generate import default_inputs
+from nodes.regions import region_codes
+
+DRAWS = 20000
+REGIONS = region_codes()
+
+
+@lru_cache(maxsize=None)
+def draws(region):
+    kwargs = default_inputs()
+    kwargs["seed"] = 12345
+    return [values for _, values, _ in EthnicOutfitGenerator(region).iter_generate(DRAWS, **kwargs)]
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_no_excluded_pair_is_drawn(region):
+    compiled = compile_region(region)
+    exclusions = compiled.exclusions()
+    for values in draws(region):
+        for slot, value in values.items():
+            for other, positions in exclusions.get((slot, value), {}).items():
+                names = compiled.slots[other]
+                assert values[other] not in {names[p] for p in positions}, (slot, value, other, values[other])
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_every_torso_entry_leaves_a_leg_garment(region):
+    compiled = compile_region(region)
+    for name in compiled.slots["torso_clothing"]:
+        excluded = compiled.excluded_by({"torso_clothing": name}).get("leg_clothing", frozenset())
+        assert compiled.table("leg_clothing", excluded=excluded) is not None, name
+
+
+@pytest.mark.parametrize("region", REGIONS)
+@pytest.mark.parametrize("slot", ["torso_clothing", "leg_clothing"])
+def test_every_garment_is_reachable(region, slot):
+    seen = Counter(values[slot] for values in draws(region))
+    missing = [name for name in compile_region(region).slots[slot] if not seen[name]]
+    assert not missing
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_torso_follows_its_weights(region):
+    # Torso garments are drawn before the slots they exclude, so each one's share is its weight
+    compiled = compile_region(region)
+    names = compiled.slots["torso_clothing"]
+    tags = compiled.tags["torso_clothing"]
+    weights = [tags.get(p, {}).get("weight", 1.0) for p in range(len(names))]
+    total = sum(weights)
+    seen = Counter(values["torso_clothing"] for values in draws(region))
+    for name, weight in zip(names, weights):
+        expected = DRAWS * weight / total
+        assert abs(seen[name] - expected) < 5 * math.sqrt(expected) + 1, (name, seen[name], expected)
@@ -0,0 +1,64 @@
+# Item seeds drive per-slot substreams: batch items, the single node and draw_slot agree,
+# the inlined DrawPlan draws what draw_excluding does, and fixing one slot leaves the
+# others' draws unchanged.
+import pytest
+
+from nodes.ethnic_outfit_common import EthnicOutfitBatchGenerator, EthnicOutfitGenerator, compile_region
+from nodes.generate import default_inputs
+from nodes.substreams import SeedStream
+from nodes.regions import region_codes
+
+REGIONS = region_codes()
+
+
+def inputs(**overrides):
+    kwargs = default_inputs()
+    kwargs.update(overrides)
+    return kwargs
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_single_node_matches_batch_items(region):
+    generator = EthnicOutfitGenerator(region)
+    kwargs = inputs(seed=2 ** 64 - 10)  # item seeds wrap around 2**64
+    for item_seed, values, description in generator.iter_generate(20, **kwargs):
+        single = EthnicOutfitGenerator(region)
+        assert single.generate_description(**inputs(seed=item_seed)) == (description, item_seed)
+        assert single.draw_slot("footwear", **inputs(seed=item_seed)) == values["footwear"]
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_batch_node_matches_single_node(engine):
+    region = REGIONS[0]
+    descriptions, seeds = EthnicOutfitBatchGenerator(region).generate_batch(**inputs(seed=11, batch_size=16, engine=engine))
+    assert seeds == list(range(11, 27))
+    for seed, description in zip(seeds, descriptions):
+        assert EthnicOutfitGenerator(region).generate_description(**inputs(seed=seed))[0] == description
+
+
+@pytest.mark.parametrize("region", REGIONS)
+def test_draw_plan_matches_draw_excluding(region):
+    generator = EthnicOutfitGenerator(region)
+    compiled = compile_region(region)
+    triggers = [{slot: name} for slot, name in list(compiled.exclusions())[:3]]
+    for overrides in [{}, {"gender": "male", "age": "teen"}] + triggers:
+        kwargs = inputs(**overrides)
+        plan = generator.draw_plan(kwargs, compiled)
+        fixed, random_slots = generator.slot_plan(kwargs, compiled)
+        for seed in range(500):
+            expected = generator.draw_excluding(SeedStream(seed), dict(fixed), random_slots, compiled,
+                                                kwargs["gender"], kwargs["age"])
+            assert plan.values(seed) == expected
+
+
+def test_fixed_slot_leaves_other_slots_unchanged():
+    region = REGIONS[0]
+    generator = EthnicOutfitGenerator(region)
+    exclusions = compile_region(region).exclusions()
+    # A value without "excludes" tags, so fixing it narrows no other slot
+    fixed_value = next(name for name in compile_region(region).slots["footwear"] if ("footwear", name) not in exclusions)
+    free = list(generator.iter_generate(100, **inputs(seed=5)))
+    fixed = list(generator.iter_generate(100, **inputs(seed=5, footwear=fixed_value)))
+    for (_, before, _), (_, after, _) in zip(free, fixed):
+        assert after["footwear"] == fixed_value
+        assert {s: v for s, v in after.items() if s != "footwear"} == {s: v for s, v in before.items() if s != "footwear"}
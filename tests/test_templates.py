@@ -0,0 +1,126 @@
+# Description templates: the per-pattern specialization the numpy engine joins
+# renders exactly what DescriptionTemplate.render does, and bad or missing
+# template files degrade to the "default" target instead of failing the node.
+import itertools
+import json
+import os
+import shutil
+
+import pytest
+
+from nodes import ethnic_outfit_common as common
+from nodes.ethnic_outfit_common import EthnicOutfitGenerator, compile_region
+from nodes.generate import default_inputs
+from nodes.templates import MODES, DescriptionTemplate, build_template
+
+TARGETS = sorted(name[:-len(".json")] for name in os.listdir(os.path.join(common.DATA_DIR, "templates")))
+
+# Every construct: "first", "capitalize", prefix / suffix and nested joins
+SPEC = {"join": ", ", "items": [
+    "{trigger_word}",
+    {"capitalize": True, "suffix": ".", "first": True, "items": ["{pose}", ["{age}", "{gender}"]]},
+    {"prefix": "wearing ", "join": " and ", "items": ["{torso_clothing}", "{leg_clothing}"]},
+    "{custom_text}",
+]}
+
+
+def inputs(**overrides):
+    kwargs = default_inputs()
+    kwargs.update(overrides)
+    return kwargs
+
+
+def joined(texts, args, variables):
+    # A row the way vector_engine builds it: texts[0] + value_0 + texts[1] + ...
+    out = [texts[0]]
+    for (j, cap), text in zip(args, texts[1:]):
+        value = variables[j]
+        out.append((value[:1].upper() + value[1:] if cap else value) + text)
+    return "".join(out)
+
+
+def patterns(template):
+    # Each field in turn varies, is a constant or is empty (capped so shipped templates stay quick)
+    fields = template.fields
+    for k in range(len(fields) + 1):
+        for variables in itertools.islice(itertools.combinations(fields, k), 20):
+            for empty in itertools.islice(itertools.combinations([f for f in fields if f not in variables], 2), 5):
+                yield list(variables), set(empty)
+
+
+def check_specialize(template):
+    for variables, empty in patterns(template):
+        values = {f: "" if f in empty else f"{f} value" for f in template.fields}
+        constants = {f: v for f, v in values.items() if f not in variables}
+        texts, args = template.specialize(constants, variables)
+        assert joined(texts, args, [values[f] for f in variables]) == template.render(values), (variables, empty)
+
+
+def test_specialized_template_renders_like_render():
+    check_specialize(DescriptionTemplate(SPEC))
+
+
+@pytest.mark.parametrize("target", TARGETS)
+@pytest.mark.parametrize("mode", MODES)
+def test_shipped_templates_specialize_like_render(target, mode):
+    with open(os.path.join(common.DATA_DIR, "templates", f"{target}.json"), encoding="utf-8") as f:
+        check_specialize(DescriptionTemplate(json.load(f)[mode], target))
+
+
+def test_render_capitalizes_and_drops_empty_groups():
+    template = DescriptionTemplate(SPEC)
+    assert template.render({"pose": "standing", "age": "young", "torso_clothing": "qipao"}) == "Standing., wearing qipao"
+    assert template.render({"age": "young", "gender": "woman", "leg_clothing": "skirt", "custom_text": "studio"}) == "Young woman., wearing skirt, studio"
+    assert template.render({}) == ""
+
+
+def test_invalid_template_specs_are_rejected():
+    with pytest.raises(ValueError, match="Unknown template keys: colour"):
+        DescriptionTemplate({"items": ["{pose}"], "colour": "red"})
+    with pytest.raises(ValueError, match="Unsupported placeholder"):
+        DescriptionTemplate("{pose:>10}")
+    with pytest.raises(ValueError, match="Invalid template node"):
+        DescriptionTemplate(["{pose}", 3])
+
+
+def test_missing_target_falls_back_to_default():
+    specs = {"default": {"detailed": "{pose}", "simple": "{age}"}}
+    assert build_template(specs, "flux").name == "default"
+    assert build_template(specs, "flux", detailed=False).render({"age": "young"}) == "young"
+    with pytest.raises(ValueError, match="No 'simple' description template for target 'flux'"):
+        build_template({"flux": {"detailed": "{pose}"}}, "flux", detailed=False)
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    # A copy of the shipped data the tests may break
+    for folder in ("templates", "styles", "in"):
+        shutil.copytree(os.path.join(common.DATA_DIR, folder), tmp_path / folder)
+    monkeypatch.setattr(common, "CATALOG", common.CatalogStore(str(tmp_path)))
+    monkeypatch.setattr(common, "_compiled_regions", {})
+    return tmp_path
+
+
+def test_unreadable_template_file_is_ignored(catalog, capsys):
+    (catalog / "templates" / "flux.json").write_text("{not json", encoding="utf-8")
+    compiled = compile_region("in")
+    assert "flux" not in compiled.templates
+    assert "Ignoring template file flux.json" in capsys.readouterr().out
+    # Nodes asking for it get the default template
+    assert compiled.template("flux").name == "default"
+    assert EthnicOutfitGenerator("in").generate_description(**inputs(seed=1, template="flux"))[0]
+
+
+def test_missing_template_file_falls_back_to_default(catalog):
+    os.remove(catalog / "templates" / "sdxl.json")
+    compiled = compile_region("in")
+    assert "sdxl" not in compiled.templates
+    assert compiled.template("sdxl").name == "default"
+
+
+def test_region_override_replaces_one_mode(catalog):
+    (catalog / "in" / "templates.json").write_text(json.dumps({"default": {"simple": "{pose}!"}}), encoding="utf-8")
+    compiled = compile_region("in")
+    assert compiled.template("default", detailed=False).render({"pose": "standing"}) == "standing!"
+    with open(catalog / "templates" / "default.json", encoding="utf-8") as f:
+        assert compiled.templates["default"]["detailed"] == json.load(f)["detailed"]